@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark of batch grading against the one-by-one path
+Grades the same set of short essays twice with the mock provider: once with
+one call per essay and once through grade_essays, which packs several essays
+into each call. Reports calls, prompt/output tokens (as the mock counts them:
+characters / 4) and wall time.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+SENTENCES = [
+    "Globalization has reshaped trade, culture and politics across the developing world.",
+    "Fragile economies are exposed to external shocks when capital flows reverse suddenly.",
+    "Education policy must balance access with quality if growth is to be inclusive.",
+    "Climate change threatens food security and deepens existing social inequalities.",
+    "Institutions matter more than resources in explaining the wealth of nations.",
+    "Public debt constrains the ability of governments to respond to emergencies.",
+]
+
+def configure_environment(args):
+    """Offline mock provider, no caches in the repo tree"""
+    workdir = tempfile.mkdtemp(prefix="essay-grading-batch-")
+    os.environ["GRADING_PROVIDER"] = "mock"
+    os.environ["GRADING_CACHE_ENABLED"] = "false"
+    os.environ["GRADING_CACHE_PATH"] = os.path.join(workdir, "grading_cache.sqlite3")
+    os.environ["MOCK_LATENCY_DISTRIBUTION"] = "fixed"
+    os.environ["MOCK_LATENCY_MEAN_SECONDS"] = str(args.latency)
+    os.environ["GEMINI_BATCH_TOKEN_BUDGET"] = str(args.token_budget)
+    os.environ["GEMINI_BATCH_MAX_ESSAYS"] = str(args.max_essays)
+
+def make_essays(count: int, min_words: int, max_words: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    essays = []
+    for index in range(count):
+        words = rng.randint(min_words, max_words)
+        sentences = [f"Essay {index}."]
+        while sum(len(sentence.split()) for sentence in sentences) < words:
+            sentences.append(rng.choice(SENTENCES))
+        # Paragraphs of six sentences, like a short exam answer
+        essays.append("\n\n".join(" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)))
+    return essays
+
+async def one_by_one(service, essays):
+    return await asyncio.gather(*(service.grade_essay(essay, priority="batch") for essay in essays))
+
+def run(mode: str, essays: list) -> dict:
+    from services.ai_service import AIService
+
+    service = AIService()
+    started = time.perf_counter()
+    if mode == "single":
+        results = asyncio.run(one_by_one(service, essays))
+    else:
+        results = asyncio.run(service.grade_essays(essays))
+    elapsed = time.perf_counter() - started
+
+    stats = service.get_stats()
+    return {
+        "elapsed": elapsed,
+        "calls": stats["provider"]["calls"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "output_tokens": stats["output_tokens"],
+        "degraded": sum(1 for result in results if result.degraded),
+        "batch": stats["batch"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch grading vs. one call per essay")
+    parser.add_argument("--essays", type=int, default=40, help="Number of essays to grade")
+    parser.add_argument("--min-words", type=int, default=250, help="Shortest essay")
+    parser.add_argument("--max-words", type=int, default=700, help="Longest essay")
+    parser.add_argument("--token-budget", type=int, default=12000, help="GEMINI_BATCH_TOKEN_BUDGET")
+    parser.add_argument("--max-essays", type=int, default=8, help="GEMINI_BATCH_MAX_ESSAYS")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock call latency in seconds")
+    args = parser.parse_args()
+    configure_environment(args)
+
+    essays = make_essays(args.essays, args.min_words, args.max_words)
+    print("🚀 Batch grading benchmark (mock provider)")
+    print("=" * 60)
+    print(f"   {len(essays)} essays of {args.min_words}-{args.max_words} words, "
+          f"budget {args.token_budget} tokens / {args.max_essays} essays per call")
+
+    single = run("single", essays)
+    batch = run("batch", essays)
+    for label, result in (("One by one", single), ("Batched", batch)):
+        print(f"   {label:<11} calls: {result['calls']:>4}   prompt tokens: {result['prompt_tokens']:>8}   "
+              f"output tokens: {result['output_tokens']:>7}   {result['elapsed']:.2f}s   degraded: {result['degraded']}")
+
+    calls_saved = single["calls"] - batch["calls"]
+    tokens_saved = single["prompt_tokens"] + single["output_tokens"] - batch["prompt_tokens"] - batch["output_tokens"]
+    total = single["prompt_tokens"] + single["output_tokens"]
+    print("-" * 60)
+    print(f"   Calls saved: {calls_saved} ({calls_saved / single['calls']:.0%})   "
+          f"tokens saved: {tokens_saved} ({tokens_saved / total:.0%})")
+    print(f"   Service estimate: {batch['batch']['calls_saved']} calls, "
+          f"{batch['batch']['estimated_tokens_saved']} tokens saved, {batch['batch']['fallbacks']} fallbacks")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
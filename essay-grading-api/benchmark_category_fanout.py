@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark of category fan-out against single-call grading
+Grades the same full-length essays one at a time in both modes and reports
+the wall-clock latency per essay. The mock provider models generation time as
+a first-token delay plus output tokens at a fixed speed, so a call marking a
+third of the categories finishes in about a third of the generation time;
+--provider gemini measures the live model instead (needs GEMINI_API_KEY).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+SENTENCES = [
+    "Globalization has reshaped trade, culture and politics across the developing world.",
+    "Fragile economies are exposed to external shocks when capital flows reverse suddenly.",
+    "Education policy must balance access with quality if growth is to be inclusive.",
+    "Climate change threatens food security and deepens existing social inequalities.",
+    "Institutions matter more than resources in explaining the wealth of nations.",
+    "Public debt constrains the ability of governments to respond to emergencies.",
+]
+
+def configure_environment(args):
+    """Offline mock provider by default, no caches in the repo tree"""
+    workdir = tempfile.mkdtemp(prefix="essay-grading-fanout-")
+    os.environ["GRADING_PROVIDER"] = args.provider
+    os.environ["GRADING_CACHE_ENABLED"] = "false"
+    os.environ["GRADING_CACHE_PATH"] = os.path.join(workdir, "grading_cache.sqlite3")
+    os.environ["GEMINI_FANOUT_MIN_WORDS"] = "0"
+    os.environ["MOCK_LATENCY_DISTRIBUTION"] = "fixed"
+    os.environ["MOCK_LATENCY_MEAN_SECONDS"] = str(args.first_token)
+    os.environ["MOCK_OUTPUT_TOKENS"] = str(args.output_tokens)
+    os.environ["MOCK_OUTPUT_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+
+def make_essay(index: int, words: int) -> str:
+    sentences = [f"Essay {index}: globalization and the developing world."]
+    position = index
+    while sum(len(sentence.split()) for sentence in sentences) < words:
+        sentences.append(SENTENCES[position % len(SENTENCES)])
+        position += index + 1
+    return "\n\n".join(" ".join(sentences[i:i + 8]) for i in range(0, len(sentences), 8))
+
+def run(fanout: bool, essays: list) -> dict:
+    from services.ai_service import AIService
+
+    service = AIService()
+    service.category_fanout = fanout
+    latencies, scores = [], []
+    for essay in essays:
+        started = time.perf_counter()
+        result = asyncio.run(service.grade_essay(essay))
+        latencies.append(time.perf_counter() - started)
+        scores.append(result.overall_score)
+    return {"latencies": latencies, "scores": scores, "calls": service.get_stats()["calls"]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Category fan-out vs. single-call grading latency")
+    parser.add_argument("--provider", choices=["mock", "gemini"], default="mock", help="Grading backend")
+    parser.add_argument("--essays", type=int, default=3, help="Number of essays graded in each mode")
+    parser.add_argument("--words", type=int, default=3000, help="Words per essay")
+    parser.add_argument("--first-token", type=float, default=0.5, help="Mock delay before the first token (s)")
+    parser.add_argument("--output-tokens", type=int, default=1200, help="Mock output tokens of a full grading")
+    parser.add_argument("--tokens-per-second", type=float, default=400, help="Mock generation speed")
+    args = parser.parse_args()
+    configure_environment(args)
+
+    essays = [make_essay(index, args.words) for index in range(args.essays)]
+    print(f"🚀 Category fan-out benchmark ({args.provider} provider)")
+    print("=" * 60)
+    print(f"   {len(essays)} essays of {args.words} words, graded one at a time")
+
+    single = run(False, essays)
+    fanout = run(True, essays)
+    for label, result in (("Single call", single), ("Fan-out", fanout)):
+        print(f"   {label:<12} mean {statistics.mean(result['latencies']):.2f}s   "
+              f"max {max(result['latencies']):.2f}s   calls: {result['calls']}   scores: {result['scores']}")
+
+    speedup = statistics.mean(single["latencies"]) / statistics.mean(fanout["latencies"])
+    print("-" * 60)
+    print(f"   Fan-out speedup: {speedup:.2f}x")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark of grading throughput against the size of the API key pool
+Each pool member is a mock key with the same per-minute request quota; the
+outbound scheduler starts from an empty bucket so the sustained, quota-bound
+rate is measured rather than the initial burst.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+SAMPLE_PARAGRAPH = (
+    "Globalization has reshaped trade, culture and politics across the developing world, "
+    "creating opportunities for growth while exposing fragile economies to external shocks. "
+)
+
+def configure_environment(args):
+    """Offline mock keys, no caches in the repo tree"""
+    workdir = tempfile.mkdtemp(prefix="essay-grading-pool-")
+    os.environ["GRADING_PROVIDER"] = "gemini"
+    os.environ["GRADING_CACHE_ENABLED"] = "false"
+    os.environ["GRADING_CACHE_PATH"] = os.path.join(workdir, "grading_cache.sqlite3")
+    os.environ["MOCK_LATENCY_DISTRIBUTION"] = "fixed"
+    os.environ["MOCK_LATENCY_MEAN_SECONDS"] = str(args.latency)
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.concurrency)
+
+async def grade_all(service, essays: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        service.grade_essay(f"Essay {index}. " + SAMPLE_PARAGRAPH * 40, priority="batch")
+        for index in range(essays)
+    ))
+    return time.perf_counter() - started
+
+def run(keys: int, args) -> dict:
+    from services.ai_service import AIService
+
+    os.environ["GEMINI_KEY_POOL"] = json.dumps([{"provider": "mock", "rpm": args.rpm, "tpm": 0}] * keys)
+    service = AIService()
+    service.scheduler.requests.take(service.scheduler.requests.capacity)
+
+    essays = args.essays_per_key * keys
+    elapsed = asyncio.run(grade_all(service, essays))
+    calls = [member["calls"] for member in service.get_stats()["provider"]["by_member"]]
+    return {"essays": essays, "elapsed": elapsed, "throughput": essays / elapsed, "calls": calls}
+
+def main():
+    parser = argparse.ArgumentParser(description="Grading throughput vs. number of pooled API keys")
+    parser.add_argument("--keys", default="1,2,4", help="Pool sizes to measure")
+    parser.add_argument("--rpm", type=int, default=600, help="Requests per minute of each key")
+    parser.add_argument("--essays-per-key", type=int, default=40, help="Essays graded per key in the pool")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock call latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=64, help="GEMINI_MAX_CONCURRENCY")
+    args = parser.parse_args()
+    configure_environment(args)
+
+    print("🚀 API key pool throughput benchmark (mock keys)")
+    print("=" * 60)
+    print(f"   Quota per key: {args.rpm} RPM ({args.rpm / 60:.1f}/s)   mock latency: {args.latency}s")
+
+    baseline = None
+    for keys in [int(value) for value in args.keys.split(",")]:
+        result = run(keys, args)
+        baseline = baseline or result["throughput"]
+        print(f"   {keys} key(s): {result['essays']} essays in {result['elapsed']:.2f}s   "
+              f"{result['throughput']:.1f} essays/s ({result['throughput'] / baseline:.2f}x)   "
+              f"calls per key: {result['calls']}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
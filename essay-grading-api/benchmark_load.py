@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Offline load test of the /upload-essay pipeline
+Drives the FastAPI app in-process (no network, no API key) with the mock grading
+provider and reports throughput, latency percentiles and error counts. Storage,
+caches and progress live in a temporary directory. With --provider replay the
+essays and gradings come from the stored results corpus instead.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import tempfile
+import time
+
+SAMPLE_PARAGRAPH = (
+    "Globalization has reshaped trade, culture and politics across the developing world, "
+    "creating opportunities for growth while exposing fragile economies to external shocks. "
+)
+RESULTS_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage", "results", "*.json")
+
+def configure_environment(args):
+    """Point the app at the mock provider and a scratch directory before main is imported"""
+    workdir = tempfile.mkdtemp(prefix="essay-grading-load-")
+    os.environ["GRADING_PROVIDER"] = args.provider
+    os.environ["REPLAY_CORPUS_GLOB"] = RESULTS_GLOB
+    os.environ["REPLAY_LATENCY"] = "synthetic"
+    if args.provider == "replay":
+        # Corpus essays repeat across requests; every upload should reach the provider
+        os.environ["GRADING_CACHE_ENABLED"] = "false"
+    os.environ["MOCK_LATENCY_DISTRIBUTION"] = args.distribution
+    os.environ["MOCK_LATENCY_MEAN_SECONDS"] = str(args.latency)
+    os.environ["MOCK_LATENCY_STDDEV_SECONDS"] = str(args.stddev)
+    os.environ["MOCK_ERROR_RATE"] = str(args.error_rate)
+    os.environ["MOCK_OUTPUT_TOKENS"] = str(args.output_tokens)
+    os.environ["MOCK_OUTPUT_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["GEMINI_HEDGING"] = "true" if args.hedging == "on" else "false"
+    os.environ["GRADING_CACHE_PATH"] = os.path.join(workdir, "grading_cache.sqlite3")
+    os.environ["PROGRESS_STORE_PATH"] = os.path.join(workdir, "progress.sqlite3")
+    os.environ.setdefault("GEMINI_MAX_CONCURRENCY", str(args.concurrency))
+    os.chdir(workdir)
+    return workdir
+
+def load_corpus_essays() -> list:
+    """Essay texts of the stored results, for replay runs"""
+    essays = []
+    for path in sorted(glob.glob(RESULTS_GLOB)):
+        with open(path, "r", encoding="utf-8") as f:
+            text = json.load(f).get("original_text", "")
+        if text.strip():
+            essays.append(text)
+    return essays
+
+async def run_load(app, requests: int, concurrency: int, words: int, corpus: list = None,
+                   rubric_type: str = "default") -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    paragraph_words = len(SAMPLE_PARAGRAPH.split())
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = {}
+
+    async def one(client, index: int):
+        if corpus:
+            essay = corpus[index % len(corpus)]
+        else:
+            essay = f"Essay {index}. " + SAMPLE_PARAGRAPH * max(1, words // paragraph_words)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/upload-essay", json={"essay_text": essay, "rubric_type": rubric_type})
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, index) for index in range(requests)))
+        elapsed = time.perf_counter() - started
+        stats = (await client.get("/stats")).json()
+
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "throughput": requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[max(0, int(len(latencies) * 0.95) - 1)],
+        "max": latencies[-1],
+        "statuses": statuses,
+        "stats": stats
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /upload-essay offline with the mock or replay provider")
+    parser.add_argument("--provider", default="mock", choices=["mock", "replay"],
+                        help="mock: synthetic essays; replay: stored results corpus")
+    parser.add_argument("--requests", type=int, default=200, help="Total uploads")
+    parser.add_argument("--concurrency", type=int, default=50, help="Uploads in flight at once")
+    parser.add_argument("--words", type=int, default=1200, help="Words per essay")
+    parser.add_argument("--latency", type=float, default=2.0, help="Mean mock latency in seconds")
+    parser.add_argument("--stddev", type=float, default=0.5, help="Mock latency standard deviation")
+    parser.add_argument("--distribution", default="lognormal", choices=["fixed", "uniform", "normal", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock calls failing with 429/503")
+    parser.add_argument("--rubric-type", default="default", choices=["default", "quick"],
+                        help="quick: scores with short feedback under a hard output token cap")
+    parser.add_argument("--output-tokens", type=int, default=0,
+                        help="Mock output tokens of a full grading (0 = estimated from the text)")
+    parser.add_argument("--tokens-per-second", type=float, default=0,
+                        help="Mock generation speed, so shorter outputs return sooner (0 = off)")
+    parser.add_argument("--hedging", default="on", choices=["on", "off"], help="Hedge calls slower than the observed p95")
+    args = parser.parse_args()
+
+    workdir = configure_environment(args)
+    import main as app_module
+    app_module.storage_service._ensure_directories()
+
+    corpus = load_corpus_essays() if args.provider == "replay" else None
+
+    print(f"🚀 /upload-essay load test ({args.provider} provider)")
+    print("=" * 60)
+    if corpus:
+        print(f"   Requests: {args.requests}   concurrency: {args.concurrency}   corpus essays: {len(corpus)}")
+    else:
+        print(f"   Requests: {args.requests}   concurrency: {args.concurrency}   words/essay: {args.words}")
+    print(f"   Mock latency: {args.distribution} mean {args.latency}s sd {args.stddev}s   error rate: {args.error_rate:.0%}")
+    print(f"   Rubric type: {args.rubric_type}   mock tokens/s: {args.tokens_per_second or 'off'}")
+    print(f"   Scratch directory: {workdir}")
+
+    result = asyncio.run(run_load(app_module.app, args.requests, args.concurrency, args.words, corpus, args.rubric_type))
+    ai_stats = result["stats"]["ai_service"]
+
+    print(f"   Elapsed:     {result['elapsed']:.2f}s   throughput: {result['throughput']:.1f} essays/s")
+    print(f"   Latency:     p50 {result['p50']:.2f}s   p95 {result['p95']:.2f}s   max {result['max']:.2f}s")
+    print(f"   Status codes: {result['statuses']}")
+    if args.provider == "replay":
+        provider = ai_stats["provider"]
+        print(f"   Replay hits: {provider['hits']}   misses: {provider['misses']}   "
+              f"handled by pre-screen: {ai_stats['pre_screen']['handled_locally']}")
+    print(f"   Provider calls: {ai_stats['calls']}   errors: {ai_stats['provider'].get('errors', 0)}   "
+          f"avg call latency: {ai_stats['avg_latency_seconds']}s")
+    scheduler = ai_stats["scheduler"]
+    priority = "quick" if args.rubric_type == "quick" else "interactive"
+    print(f"   Scheduler:   max queue depth {scheduler['max_queue_depth']}   "
+          f"avg wait {scheduler['by_priority'][priority]['avg_wait_seconds']}s   "
+          f"throttles {scheduler['throttles']}   retries {scheduler['retries']}")
+    hedging = ai_stats["hedging"]
+    print(f"   Hedging:     {args.hedging}   hedges {hedging['hedges']} ({hedging['extra_load']:.1%} extra load)   "
+          f"won {hedging['hedge_wins']}   breaker {ai_stats['circuit_breaker']['state']}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark of character-to-line clustering in PDFService
+Loads the characters of every page of the PDFs in storage/pdfs once, then times
+the array-backed _extract_text_from_chars_professionally against the previous
+per-character implementation (kept below for reference) on the same chars.
+pdfplumber parsing is excluded so the numbers isolate the clustering step.
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import time
+
+import pdfplumber
+
+PDF_GLOB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage", "pdfs", "*.pdf")
+
+def legacy_extract_text_from_chars(chars):
+    """The implementation before vectorization: dict copies, a Python grouping loop, len(text) * 5 widths"""
+    sorted_chars = sorted(chars, key=lambda c: (c['top'], c['x0']))
+    lines, current_line, current_y = [], [], None
+    for char in sorted_chars:
+        char_text = char.get('text', '')
+        char_y = char.get('top', 0)
+        if not char_text or not char_text.strip():
+            continue
+        if current_y is None or abs(char_y - current_y) > 3:
+            if current_line:
+                lines.append(legacy_format_line(current_line))
+                current_line = []
+            current_y = char_y
+        current_line.append({'text': char_text, 'x': char.get('x0', 0), 'y': char_y})
+    if current_line:
+        lines.append(legacy_format_line(current_line))
+    return '\n'.join(lines)
+
+def legacy_format_line(chars):
+    sorted_chars = sorted(chars, key=lambda c: c['x'])
+    line_text = ""
+    for i, char in enumerate(sorted_chars):
+        if i > 0:
+            prev_char = sorted_chars[i - 1]
+            if char['x'] - (prev_char['x'] + len(prev_char['text']) * 5) > 5:
+                line_text += " "
+        line_text += char['text']
+    return line_text.strip()
+
+def load_pages(pattern: str) -> list:
+    """Characters of every page, parsed once up front"""
+    pages = []
+    for path in sorted(glob.glob(pattern)):
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                pages.append((page.chars, page.width, page.height))
+    return pages
+
+def time_pages(extract, pages: list, repeat: int) -> tuple:
+    """Best-of-repeat seconds for one pass over all pages, and the text of that pass"""
+    timings, texts = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        texts = [extract(chars, width, height) for chars, width, height in pages]
+        timings.append(time.perf_counter() - started)
+    return min(timings), texts
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized vs. per-character line clustering")
+    parser.add_argument("--glob", default=PDF_GLOB, help="PDFs to load")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes per implementation (best is reported)")
+    args = parser.parse_args()
+
+    from services.pdf_service import PDFService
+
+    service = PDFService()
+    pages = load_pages(args.glob)
+    if not pages:
+        parser.error(f"No PDFs match {args.glob}")
+    chars = sum(len(page[0]) for page in pages)
+
+    print("🚀 PDF character clustering benchmark")
+    print("=" * 60)
+    print(f"   {len(pages)} pages, {chars} characters ({chars / len(pages):.0f} per page)")
+
+    legacy_seconds, legacy_texts = time_pages(
+        lambda page_chars, width, height: legacy_extract_text_from_chars(page_chars), pages, args.repeat)
+    vector_seconds, vector_texts = time_pages(service._extract_text_from_chars_professionally, pages, args.repeat)
+
+    for label, seconds, texts in (("Legacy", legacy_seconds, legacy_texts), ("Vectorized", vector_seconds, vector_texts)):
+        words = sum(len(text.split()) for text in texts)
+        word_lengths = [len(word) for text in texts for word in text.split()]
+        print(f"   {label:<11} {seconds * 1000:8.1f} ms   {seconds / len(pages) * 1000:6.2f} ms/page   "
+              f"words: {words}   mean word length: {statistics.mean(word_lengths):.1f}")
+
+    print("-" * 60)
+    print(f"   Speedup: {legacy_seconds / vector_seconds:.2f}x")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
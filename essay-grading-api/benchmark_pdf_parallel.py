@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark of page-parallel PDF extraction against the sequential path
+Generates dense multi-page PDFs with reportlab and extracts each one in the
+request's process and on the persistent process pool. The pool is warmed up
+before timing, as it is in a running server after the first long submission.
+The speedup is bounded by the CPU cores available to the pool.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+SENTENCES = [
+    "Globalization has reshaped trade, culture and politics across the developing world.",
+    "Fragile economies are exposed to external shocks when capital flows reverse suddenly.",
+    "Education policy must balance access with quality if growth is to be inclusive.",
+    "Climate change threatens food security and deepens existing social inequalities.",
+]
+
+def make_pdf(path: str, pages: int) -> None:
+    """A PDF of full pages of small print, about 700 words per page"""
+    pdf = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        pdf.setFont("Helvetica", 9)
+        for line in range(70):
+            pdf.drawString(40, 760 - line * 10.5, " ".join(SENTENCES[(page + line + i) % len(SENTENCES)] for i in range(2)))
+        pdf.showPage()
+    pdf.save()
+
+def time_extraction(service, path: str, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = service.extract_text_from_pdf(path)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), text
+
+def main():
+    parser = argparse.ArgumentParser(description="Page-parallel vs. sequential PDF extraction")
+    parser.add_argument("--pages", type=int, nargs="+", default=[30, 60], help="Page counts to generate")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Pool processes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per document (median is reported)")
+    args = parser.parse_args()
+
+    from services.pdf_service import PDFService
+
+    workdir = tempfile.mkdtemp(prefix="essay-grading-pdf-")
+    os.environ["PDF_PARALLEL_MIN_PAGES"] = "1"
+    sequential = PDFService(parallel_workers=1)
+    parallel = PDFService(parallel_workers=max(2, args.workers))
+
+    print("🚀 Page-parallel PDF extraction benchmark")
+    print("=" * 60)
+    print(f"   CPU cores: {os.cpu_count()}   pool processes: {parallel.parallel_workers}")
+
+    warmup = os.path.join(workdir, "warmup.pdf")
+    make_pdf(warmup, parallel.parallel_workers * 2)
+    started = time.perf_counter()
+    parallel.extract_text_from_pdf(warmup)
+    print(f"   Pool start-up (first document): {time.perf_counter() - started:.2f}s")
+
+    try:
+        for pages in args.pages:
+            path = os.path.join(workdir, f"essay-{pages}.pdf")
+            make_pdf(path, pages)
+            sequential_seconds, sequential_text = time_extraction(sequential, path, args.repeat)
+            parallel_seconds, parallel_text = time_extraction(parallel, path, args.repeat)
+            print(f"   {pages:>4} pages   sequential {sequential_seconds:6.2f}s   parallel {parallel_seconds:6.2f}s   "
+                  f"speedup {sequential_seconds / parallel_seconds:.2f}x   "
+                  f"identical: {sequential_text == parallel_text}")
+    finally:
+        parallel.shutdown()
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark of streaming PDF extraction: memory and early termination
+Generates long PDFs with reportlab and extracts them page by page, once
+releasing every page's parsed objects as it goes (the service's behaviour) and
+once keeping them, as extraction did before. Reports the peak Python heap of
+each run (tracemalloc), then the time to the word cap on a notes binder
+against extracting every page.
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+SENTENCES = [
+    "Globalization has reshaped trade, culture and politics across the developing world.",
+    "Fragile economies are exposed to external shocks when capital flows reverse suddenly.",
+    "Education policy must balance access with quality if growth is to be inclusive.",
+    "Climate change threatens food security and deepens existing social inequalities.",
+]
+
+def make_pdf(path: str, pages: int, lines: int) -> None:
+    """A PDF of full pages of essay text, about 25 words per line"""
+    pdf = canvas.Canvas(path, pagesize=letter)
+    for page in range(pages):
+        pdf.setFont("Helvetica", 9)
+        for line in range(lines):
+            pdf.drawString(40, 760 - line * 10.5, " ".join(SENTENCES[(page + line + i) % len(SENTENCES)] for i in range(2)))
+        pdf.showPage()
+    pdf.save()
+
+def peak_memory(service, path: str) -> tuple:
+    """Peak traced heap (MB) and page count of one uncapped page-by-page extraction"""
+    tracemalloc.start()
+    pages = sum(1 for _ in service.iter_page_texts(path))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024, pages
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming PDF extraction: memory and word-cap early exit")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 40], help="Page counts for the memory runs")
+    parser.add_argument("--lines", type=int, default=30, help="Lines of text per page")
+    parser.add_argument("--binder-pages", type=int, default=150, help="Pages of the notes binder")
+    parser.add_argument("--max-words", type=int, default=6000, help="PDF_MAX_WORDS for the binder run")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    os.environ["PDF_MAX_PAGES"] = "0"
+    os.environ["PDF_MAX_WORDS"] = "0"
+    import services.pdf_service as pdf_service_module
+    from services.pdf_service import PDFService
+
+    workdir = tempfile.mkdtemp(prefix="essay-grading-pdf-")
+    service = PDFService(parallel_workers=1)
+    release_page = pdf_service_module._release_page
+
+    print("🚀 Streaming PDF extraction benchmark")
+    print("=" * 60)
+    for pages in args.pages:
+        path = os.path.join(workdir, f"essay-{pages}.pdf")
+        make_pdf(path, pages, args.lines)
+        released, _ = peak_memory(service, path)
+        pdf_service_module._release_page = lambda page: None
+        try:
+            kept, _ = peak_memory(service, path)
+        finally:
+            pdf_service_module._release_page = release_page
+        print(f"   {pages:>4} pages   peak heap released {released:7.1f} MB   kept {kept:7.1f} MB")
+
+    print("-" * 60)
+    path = os.path.join(workdir, "binder.pdf")
+    make_pdf(path, args.binder_pages, args.lines)
+    started = time.perf_counter()
+    full = service.extract(path)
+    full_seconds = time.perf_counter() - started
+
+    service.max_words = args.max_words
+    started = time.perf_counter()
+    capped = service.extract(path)
+    capped_seconds = time.perf_counter() - started
+    print(f"   {args.binder_pages}-page binder, all pages:  {full_seconds:6.2f}s   {full.words} words")
+    print(f"   Capped at {args.max_words} words:      {capped_seconds:6.2f}s   "
+          f"{capped.pages} of {capped.total_pages} pages   truncated: {capped.truncated}")
+    print(f"   Speedup: {full_seconds / capped_seconds:.1f}x")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the progress store backends
+Measures create, update and read throughput of the in-memory and SQLite stores,
+including several processes sharing one SQLite file as uvicorn workers would
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+
+from services.progress_store import InMemoryProgressStore, SQLiteProgressStore
+
+STAGES = [10, 20, 40, 50, 60, 70, 80, 90, 100]
+
+def run_workload(store, tasks: int, reads_per_update: int) -> dict:
+    """Create tasks, walk each through every stage and poll it in between"""
+    task_ids = [str(uuid.uuid4()) for _ in range(tasks)]
+
+    started = time.perf_counter()
+    for task_id in task_ids:
+        store.create(task_id, {"task_id": task_id, "progress": 0, "status": "processing", "message": "Starting..."})
+    create_elapsed = time.perf_counter() - started
+
+    update_elapsed = 0.0
+    read_elapsed = 0.0
+    for progress in STAGES:
+        started = time.perf_counter()
+        for task_id in task_ids:
+            store.update(task_id, progress=progress, message=f"Stage {progress}")
+        update_elapsed += time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(reads_per_update):
+            for task_id in task_ids:
+                store.get(task_id)
+        read_elapsed += time.perf_counter() - started
+
+    updates = tasks * len(STAGES)
+    reads = updates * reads_per_update
+    return {
+        "creates_per_sec": tasks / create_elapsed,
+        "updates_per_sec": updates / update_elapsed,
+        "reads_per_sec": reads / read_elapsed if reads else 0.0
+    }
+
+def _sqlite_worker(db_path: str, tasks: int, reads_per_update: int, results):
+    store = SQLiteProgressStore(db_path=db_path)
+    results.append(run_workload(store, tasks, reads_per_update))
+
+def print_result(name: str, result: dict):
+    print(f"   {name:<28} creates/s: {result['creates_per_sec']:>10,.0f}   "
+          f"updates/s: {result['updates_per_sec']:>10,.0f}   reads/s: {result['reads_per_sec']:>10,.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark progress store backends")
+    parser.add_argument("--tasks", type=int, default=2000, help="Tasks per run")
+    parser.add_argument("--reads", type=int, default=3, help="Polls per task between stage updates")
+    parser.add_argument("--workers", type=int, default=4, help="Processes sharing the SQLite store")
+    args = parser.parse_args()
+
+    print("🚀 Progress store benchmark")
+    print(f"   {args.tasks} tasks x {len(STAGES)} stages, {args.reads} reads per update")
+    print("=" * 100)
+
+    print_result("memory", run_workload(InMemoryProgressStore(), args.tasks, args.reads))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "progress.sqlite3")
+        print_result("sqlite (1 process)", run_workload(SQLiteProgressStore(db_path=db_path), args.tasks, args.reads))
+
+        with multiprocessing.Manager() as manager:
+            results = manager.list()
+            processes = [
+                multiprocessing.Process(target=_sqlite_worker, args=(db_path, args.tasks, args.reads, results))
+                for _ in range(args.workers)
+            ]
+            started = time.perf_counter()
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - started
+
+            total_ops = args.workers * args.tasks * (1 + len(STAGES) * (1 + args.reads))
+            aggregate = {
+                key: sum(result[key] for result in results)
+                for key in ("creates_per_sec", "updates_per_sec", "reads_per_sec")
+            }
+            print_result(f"sqlite ({args.workers} processes, sum)", aggregate)
+            print(f"   {args.workers} processes finished {total_ops:,} operations in {elapsed:.2f}s")
+
+    print("=" * 100)
+
+if __name__ == "__main__":
+    main()
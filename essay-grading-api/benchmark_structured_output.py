@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the compact structured-output grading mode
+Compares output tokens, latency and parse failures of the legacy free-form JSON
+prompt against the schema-constrained compact JSON mode on a fixed essay set
+(the original texts in storage/results).
+
+--offline re-serializes the recorded gradings in both formats and estimates the
+output-token delta without calling Gemini (about 4 characters per token).
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+
+from services.rubric import MODEL_CATEGORIES, REMARK_KEYS
+
+RESULTS_GLOB = os.path.join("storage", "results", "*.json")
+
+def load_essay_set(limit: int) -> list:
+    """Load distinct recorded essays and their gradings, oldest file name first"""
+    records = []
+    seen = set()
+    for path in sorted(glob.glob(RESULTS_GLOB)):
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+        text = record["original_text"]
+        if text in seen:
+            continue
+        seen.add(text)
+        records.append(record)
+    return records[:limit]
+
+def to_legacy_json(grading: dict) -> str:
+    """Serialize a grading the way the legacy prompt asks for it"""
+    names = {name for name, _ in MODEL_CATEGORIES.values()}
+    return json.dumps({
+        "overall_score": grading["overall_score"],
+        "category_scores": {name: score for name, score in grading["category_scores"].items() if name in names},
+        "summary_feedback": grading["summary_feedback"],
+        "submission_type": grading["submission_type"],
+        "examiner_remarks": grading["examiner_remarks"]
+    }, indent=2, ensure_ascii=False)
+
+def to_compact_json(grading: dict) -> str:
+    """Serialize a grading in the compact structured-output format"""
+    names = {name: key for key, (name, _) in MODEL_CATEGORIES.items()}
+    return json.dumps({
+        "c": {
+            names[name]: {"s": score["score"], "f": score["feedback"]}
+            for name, score in grading["category_scores"].items() if name in names
+        },
+        "sf": grading["summary_feedback"],
+        "t": grading["submission_type"],
+        "r": {key: grading["examiner_remarks"].get(remark, []) for key, remark in REMARK_KEYS.items()}
+    }, separators=(",", ":"), ensure_ascii=False)
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def run_offline(records: list):
+    legacy_tokens = sum(estimate_tokens(to_legacy_json(r["grading_result"])) for r in records)
+    compact_tokens = sum(estimate_tokens(to_compact_json(r["grading_result"])) for r in records)
+    print(f"   Essays:                      {len(records)}")
+    print(f"   Legacy output tokens (est):  {legacy_tokens:,} ({legacy_tokens / len(records):.0f}/essay)")
+    print(f"   Compact output tokens (est): {compact_tokens:,} ({compact_tokens / len(records):.0f}/essay)")
+    print(f"   Delta:                       {compact_tokens - legacy_tokens:+,} ({(compact_tokens - legacy_tokens) / legacy_tokens:+.1%})")
+
+async def grade_all(structured: bool, records: list) -> dict:
+    """Grade every essay with one output mode, bypassing cache and fallback"""
+    os.environ["GEMINI_STRUCTURED_OUTPUT"] = "true" if structured else "false"
+    os.environ["GRADING_CACHE_ENABLED"] = "false"
+    from services.ai_service import AIService
+
+    service = AIService()
+    latencies = []
+    for record in records:
+        prompt = service._build_grading_prompt(record["original_text"], "default")
+        started = time.perf_counter()
+        try:
+            response = await service._call_gemini(prompt)
+            service._parse_ai_response(response)
+        except Exception as e:
+            print(f"   ⚠️  {record['essay_id']}: {e}")
+        latencies.append(time.perf_counter() - started)
+
+    return {
+        "output_tokens": service.output_tokens,
+        "prompt_tokens": service.prompt_tokens,
+        "parse_failures": service.parse_failures,
+        "mean_latency": sum(latencies) / len(latencies),
+        "p95_latency": sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)]
+    }
+
+def run_online(records: list):
+    results = {
+        "legacy": asyncio.run(grade_all(False, records)),
+        "compact": asyncio.run(grade_all(True, records))
+    }
+    for mode, result in results.items():
+        print(f"   {mode:<8} output tokens: {result['output_tokens']:>8,}   prompt tokens: {result['prompt_tokens']:>8,}   "
+              f"mean latency: {result['mean_latency']:.2f}s   p95: {result['p95_latency']:.2f}s   "
+              f"parse failures: {result['parse_failures']}")
+
+    legacy, compact = results["legacy"], results["compact"]
+    if legacy["output_tokens"]:
+        print(f"   Output token delta: {(compact['output_tokens'] - legacy['output_tokens']) / legacy['output_tokens']:+.1%}")
+    print(f"   Mean latency delta: {(compact['mean_latency'] - legacy['mean_latency']) / legacy['mean_latency']:+.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compact structured output against the legacy prompt")
+    parser.add_argument("--limit", type=int, default=10, help="Number of essays from storage/results")
+    parser.add_argument("--offline", action="store_true", help="Estimate from recorded gradings without calling Gemini")
+    args = parser.parse_args()
+
+    records = load_essay_set(args.limit)
+    if not records:
+        print("❌ No recorded essays found in storage/results")
+        return
+
+    print("🚀 Structured output benchmark" + (" (offline estimate)" if args.offline else ""))
+    print("=" * 60)
+    if args.offline:
+        run_offline(records)
+    else:
+        run_online(records)
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
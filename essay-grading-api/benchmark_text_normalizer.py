@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of text normalization
+Times TextNormalizer against the previous step-by-step formatting pipeline
+(kept below for reference) on the inputs of storage/golden/normalization.json,
+and checks both against the golden outputs. Also times the repeat pass that
+/upload-pdf used to make over already formatted text.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "storage", "golden", "normalization.json")
+
+LEGACY_COMMON_WORDS = [
+    'The', 'This', 'That', 'These', 'Those', 'In', 'On', 'At', 'By', 'For', 'With', 'As', 'Since', 'Because',
+    'However', 'Moreover', 'Furthermore', 'Additionally', 'Therefore', 'Thus', 'Hence', 'In conclusion'
+]
+LEGACY_PARAGRAPH_INDICATORS = [r'^\d+\.', r'^[A-Z][a-z]+\.', r'^[A-Z][A-Z\s]+:', r'^[A-Z][a-z\s]+:', r'^[A-Z][a-z\s]+\.']
+LEGACY_PARAGRAPH_STARTERS = [
+    'However,', 'Moreover,', 'Furthermore,', 'Additionally,', 'In conclusion,', 'Therefore,', 'Thus,', 'Hence,',
+    'On the other hand,', 'In contrast,', 'Similarly,', 'First,', 'Second,', 'Third,', 'Finally,',
+    'The', 'This', 'These', 'Those', 'It is', 'There is', 'There are', 'In', 'At', 'By', 'For', 'With',
+    'As', 'Since', 'Because', 'Although', 'While', 'When', 'Where', 'Why', 'How'
+]
+
+def legacy_format(text: str) -> str:
+    """The five formatting steps of PDFService before the single-pass normalizer"""
+    if not text:
+        return ""
+    # Basic cleaning
+    text = ''.join(char for char in text if char.isprintable() or char in '\n\t')
+    text = text.replace('|', ' ').replace('\t', ' ')
+    # Spacing issues
+    text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
+    text = re.sub(r'([.!?])([A-Z])', r'\1 \2', text)
+    text = re.sub(r'([.!?])([a-z])', r'\1 \2', text)
+    for word in LEGACY_COMMON_WORDS:
+        text = re.sub(rf'([a-z])({word})', r'\1 \2', text, flags=re.IGNORECASE)
+    text = re.sub(r' +', ' ', text).strip()
+    # Paragraphs
+    paragraphs, current = [], []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            if current:
+                paragraphs.append(' '.join(current))
+                current = []
+            continue
+        if not current or any(re.match(pattern, line) for pattern in LEGACY_PARAGRAPH_INDICATORS) \
+                or any(line.startswith(starter) for starter in LEGACY_PARAGRAPH_STARTERS):
+            if current:
+                paragraphs.append(' '.join(current))
+                current = []
+        current.append(line)
+    if current:
+        paragraphs.append(' '.join(current))
+    # Sentences
+    formatted = []
+    for paragraph in '\n\n'.join(paragraphs).split('\n\n'):
+        if not paragraph.strip():
+            continue
+        paragraph = re.sub(r'\s+', ' ', paragraph)
+        paragraph = re.sub(r'\s+([.!?])', r'\1', paragraph)
+        paragraph = re.sub(r'([.!?])\s*([A-Z])', r'\1 \2', paragraph)
+        formatted.append(paragraph.strip())
+    text = '\n\n'.join(formatted)
+    # Final formatting
+    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
+    text = re.sub(r' +', ' ', text)
+    text = re.sub(r'\n +', '\n', text)
+    text = re.sub(r'([.!?])\s*([A-Z])', r'\1 \2', text)
+    text = ''.join(char for char in text if char.isprintable() or char.isspace())
+    return text.strip()
+
+def time_pass(format_text, inputs: list, repeat: int) -> tuple:
+    """Best-of-repeat seconds for one pass over all inputs, and the outputs of that pass"""
+    timings, outputs = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outputs = [format_text(text) for text in inputs]
+        timings.append(time.perf_counter() - started)
+    return min(timings), outputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-pass normalizer vs. the step-by-step formatting pipeline")
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="Golden corpus of inputs and expected outputs")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes per implementation (best is reported)")
+    args = parser.parse_args()
+
+    from services.text_normalizer import TextNormalizer
+
+    with open(args.golden, encoding="utf-8") as f:
+        golden = json.load(f)
+    inputs = [case["input"] for case in golden]
+    expected = [case["output"] for case in golden]
+    size = sum(len(text) for text in inputs)
+
+    print("🚀 Text normalization benchmark")
+    print("=" * 60)
+    print(f"   {len(golden)} golden cases, {size / 1024:.0f} KB of input")
+
+    normalizer = TextNormalizer(remember=len(golden))
+    legacy_seconds, legacy_outputs = time_pass(legacy_format, inputs, args.repeat)
+    seconds, outputs = time_pass(normalizer.normalize, inputs, args.repeat)
+    for label, elapsed, results in (("Legacy", legacy_seconds, legacy_outputs), ("Normalizer", seconds, outputs)):
+        matches = sum(result == case for result, case in zip(results, expected))
+        print(f"   {label:<11} {elapsed * 1000:8.1f} ms   {size / 1024 / 1024 / elapsed:6.2f} MB/s   "
+              f"golden matches: {matches}/{len(golden)}")
+    print(f"   Speedup: {legacy_seconds / seconds:.2f}x")
+
+    print("-" * 60)
+    repeat_seconds, _ = time_pass(legacy_format, outputs, args.repeat)
+    skip_seconds, _ = time_pass(normalizer.ensure_normalized, outputs, args.repeat)
+    print(f"   Repeat pass over formatted text: legacy {repeat_seconds * 1000:.1f} ms   "
+          f"skipped {skip_seconds * 1000:.2f} ms")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Shared fixtures for the Essay Grading API tests
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import pytest
+
+# Configure the app before main is imported: no real API key, no caches in the repo tree,
+# no PDF extraction cache (tests compare fresh extractions; the cache tests enable it),
+# no provider-side context caching (tests use a stand-in backend), short retry backoff
+# and no hedging, so provider call counts are exact
+_test_storage = tempfile.mkdtemp(prefix="essay-grading-tests-")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("GRADING_CACHE_PATH", os.path.join(_test_storage, "grading_cache.sqlite3"))
+os.environ.setdefault("EXTRACTION_CACHE_ENABLED", "false")
+os.environ.setdefault("EXTRACTION_CACHE_PATH", os.path.join(_test_storage, "extraction_cache.sqlite3"))
+os.environ.setdefault("PROGRESS_STORE_PATH", os.path.join(_test_storage, "progress.sqlite3"))
+os.environ.setdefault("GEMINI_CONTEXT_CACHE", "false")
+os.environ.setdefault("GEMINI_RETRY_BASE_SECONDS", "0.01")
+os.environ.setdefault("GEMINI_HEDGING", "false")
+
+SAMPLE_ESSAY = (
+    "Technology has fundamentally transformed the landscape of modern education, "
+    "creating both opportunities and challenges for students and teachers alike. "
+) * 10
+
+MOCK_RESPONSE = json.dumps({
+    "overall_score": 30,
+    "category_scores": {
+        "Thesis & Topic Understanding": {"score": 5, "feedback": "Adequate thesis."},
+        "Outline Quality": {"score": 0, "feedback": "Outline missing."},
+        "Structure & Coherence": {"score": 8, "feedback": "Reasonable flow."},
+        "Content Depth, Balance & Relevance": {"score": 10, "feedback": "Thin content."},
+        "Language Proficiency & Expression": {"score": 7, "feedback": "Some errors."},
+        "Critical Thinking & Analytical Reasoning": {"score": 0, "feedback": "Descriptive only."},
+        "Conclusion": {"score": 0, "feedback": "No conclusion."},
+        "Word Count & Length Control": {"score": 0, "feedback": "Too short."}
+    },
+    "summary_feedback": "Fragmentary attempt.",
+    "submission_type": "C",
+    "word_count": 0,
+    "examiner_remarks": {"strengths": [], "weaknesses": [], "suggestions": []}
+})
+
+
+class _SlowResponse:
+    text = MOCK_RESPONSE
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StreamedResponse:
+    """Iterable like the SDK's streamed GenerateContentResponse"""
+
+    def __init__(self, text: str, chunk_size: int, delay: float):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    def __iter__(self):
+        pieces = range(0, len(self.text), self.chunk_size)
+        for start in pieces:
+            time.sleep(self.delay / len(pieces))
+            yield _Chunk(self.text[start:start + self.chunk_size])
+
+
+class SlowModel:
+    """Stand-in for the blocking Gemini SDK model"""
+
+    def __init__(self, delay: float, response_text: str = MOCK_RESPONSE, chunk_size: int = 64):
+        self.delay = delay
+        self.response_text = response_text
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        self.prompts.append(prompt)
+        if stream:
+            return _StreamedResponse(self.response_text, self.chunk_size, self.delay)
+        time.sleep(self.delay)
+        response = _SlowResponse()
+        response.text = self.response_text
+        return response
+
+
+@pytest.fixture
+def isolated_app(tmp_path, monkeypatch):
+    """The FastAPI app with a slow mock model and storage, caches and progress in tmp_path"""
+    import main
+    from services.grading_cache import GradingCache
+    from services.progress_store import SQLiteProgressStore
+    from services.single_flight import SingleFlight
+    from services.tail_latency import CircuitBreaker, LatencyTracker
+
+    monkeypatch.chdir(tmp_path)
+    main.storage_service._ensure_directories()
+    monkeypatch.setattr(main.ai_service.provider, "model", SlowModel(delay=1.0))
+    monkeypatch.setattr(main.ai_service, "grading_cache", GradingCache(db_path=str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(main.ai_service, "single_flight", SingleFlight())
+    monkeypatch.setattr(main.ai_service, "breaker", CircuitBreaker(LatencyTracker()))
+    monkeypatch.setattr(main, "progress_store", SQLiteProgressStore(db_path=str(tmp_path / "progress.sqlite3")))
+    return main.app
@@ -1,17 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
 import os
+import tempfile
+import time
 import uuid
-from typing import Optional
+import zipfile
+from functools import partial
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
 import json
+from pydantic import ValidationError
 
-from models import EssayRequest, EssayResponse, GradingResult
-from services.pdf_service import PDFService
+from models import (
+    EssayRequest, EssayResponse, GradingResult, CategoryScore,
+    BatchGradeRequest, BatchItemResult, BatchGradeResponse
+)
+from services.pdf_service import ExtractedText, PDFService
 from services.ai_service import AIService
+from services.essay_sanitizer import EssaySanitizer
 from services.storage_service import StorageService
 from services.pdf_generator import PDFGenerator
+from services.job_queue import JobQueue, QueueFullError
+from services.progress_store import create_progress_store
+from services.rubric import CATEGORY_MAX_SCORES
 
 app = FastAPI(
     title="Essay Grading API",
@@ -31,11 +45,27 @@ app.add_middleware(
 # Initialize services
 pdf_service = PDFService()
 ai_service = AIService()
+essay_sanitizer = EssaySanitizer()
 storage_service = StorageService()
 pdf_generator = PDFGenerator()
 
-# Progress tracking
-progress_tracker = {}
+# Progress tracking (shared across worker processes with the sqlite backend)
+progress_store = create_progress_store()
+TERMINAL_STATUSES = ("completed", "error")
+PROGRESS_STREAM_POLL_SECONDS = float(os.getenv("PROGRESS_STREAM_POLL_SECONDS", "0.25"))
+PROGRESS_STREAM_HEARTBEAT_SECONDS = float(os.getenv("PROGRESS_STREAM_HEARTBEAT_SECONDS", "15"))
+
+# Upload limits shared by the single and batch endpoints
+MAX_PDF_BYTES = 10 * 1024 * 1024
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def stop_pdf_pool():
+    pdf_service.shutdown()
 
 @app.get("/")
 async def root():
@@ -49,101 +79,334 @@ async def health_check():
         "storage_service": "available"
     }}
 
+@app.get("/stats")
+async def get_stats():
+    """
+    Get service statistics (concurrency, cache hit rates)
+    """
+    return {
+        "ai_service": ai_service.get_stats(),
+        "essay_sanitizer": essay_sanitizer.get_stats(),
+        "pdf_service": pdf_service.get_stats(),
+        "job_queue": job_queue.get_stats(),
+        "progress_store": progress_store.get_stats(),
+        "storage_service": storage_service.get_storage_stats()
+    }
+
+def _update_progress(task_id: str, progress: int, message: str, status: Optional[str] = None, **extra):
+    """Update the progress record of a task"""
+    fields = {"progress": progress, "message": message, **extra}
+    if status:
+        fields["status"] = status
+    progress_store.update(task_id, **fields)
+
+def _completion_message(grading_result: GradingResult, extracted: Optional[ExtractedText] = None) -> str:
+    """Status message of a finished grading, flagging degraded fallback results and truncated PDFs"""
+    if grading_result.degraded:
+        return f"AI grading unavailable ({grading_result.degraded_reason}); degraded length-based estimate returned"
+    if extracted is not None and extracted.truncated:
+        return (f"Essay graded successfully; only the first {extracted.words} words "
+                f"({extracted.pages} of {extracted.total_pages} pages) of the PDF were graded")
+    return "Essay graded successfully"
+
+def _category_progress(task_id: str, start: int, end: int):
+    """Progress callback recording streamed category scores between two stages"""
+    category_scores = {}
+    
+    def on_category_score(category: str, score: CategoryScore):
+        category_scores[category] = score.model_dump()
+        done = len(category_scores)
+        _update_progress(
+            task_id,
+            start + (end - start) * done // len(CATEGORY_MAX_SCORES),
+            f"Scored {category} ({done}/{len(CATEGORY_MAX_SCORES)})...",
+            category_scores=dict(category_scores)
+        )
+    
+    return on_category_score
+
+def _set_queue_positions(positions: Dict[str, int]):
+    """Record the queue positions of waiting async tasks in one write"""
+    progress_store.update_many(
+        {
+            task_id: {"queue_position": position, "message": f"Waiting in queue (position {position})..."}
+            for task_id, position in positions.items()
+        },
+        status="queued"
+    )
+
+def _drop_queued_job(task_id: str, temp_file_path: Optional[str] = None):
+    """Fail a queued task the job queue dropped on shutdown and remove its upload"""
+    _update_progress(
+        task_id, 0, "Server shut down before the essay was graded; please resubmit",
+        status="error", queue_position=None
+    )
+    if temp_file_path and os.path.exists(temp_file_path):
+        os.unlink(temp_file_path)
+
+def _start_progress(task_id: str, essay_id: str, message: str, queued: bool = False):
+    """Create the progress record of a new task"""
+    progress_store.create(task_id, {
+        "task_id": task_id,
+        "essay_id": essay_id,
+        "progress": 0,
+        "status": "queued" if queued else "processing",
+        "message": message
+    })
+
+# Background worker pool for async grading jobs
+job_queue = JobQueue(positions_callback=_set_queue_positions)
+
+def _queue_job(task_id: str, essay_id: str, job, temp_file_path: Optional[str] = None) -> JSONResponse:
+    """Queue a grading pipeline and return 202 with the task handles"""
+    try:
+        position = job_queue.submit(task_id, job, on_drop=partial(_drop_queued_job, task_id, temp_file_path))
+    except QueueFullError as e:
+        progress_store.delete(task_id)
+        raise HTTPException(status_code=503, detail=str(e))
+
+    _set_queue_positions({task_id: position})
+    return JSONResponse(status_code=202, content={
+        "essay_id": essay_id,
+        "task_id": task_id,
+        "status": "queued",
+        "queue_position": position,
+        "progress_url": f"/progress/{task_id}",
+        "result_url": f"/results/{essay_id}/json",
+        "message": "Essay queued for grading"
+    })
+
+async def _run_async_job(task_id: str, pipeline):
+    """Run a queued pipeline, recording failures in the progress store"""
+    progress_store.update(task_id, status="processing", queue_position=None)
+    try:
+        await pipeline
+    except HTTPException as e:
+        _update_progress(task_id, 0, e.detail, status="error")
+        raise
+    except Exception as e:
+        _update_progress(task_id, 0, str(e), status="error")
+        raise
+
+async def _grade_text_pipeline(task_id: str, essay_id: str, essay_text: str, rubric_type: Optional[str]) -> EssayResponse:
+    """Grade essay text, generate the annotated PDF and store the results"""
+    try:
+        # Strip watermarks, headers/footers, URLs and metadata before prompting
+        sanitized = essay_sanitizer.sanitize(essay_text)
+        essay_text = sanitized.text
+        
+        # Update progress: Text validation complete
+        _update_progress(
+            task_id, 10, "Text validated, starting AI analysis...", tokens_saved=sanitized.tokens_saved
+        )
+        
+        # Grade essay using AI
+        grading_result = await ai_service.grade_essay(
+            essay_text, rubric_type, on_category_score=_category_progress(task_id, 10, 70)
+        )
+        
+        # Update progress: AI analysis complete
+        _update_progress(task_id, 70, "AI analysis complete, generating PDF...")
+        
+        # Generate annotated PDF (create a simple text-based PDF)
+        annotated_pdf_path = await pdf_generator.create_annotated_pdf_from_text(
+            essay_text=essay_text,
+            grading_result=grading_result,
+            essay_id=essay_id
+        )
+        
+        # Update progress: PDF generation complete
+        _update_progress(task_id, 90, "PDF generated, storing results...")
+        
+        # Store results
+        await storage_service.store_essay_result(
+            essay_id=essay_id,
+            original_text=essay_text,
+            grading_result=grading_result,
+            annotated_pdf_path=annotated_pdf_path
+        )
+        
+        # Update progress: Complete
+        _update_progress(
+            task_id, 100, _completion_message(grading_result),
+            status="completed", result_url=f"/results/{essay_id}/json", degraded=grading_result.degraded
+        )
+        
+        return EssayResponse(
+            essay_id=essay_id,
+            task_id=task_id,
+            overall_score=grading_result.overall_score,
+            category_scores=grading_result.category_scores,
+            summary_feedback=grading_result.summary_feedback,
+            submission_type=grading_result.submission_type,
+            word_count=grading_result.word_count,  # Counted on the server, never by the model
+            examiner_remarks=grading_result.examiner_remarks,
+            degraded=grading_result.degraded,
+            degraded_reason=grading_result.degraded_reason,
+            message=_completion_message(grading_result)
+        )
+        
+    except Exception as e:
+        # Update progress: Error
+        _update_progress(task_id, 0, str(e), status="error")
+        raise e
+
+async def _grade_pdf_pipeline(
+    task_id: str, essay_id: str, temp_file_path: str, rubric_type: Optional[str] = "default"
+) -> EssayResponse:
+    """Extract text from a saved PDF upload, grade it and store the results"""
+    try:
+        # Update progress: PDF processing started
+        _update_progress(task_id, 20, "Extracting text from PDF...")
+        
+        # Extract text from PDF using enhanced service (CPU-bound, so off the event loop);
+        # very long uploads stop at the PDF_MAX_WORDS / PDF_MAX_PAGES caps
+        extracted = await asyncio.to_thread(pdf_service.extract, temp_file_path)
+        essay_text = extracted.text
+        
+        # Update progress: Text extraction complete
+        _update_progress(
+            task_id, 40, "Text extracted, cleaning content...",
+            pages_extracted=extracted.pages, total_pages=extracted.total_pages, input_truncated=extracted.truncated
+        )
+        
+        # Clean the extracted text
+        essay_text = await asyncio.to_thread(pdf_service.clean_text, essay_text)
+        
+        # Strip watermarks, headers/footers, URLs and metadata before prompting
+        sanitized = await asyncio.to_thread(essay_sanitizer.sanitize, essay_text)
+        essay_text = sanitized.text
+        
+        # Update progress: Text cleaning complete
+        _update_progress(
+            task_id, 50, "Content cleaned, starting AI analysis...", tokens_saved=sanitized.tokens_saved
+        )
+        
+    except Exception as e:
+        # Update progress: Error during PDF processing
+        error_msg = f"Failed to extract text from PDF. The system tried enhanced extraction methods including tables and forms. Please ensure the PDF is readable and not corrupted. Error: {str(e)}"
+        _update_progress(task_id, 0, error_msg, status="error")
+        raise HTTPException(status_code=400, detail=error_msg)
+    finally:
+        # Clean up temporary file
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+    
+    if not essay_text or len(essay_text.strip()) < 50:
+        error_msg = "PDF appears to be empty or contains insufficient text (minimum 50 characters required)"
+        _update_progress(task_id, 0, error_msg, status="error")
+        raise HTTPException(status_code=400, detail=error_msg)
+    
+    try:
+        # Update progress: Validation complete
+        _update_progress(task_id, 60, "Content validated, processing with AI...")
+        
+        # Grade essay using AI
+        grading_result = await ai_service.grade_essay(
+            essay_text, rubric_type, on_category_score=_category_progress(task_id, 60, 80)
+        )
+        
+        # Update progress: AI analysis complete
+        _update_progress(task_id, 80, "AI analysis complete, generating PDF...")
+        
+        # Generate annotated PDF
+        annotated_pdf_path = await pdf_generator.create_annotated_pdf(
+            grading_result=grading_result,
+            essay_id=essay_id,
+            extracted_text=essay_text  # Pass the extracted text to show in results
+        )
+        
+        # Update progress: PDF generation complete
+        _update_progress(task_id, 90, "PDF generated, storing results...")
+        
+        # Store results
+        await storage_service.store_essay_result(
+            essay_id=essay_id,
+            original_text=essay_text,
+            grading_result=grading_result,
+            annotated_pdf_path=annotated_pdf_path
+        )
+        
+        # Update progress: Complete
+        _update_progress(
+            task_id, 100, _completion_message(grading_result, extracted),
+            status="completed", result_url=f"/results/{essay_id}/json", degraded=grading_result.degraded
+        )
+        
+    except Exception as e:
+        # Update progress: Error
+        _update_progress(task_id, 0, str(e), status="error")
+        raise e
+    
+    return EssayResponse(
+        essay_id=essay_id,
+        task_id=task_id,
+        overall_score=grading_result.overall_score,
+        category_scores=grading_result.category_scores,
+        summary_feedback=grading_result.summary_feedback,
+        submission_type=grading_result.submission_type,
+        word_count=grading_result.word_count,  # Counted on the server, never by the model
+        examiner_remarks=grading_result.examiner_remarks,
+        degraded=grading_result.degraded,
+        degraded_reason=grading_result.degraded_reason,
+        input_truncated=extracted.truncated,
+        message=_completion_message(grading_result, extracted)
+    )
+
 @app.post("/upload-essay", response_model=EssayResponse)
-async def upload_essay(request: EssayRequest):
+async def upload_essay(request: EssayRequest, async_mode: bool = Query(False, alias="async")):
     """
     Upload essay text and get it graded with annotations
+    
+    Set rubric_type to "quick" for scores with short feedback, served faster.
+    
+    With ?async=true the essay is queued and 202 is returned immediately;
+    poll /progress/{task_id} and fetch /results/{essay_id}/json when completed.
     """
     try:
         # Generate unique essay ID and task ID
         essay_id = str(uuid.uuid4())
         task_id = str(uuid.uuid4())
         
-        # Initialize progress tracking
-        progress_tracker[task_id] = {
-            "task_id": task_id,
-            "essay_id": essay_id,
-            "progress": 0,
-            "status": "processing",
-            "message": "Starting essay analysis..."
-        }
-        
         # Validate essay text
         if not request.essay_text or len(request.essay_text.strip()) < 50:
             raise HTTPException(status_code=400, detail="Essay must be at least 50 characters long")
         
-        # Calculate actual word count from essay text
-        actual_word_count = pdf_service.get_word_count(request.essay_text)
+        # Initialize progress tracking
+        _start_progress(task_id, essay_id, "Starting essay analysis...", queued=async_mode)
         
-        try:
-            # Update progress: Text validation complete
-            progress_tracker[task_id]["progress"] = 10
-            progress_tracker[task_id]["message"] = "Text validated, starting AI analysis..."
-            
-            # Grade essay using AI
-            grading_result = await ai_service.grade_essay(request.essay_text)
-            
-            # Update progress: AI analysis complete
-            progress_tracker[task_id]["progress"] = 70
-            progress_tracker[task_id]["message"] = "AI analysis complete, generating PDF..."
-            
-            # Generate annotated PDF (create a simple text-based PDF)
-            annotated_pdf_path = await pdf_generator.create_annotated_pdf_from_text(
-                essay_text=request.essay_text,
-                grading_result=grading_result,
-                essay_id=essay_id
-            )
-            
-            # Update progress: PDF generation complete
-            progress_tracker[task_id]["progress"] = 90
-            progress_tracker[task_id]["message"] = "PDF generated, storing results..."
-            
-            # Store results
-            await storage_service.store_essay_result(
-                essay_id=essay_id,
-                original_text=request.essay_text,
-                grading_result=grading_result,
-                annotated_pdf_path=annotated_pdf_path
-            )
-            
-            # Update progress: Complete
-            progress_tracker[task_id]["progress"] = 100
-            progress_tracker[task_id]["status"] = "completed"
-            progress_tracker[task_id]["message"] = "Analysis completed successfully!"
-            
-            return EssayResponse(
-                essay_id=essay_id,
-                task_id=task_id,
-                overall_score=grading_result.overall_score,
-                category_scores=grading_result.category_scores,
-                summary_feedback=grading_result.summary_feedback,
-                submission_type=grading_result.submission_type,
-                word_count=actual_word_count,  # Use actual word count instead of AI response
-                examiner_remarks=grading_result.examiner_remarks,
-                message="Essay graded successfully"
-            )
-            
-        except Exception as e:
-            # Update progress: Error
-            progress_tracker[task_id]["progress"] = 0
-            progress_tracker[task_id]["status"] = "error"
-            progress_tracker[task_id]["message"] = str(e)
-            raise e
+        if async_mode:
+            return _queue_job(task_id, essay_id, lambda: _run_async_job(
+                task_id, _grade_text_pipeline(task_id, essay_id, request.essay_text, request.rubric_type)
+            ))
         
+        return await _grade_text_pipeline(task_id, essay_id, request.essay_text, request.rubric_type)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing essay: {str(e)}")
 
 @app.post("/upload-pdf", response_model=EssayResponse)
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(
+    file: UploadFile = File(...),
+    rubric_type: str = Form("default"),
+    async_mode: bool = Query(False, alias="async")
+):
     """
     Upload a PDF essay and get it graded with annotations
+    
+    Set the rubric_type form field to "quick" for scores with short feedback.
+    
+    With ?async=true the PDF is queued and 202 is returned immediately;
+    poll /progress/{task_id} and fetch /results/{essay_id}/json when completed.
     """
     try:
         # Validate file
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are accepted")
         
-        if file.size > 10 * 1024 * 1024:  # 10MB limit
+        if file.size > MAX_PDF_BYTES:  # 10MB limit
             raise HTTPException(status_code=400, detail="File size must be less than 10MB")
         
         # Generate unique essay ID and task ID
@@ -151,117 +414,172 @@ async def upload_pdf(file: UploadFile = File(...)):
         task_id = str(uuid.uuid4())
         
         # Initialize progress tracking
-        progress_tracker[task_id] = {
-            "task_id": task_id,
-            "essay_id": essay_id,
-            "progress": 0,
-            "status": "processing",
-            "message": "Starting PDF analysis..."
-        }
-        
-        # Save uploaded file temporarily
-        import tempfile
+        _start_progress(task_id, essay_id, "Starting PDF analysis...", queued=async_mode)
         
+        # Save uploaded file temporarily (removed by the pipeline once extracted)
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
             content = await file.read()
             temp_file.write(content)
             temp_file_path = temp_file.name
         
-        try:
-            # Update progress: PDF processing started
-            progress_tracker[task_id]["progress"] = 20
-            progress_tracker[task_id]["message"] = "Extracting text from PDF..."
-            
-            # Extract text from PDF using enhanced service
-            essay_text = pdf_service.extract_text_from_pdf(temp_file_path)
-            
-            # Update progress: Text extraction complete
-            progress_tracker[task_id]["progress"] = 40
-            progress_tracker[task_id]["message"] = "Text extracted, cleaning content..."
-            
-            # Clean the extracted text
-            essay_text = pdf_service.clean_text(essay_text)
-            
-            # Calculate actual word count from essay text
-            actual_word_count = pdf_service.get_word_count(essay_text)
-            
-            # Update progress: Text cleaning complete
-            progress_tracker[task_id]["progress"] = 50
-            progress_tracker[task_id]["message"] = "Content cleaned, starting AI analysis..."
-            
-        except Exception as e:
-            # Update progress: Error during PDF processing
-            progress_tracker[task_id]["progress"] = 0
-            progress_tracker[task_id]["status"] = "error"
-            error_msg = f"Failed to extract text from PDF. The system tried enhanced extraction methods including tables and forms. Please ensure the PDF is readable and not corrupted. Error: {str(e)}"
-            progress_tracker[task_id]["message"] = error_msg
-            raise HTTPException(status_code=400, detail=error_msg)
-        finally:
-            # Clean up temporary file
-            import os
-            if os.path.exists(temp_file_path):
+        if async_mode:
+            try:
+                return _queue_job(task_id, essay_id, lambda: _run_async_job(
+                    task_id, _grade_pdf_pipeline(task_id, essay_id, temp_file_path, rubric_type)
+                ), temp_file_path)
+            except HTTPException:
                 os.unlink(temp_file_path)
+                raise
         
-        if not essay_text or len(essay_text.strip()) < 50:
-            raise HTTPException(status_code=400, detail="PDF appears to be empty or contains insufficient text (minimum 50 characters required)")
+        return await _grade_pdf_pipeline(task_id, essay_id, temp_file_path, rubric_type)
         
-        try:
-            # Update progress: Validation complete
-            progress_tracker[task_id]["progress"] = 60
-            progress_tracker[task_id]["message"] = "Content validated, processing with AI..."
-            
-            # Grade essay using AI
-            grading_result = await ai_service.grade_essay(essay_text)
-            
-            # Update progress: AI analysis complete
-            progress_tracker[task_id]["progress"] = 80
-            progress_tracker[task_id]["message"] = "AI analysis complete, generating PDF..."
-            
-            # Generate annotated PDF
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing essay: {str(e)}")
+
+def _extract_zip_pdf(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> str:
+    """Extract and clean the text of one PDF of a batch archive"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
+        temp_file.write(archive.read(info))
+        temp_file_path = temp_file.name
+    try:
+        return pdf_service.clean_text(pdf_service.extract_text_from_pdf(temp_file_path))
+    finally:
+        os.unlink(temp_file_path)
+
+def _read_zip_essays(content: bytes) -> List[Tuple[Optional[str], Optional[str], Optional[str]]]:
+    """
+    Extract the essays of a zip archive of PDFs
+    
+    Returns:
+        (filename, essay text, error) per PDF, in archive order
+    """
+    try:
+        archive = zipfile.ZipFile(BytesIO(content))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Upload is not a valid zip archive")
+    
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.pdf')
+            and not info.filename.startswith('__MACOSX/')
+        ]
+        if not members:
+            raise HTTPException(status_code=400, detail="The zip archive contains no PDF files")
+        if len(members) > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} essays")
+        
+        essays = []
+        for info in members:
+            if info.file_size > MAX_PDF_BYTES:
+                essays.append((info.filename, None, "File size must be less than 10MB"))
+                continue
+            try:
+                essays.append((info.filename, _extract_zip_pdf(archive, info), None))
+            except Exception as e:
+                essays.append((info.filename, None, f"Failed to extract text from PDF: {str(e)}"))
+        return essays
+
+async def _store_batch_item(
+    index: int, filename: Optional[str], essay_text: str, grading_result: GradingResult
+) -> BatchItemResult:
+    """Generate the annotated PDF of one batch essay and store it as a normal result"""
+    essay_id = str(uuid.uuid4())
+    try:
+        if filename:
             annotated_pdf_path = await pdf_generator.create_annotated_pdf(
-                grading_result=grading_result,
-                essay_id=essay_id,
-                extracted_text=essay_text  # Pass the extracted text to show in results
+                grading_result=grading_result, essay_id=essay_id, extracted_text=essay_text
             )
-            
-            # Update progress: PDF generation complete
-            progress_tracker[task_id]["progress"] = 90
-            progress_tracker[task_id]["message"] = "PDF generated, storing results..."
-            
-            # Store results
-            await storage_service.store_essay_result(
-                essay_id=essay_id,
-                original_text=essay_text,
-                grading_result=grading_result,
-                annotated_pdf_path=annotated_pdf_path
+        else:
+            annotated_pdf_path = await pdf_generator.create_annotated_pdf_from_text(
+                essay_text=essay_text, grading_result=grading_result, essay_id=essay_id
             )
-            
-            # Update progress: Complete
-            progress_tracker[task_id]["progress"] = 100
-            progress_tracker[task_id]["status"] = "completed"
-            progress_tracker[task_id]["message"] = "Analysis completed successfully!"
-            
-        except Exception as e:
-            # Update progress: Error
-            progress_tracker[task_id]["progress"] = 0
-            progress_tracker[task_id]["status"] = "error"
-            progress_tracker[task_id]["message"] = str(e)
-            raise e
-        
-        return EssayResponse(
+        await storage_service.store_essay_result(
             essay_id=essay_id,
-            task_id=task_id,
-            overall_score=grading_result.overall_score,
-            category_scores=grading_result.category_scores,
-            summary_feedback=grading_result.summary_feedback,
-            submission_type=grading_result.submission_type,
-            word_count=actual_word_count,  # Use actual word count instead of AI response
-            examiner_remarks=grading_result.examiner_remarks,
-            message="Essay graded successfully"
+            original_text=essay_text,
+            grading_result=grading_result,
+            annotated_pdf_path=annotated_pdf_path
+        )
+    except Exception as e:
+        return BatchItemResult(index=index, filename=filename, status="error", error=f"Error storing result: {str(e)}")
+    
+    return BatchItemResult(
+        index=index,
+        filename=filename,
+        status="completed",
+        essay_id=essay_id,
+        overall_score=grading_result.overall_score,
+        submission_type=grading_result.submission_type,
+        word_count=grading_result.word_count,
+        degraded=grading_result.degraded,
+        result_url=f"/results/{essay_id}/json"
+    )
+
+@app.post("/grade-batch", response_model=BatchGradeResponse)
+async def grade_batch(request: Request):
+    """
+    Grade many essays in one request
+    
+    Send either JSON ({"essays": [...], "rubric_type": ...}) or a multipart
+    form with a zip archive of PDFs as "file" (and optionally "rubric_type").
+    Short essays are packed several to a model call; every essay is stored
+    as a normal result, and the response reports the status of each item.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or not hasattr(upload, "read") or not upload.filename.lower().endswith('.zip'):
+                raise HTTPException(status_code=400, detail="Upload a zip archive of PDFs as 'file'")
+            rubric_type = form.get("rubric_type") or "default"
+            essays = await asyncio.to_thread(_read_zip_essays, await upload.read())
+        else:
+            try:
+                batch_request = BatchGradeRequest(**await request.json())
+            except (ValueError, TypeError, ValidationError) as e:
+                raise HTTPException(status_code=422, detail=f"Invalid batch request: {str(e)}")
+            if not batch_request.essays:
+                raise HTTPException(status_code=400, detail="The batch contains no essays")
+            if len(batch_request.essays) > BATCH_MAX_ITEMS:
+                raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} essays")
+            rubric_type = batch_request.rubric_type
+            essays = [(None, essay_text, None) for essay_text in batch_request.essays]
+        
+        items: List[Optional[BatchItemResult]] = [None] * len(essays)
+        gradable = []
+        for index, (filename, essay_text, error) in enumerate(essays):
+            if error is None and (not essay_text or len(essay_text.strip()) < 50):
+                error = "Essay must be at least 50 characters long"
+            if error:
+                items[index] = BatchItemResult(index=index, filename=filename, status="error", error=error)
+                continue
+            # Strip watermarks, headers/footers, URLs and metadata before prompting
+            sanitized = await asyncio.to_thread(essay_sanitizer.sanitize, essay_text)
+            gradable.append((index, filename, sanitized.text))
+        
+        grading_results = await ai_service.grade_essays([text for _, _, text in gradable], rubric_type)
+        stored = await asyncio.gather(*(
+            _store_batch_item(index, filename, text, grading_result)
+            for (index, filename, text), grading_result in zip(gradable, grading_results)
+        ))
+        for item in stored:
+            items[item.index] = item
+        
+        completed = sum(1 for item in items if item.status == "completed")
+        return BatchGradeResponse(
+            items=items,
+            total=len(items),
+            completed=completed,
+            failed=len(items) - completed,
+            message=f"Graded {completed} of {len(items)} essays"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing essay: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
 
 @app.get("/results/{essay_id}")
 async def get_results(essay_id: str):
@@ -294,15 +612,88 @@ async def get_progress(task_id: str):
     Get progress status for a task
     """
     try:
-        if task_id not in progress_tracker:
+        record = progress_store.get(task_id)
+        if record is None:
             raise HTTPException(status_code=404, detail="Task not found")
         
-        return progress_tracker[task_id]
+        return record
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving progress: {str(e)}")
 
+async def _progress_events(task_id: str, last_seq: int = 0):
+    """Yield progress snapshots from the shared store until the task finishes"""
+    idle_since = time.monotonic()
+    while True:
+        events = progress_store.get_events(task_id, after_seq=last_seq)
+        for seq, record in events:
+            last_seq = seq
+            yield seq, record
+            if record.get("status") in TERMINAL_STATUSES:
+                return
+        
+        if events:
+            idle_since = time.monotonic()
+        elif progress_store.get(task_id) is None:
+            return
+        elif time.monotonic() - idle_since > PROGRESS_STREAM_HEARTBEAT_SECONDS:
+            idle_since = time.monotonic()
+            yield None, None
+        
+        await asyncio.sleep(PROGRESS_STREAM_POLL_SECONDS)
+
+@app.get("/progress/{task_id}/stream")
+async def stream_progress(task_id: str, request: Request):
+    """
+    Stream progress updates for a task as Server-Sent Events
+    
+    Each stage transition is sent as a `progress` event; the stream closes once
+    the task is completed or has failed. Reconnecting clients resume from the
+    Last-Event-ID header.
+    """
+    if progress_store.get(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    try:
+        last_seq = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_seq = 0
+    
+    async def event_source():
+        async for seq, record in _progress_events(task_id, last_seq):
+            if seq is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"id: {seq}\nevent: progress\ndata: {json.dumps(record)}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/progress/{task_id}/ws")
+async def websocket_progress(websocket: WebSocket, task_id: str):
+    """
+    Push progress updates for a task over a WebSocket
+    
+    Sends one JSON message per stage transition and closes once the task is
+    completed or has failed.
+    """
+    await websocket.accept()
+    if progress_store.get(task_id) is None:
+        await websocket.close(code=4404, reason="Task not found")
+        return
+    
+    try:
+        async for seq, record in _progress_events(task_id):
+            if seq is not None:
+                await websocket.send_json(record)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/results/{essay_id}/json")
 async def get_results_json(essay_id: str):
     """
@@ -321,6 +712,9 @@ async def get_results_json(essay_id: str):
             "submission_type": result['grading_result']['submission_type'],
             "word_count": result['grading_result']['word_count'],
             "examiner_remarks": result['grading_result']['examiner_remarks'],
+            # Results stored before degraded grading existed are full AI gradings
+            "degraded": result['grading_result'].get('degraded', False),
+            "degraded_reason": result['grading_result'].get('degraded_reason'),
             "graded_at": result['graded_at']
         }
         
@@ -13,10 +13,12 @@ class GradingResult(BaseModel):
     submission_type: str = Field(..., description="Submission type (A/B/C/D/E/F/G)")
     word_count: int = Field(..., description="Actual word count of the essay")
     examiner_remarks: Dict[str, list] = Field(..., description="Examiner remarks with strengths, weaknesses, and suggestions")
+    degraded: bool = Field(False, description="True when AI grading was unavailable and this is a length-based estimate")
+    degraded_reason: Optional[str] = Field(None, description="Why the result is degraded (provider_error or circuit_open)")
 
 class EssayRequest(BaseModel):
     essay_text: Optional[str] = Field(None, description="Essay text (if not uploading PDF)")
-    rubric_type: Optional[str] = Field("default", description="Type of rubric to use")
+    rubric_type: Optional[str] = Field("default", description='Type of rubric to use ("default", or "quick" for scores with short feedback)')
 
 class EssayResponse(BaseModel):
     essay_id: str = Field(..., description="Unique identifier for the essay")
@@ -27,6 +29,32 @@ class EssayResponse(BaseModel):
     submission_type: str = Field(..., description="Submission type (A/B/C/D/E/F/G)")
     word_count: int = Field(..., description="Actual word count")
     examiner_remarks: Dict[str, list] = Field(..., description="Examiner remarks")
+    degraded: bool = Field(False, description="True when AI grading was unavailable and this is a length-based estimate")
+    degraded_reason: Optional[str] = Field(None, description="Why the result is degraded (provider_error or circuit_open)")
+    input_truncated: bool = Field(False, description="True when extraction stopped at the word or page cap of a long PDF")
+    message: str = Field(..., description="Status message")
+
+class BatchGradeRequest(BaseModel):
+    essays: List[str] = Field(..., description="Essay texts to grade")
+    rubric_type: Optional[str] = Field("default", description='Type of rubric to use ("default", or "quick" for scores with short feedback)')
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the essay in the request (or in the zip archive)")
+    filename: Optional[str] = Field(None, description="PDF name inside the zip archive")
+    status: str = Field(..., description="completed or error")
+    essay_id: Optional[str] = Field(None, description="Unique identifier of the stored result")
+    overall_score: Optional[int] = Field(None, description="Overall score out of 100")
+    submission_type: Optional[str] = Field(None, description="Submission type (A/B/C/D/E/F/G)")
+    word_count: Optional[int] = Field(None, description="Actual word count")
+    degraded: bool = Field(False, description="True when AI grading was unavailable and this is a length-based estimate")
+    result_url: Optional[str] = Field(None, description="Where to fetch the full result")
+    error: Optional[str] = Field(None, description="Why the item could not be graded")
+
+class BatchGradeResponse(BaseModel):
+    items: List[BatchItemResult] = Field(..., description="Per-essay status, in request order")
+    total: int = Field(..., description="Number of essays received")
+    completed: int = Field(..., description="Number of essays graded and stored")
+    failed: int = Field(..., description="Number of essays that could not be graded")
     message: str = Field(..., description="Status message")
 
 class EssayResult(BaseModel):
@@ -1,57 +1,546 @@
-import google.generativeai as genai
+import asyncio
 import json
 import logging
 import os
-from typing import Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
 from models import GradingResult, CategoryScore
+from services.rubric import (
+    CATEGORIES, CATEGORY_GROUPS, MODEL_CATEGORIES, QUICK_RUBRIC, is_compact_response, expand_compact_response,
+    expand_category, merge_compact_responses, restrict_compact_response, score_word_count
+)
+from services.stream_parser import CategoryStreamParser
+from services.grading_cache import GradingCache
+from services.single_flight import SingleFlight
+from services.pre_screen import PreScreen
+from services.essay_sanitizer import estimate_tokens, fit_token_budget
+from services.grading_provider import GradingProvider, create_provider
+from services.outbound_scheduler import OutboundScheduler, is_throttle_error
+from services.tail_latency import CircuitBreaker, CircuitOpenError, HedgingPolicy, LatencyTracker
+from services.essay_batcher import (
+    BATCH_RESPONSE_FORMAT, QUICK_BATCH_RESPONSE_FORMAT, build_batch_payload, pack_essays, parse_batch_response
+)
 
 logger = logging.getLogger(__name__)
 
+# Output instructions for the legacy free-form JSON response
+LEGACY_OUTPUT_FORMAT = """Step 6 — Output Format (must follow exactly)
+
+Total Marks: /100
+
+1. Thesis: x/10 — Comment: …
+2. Outline: x/10 — Comment: …
+3. Structure: x/15 — Comment: …
+4. Content: x/20 — Comment: …
+5. Language: x/15 — Comment: …
+6. Critical Thinking: x/5 — Comment: …
+7. Conclusion: x/10 — Comment: …
+
+Final Remarks:
+Strengths: …
+Weaknesses: …
+Suggestions: …"""
+
+LEGACY_RESPONSE_FORMAT = """Return ONLY this JSON format:
+{
+  "overall_score": <numeric total out of 100>,
+  "category_scores": {
+    "Thesis & Topic Understanding": {"score": <0-10>, "feedback": "<string>"},
+    "Outline Quality": {"score": <0-10>, "feedback": "<string>"},
+    "Structure & Coherence": {"score": <0-15>, "feedback": "<string>"},
+    "Content Depth, Balance & Relevance": {"score": <0-20>, "feedback": "<string>"},
+    "Language Proficiency & Expression": {"score": <0-15>, "feedback": "<string>"},
+    "Critical Thinking & Analytical Reasoning": {"score": <0-5>, "feedback": "<string>"},
+    "Conclusion": {"score": <0-10>, "feedback": "<string>"}
+  },
+  "summary_feedback": "<Overall feedback paragraph for the student>",
+  "submission_type": "<A/B/C/D/E/F/G>",
+  "examiner_remarks": {
+    "strengths": ["<strength1>", "<strength2>"],
+    "weaknesses": ["<weakness1>", "<weakness2>"],
+    "suggestions": ["<suggestion1>", "<suggestion2>"]
+  }
+}"""
+
+# Output instructions for the compact, schema-constrained JSON response
+COMPACT_OUTPUT_FORMAT = """Step 6 — Output Format (must follow exactly)
+
+Respond with JSON only, using these short keys:
+c = section marks, each {"s": marks, "f": concise comment}: th = Thesis /10, ol = Outline /10, st = Structure /15, ct = Content /20, lg = Language /15, cr = Critical Thinking /5, cn = Conclusion /10
+sf = overall feedback paragraph for the student
+t = submission type (A/B/C/D/E/F/G)
+r = final remarks: s = strengths, w = weaknesses, g = suggestions (lists of short strings)"""
+
+COMPACT_RESPONSE_FORMAT = """Return ONLY this JSON format:
+{"c": {"th": {"s": 0, "f": ""}, "ol": {"s": 0, "f": ""}, "st": {"s": 0, "f": ""}, "ct": {"s": 0, "f": ""}, "lg": {"s": 0, "f": ""}, "cr": {"s": 0, "f": ""}, "cn": {"s": 0, "f": ""}}, "sf": "", "t": "", "r": {"s": [], "w": [], "g": []}}"""
+
+# Output instructions of the quick-grade tier: marks with one-line comments, no final remarks
+QUICK_OUTPUT_FORMAT = """Step 6 — Output Format (must follow exactly)
+
+This is a quick grade: marks with very short feedback. Keep the whole reply brief.
+
+Respond with JSON only, using these short keys:
+c = section marks, each {"s": marks, "f": one-line comment of at most 12 words}: th = Thesis /10, ol = Outline /10, st = Structure /15, ct = Content /20, lg = Language /15, cr = Critical Thinking /5, cn = Conclusion /10
+sf = one short summary paragraph for the student (at most 60 words)
+t = submission type (A/B/C/D/E/F/G)"""
+
+QUICK_RESPONSE_FORMAT = """Return ONLY this JSON format:
+{"c": {"th": {"s": 0, "f": ""}, "ol": {"s": 0, "f": ""}, "st": {"s": 0, "f": ""}, "ct": {"s": 0, "f": ""}, "lg": {"s": 0, "f": ""}, "cr": {"s": 0, "f": ""}, "cn": {"s": 0, "f": ""}}, "sf": "", "t": ""}"""
+
+def build_group_output_format(categories: Sequence[str]) -> Tuple[str, str]:
+    """Output and response format instructions of a call marking only some categories (fan-out mode)"""
+    sections = ", ".join(f"{CATEGORIES[key][0]} /{CATEGORIES[key][1]}" for key in categories)
+    keys = ", ".join(f"{key} = {CATEGORIES[key][0]} /{CATEGORIES[key][1]}" for key in categories)
+    template = ", ".join(f'"{key}": {{"s": 0, "f": ""}}' for key in categories)
+    
+    output_format = f"""Step 6 — Output Format (must follow exactly)
+
+This evaluation marks only these sections: {sections}. The other sections are marked separately; still read the whole submission and classify its submission type.
+
+Respond with JSON only, using these short keys:
+c = section marks, each {{"s": marks, "f": concise comment}}: {keys}
+sf = short feedback paragraph on these sections only
+t = submission type (A/B/C/D/E/F/G)
+r = final remarks on these sections: s = strengths, w = weaknesses, g = suggestions (lists of short strings)"""
+    response_format = f"""Return ONLY this JSON format:
+{{"c": {{{template}}}, "sf": "", "t": "", "r": {{"s": [], "w": [], "g": []}}}}"""
+    return output_format, response_format
+
+# Bumped whenever prompt or server-side scoring changes invalidate cached results
+SCORING_VERSION = 2
+
 class AIService:
-    """Service for AI-powered essay grading using Google Gemini"""
+    """Service for AI-powered essay grading (Google Gemini or another GradingProvider)"""
     
-    def __init__(self):
-        # Initialize Gemini client
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    def __init__(self, provider: Optional[GradingProvider] = None):
+        # Structured-output mode constrains the reply to a compact JSON schema
+        self.structured_output = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() == "true"
+        
+        # Model backend: Gemini (one key or a pool), or another GRADING_PROVIDER
+        self.provider = provider or create_provider(self.structured_output)
+        self.model_name = self.provider.model_name
+        
+        # Streaming generation publishes each category score as soon as it is complete
+        self.streaming = os.getenv("GEMINI_STREAMING", "true").lower() == "true"
+        self._score_listeners: Dict[str, List[Callable[[str, CategoryScore], None]]] = {}
+        self._partial_scores: Dict[str, Dict[str, CategoryScore]] = {}
+        
+        # The SDK call is blocking, so it runs on a bounded thread pool; the
+        # outbound scheduler caps calls in flight, enforces the RPM/TPM quota,
+        # backs off on 429/503 and serves interactive calls before batch ones.
+        # A call keeps its scheduler slot until its thread returns, so threads
+        # left behind by timeouts and lost hedges never starve admitted calls
+        self.max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+        self.call_threads = int(os.getenv("GEMINI_CALL_THREADS", "0")) or 2 * self.max_concurrency
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(self.call_threads, self.max_concurrency),
+            thread_name_prefix="gemini-call"
+        )
+        # A key pool raises the RPM/TPM limits to the sum of its members' quotas
+        self.scheduler = OutboundScheduler(self.max_concurrency, *(self.provider.quota() or (None, None)))
+        self.expected_output_tokens = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "1200"))
+        # rubric_type "quick": short feedback, hard output cap, served ahead of full gradings
+        self.quick_max_output_tokens = int(os.getenv("GEMINI_QUICK_MAX_OUTPUT_TOKENS", "400"))
+        self.in_flight = 0
+        
+        # Tail-latency control from observed call latencies: slow calls are
+        # hedged with a duplicate, hung ones time out, and a failing provider
+        # trips the circuit breaker so requests fail fast to a degraded result
+        self.latency = LatencyTracker()
+        self.hedging = HedgingPolicy(self.latency)
+        self.breaker = CircuitBreaker(self.latency)
+        
+        # Call statistics for latency and token reporting
+        self.call_count = 0
+        self.total_latency = 0.0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.parse_failures = 0
+        self.first_score_count = 0
+        self.total_first_score_latency = 0.0
+        
+        # Parsed results are cached by essay content so resubmissions skip the API;
+        # lookups and stores are SQLite I/O, so they run off the event loop
+        self.grading_cache = GradingCache()
+        self.single_flight = SingleFlight()
+        
+        # Prompt token budget for the essay; longer submissions lose middle paragraphs
+        self.token_budget = int(os.getenv("ESSAY_TOKEN_BUDGET", "8000"))
+        
+        # Local Step 0-3 rules: fragments and invalid submissions never reach Gemini
+        self.pre_screen = PreScreen()
+        
+        # Batch grading packs several short essays into one call under a token budget
+        self.batch_token_budget = int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", "12000"))
+        self.batch_max_essays = int(os.getenv("GEMINI_BATCH_MAX_ESSAYS", "8"))
+        self.batch_calls = 0
+        self.batch_essays = 0
+        self.batch_fallbacks = 0
+        self.batch_calls_saved = 0
+        self.batch_tokens_saved = 0
+        
+        # Category fan-out: long essays are marked by one concurrent call per
+        # category group (compact structured output only), then merged
+        self.category_fanout = os.getenv("GEMINI_CATEGORY_FANOUT", "false").lower() == "true"
+        self.fanout_min_words = int(os.getenv("GEMINI_FANOUT_MIN_WORDS", "1500"))
+        self.fanout_gradings = 0
     
-    async def grade_essay(self, essay_text: str, rubric_type: str = "default") -> GradingResult:
+    async def grade_essay(
+        self,
+        essay_text: str,
+        rubric_type: str = "default",
+        on_category_score: Optional[Callable[[str, CategoryScore], None]] = None,
+        priority: str = "interactive"
+    ) -> GradingResult:
         """
         Grade an essay using AI
         
         Args:
             essay_text: The essay text to grade
             rubric_type: Type of rubric to use
+            on_category_score: Called with (category name, score) as each category
+                is completed while the response is still streaming
+            priority: Outbound queue priority, "interactive" or "batch"; interactive
+                quick grades (rubric_type "quick") are served ahead of full ones
             
         Returns:
             GradingResult with scores and feedback
         """
+        screen = self.pre_screen.screen(essay_text)
+        if screen.grading_result is not None:
+            if on_category_score:
+                for category, score in screen.grading_result.category_scores.items():
+                    on_category_score(category, score)
+            return screen.grading_result
+        
+        cache_key = self.grading_cache.make_key(essay_text, rubric_type, f"{self.model_name}/v{SCORING_VERSION}")
+        cached_result = await asyncio.to_thread(self.grading_cache.get, cache_key)
+        if cached_result:
+            logger.info(f"Returning cached grading result with overall score: {cached_result.overall_score}")
+            return cached_result
+        
+        if on_category_score:
+            self._add_score_listener(cache_key, on_category_score)
+        
+        if rubric_type == QUICK_RUBRIC and priority == "interactive":
+            priority = "quick"
+        
         try:
-            # Build the prompt based on rubric type
-            prompt = self._build_grading_prompt(essay_text, rubric_type)
+            # Identical essays graded concurrently share a single API call
+            grading_result = await self.single_flight.do(
+                cache_key, lambda: self._grade_uncached(essay_text, rubric_type, cache_key, priority)
+            )
+            return grading_result.model_copy(deep=True)
             
+        except Exception as e:
+            logger.error(f"Error grading essay: {e}")
+            # Return fallback result if AI fails
+            reason = "circuit_open" if isinstance(e, CircuitOpenError) else "provider_error"
+            return self._create_fallback_result(essay_text, reason)
+        
+        finally:
+            if on_category_score:
+                self._remove_score_listener(cache_key, on_category_score)
+    
+    async def grade_essays(
+        self,
+        essay_texts: List[str],
+        rubric_type: str = "default",
+        priority: str = "batch"
+    ) -> List[GradingResult]:
+        """
+        Grade several essays, packing short ones into shared calls
+        
+        Pre-screened and cached essays never reach the model, and duplicates
+        are graded once. The rest are packed in order under the batch token
+        budget; each pack is one call whose response holds a grading per essay
+        index. Essays missing from a response, and every essay of a failed
+        call, are regraded one by one through grade_essay.
+        
+        Args:
+            essay_texts: The essay texts to grade
+            rubric_type: Type of rubric to use
+            priority: Outbound queue priority, "interactive" or "batch"
+            
+        Returns:
+            GradingResult per essay, in input order
+        """
+        results: List[Optional[GradingResult]] = [None] * len(essay_texts)
+        pending: Dict[str, List[int]] = {}
+        for position, essay_text in enumerate(essay_texts):
+            screen = self.pre_screen.screen(essay_text)
+            if screen.grading_result is not None:
+                results[position] = screen.grading_result
+                continue
+            cache_key = self.grading_cache.make_key(essay_text, rubric_type, f"{self.model_name}/v{SCORING_VERSION}")
+            cached_result = await asyncio.to_thread(self.grading_cache.get, cache_key)
+            if cached_result:
+                results[position] = cached_result
+                continue
+            pending.setdefault(cache_key, []).append(position)
+        
+        keys = list(pending)
+        texts = [essay_texts[pending[key][0]] for key in keys]
+        packs = pack_essays(
+            [estimate_tokens(self._build_essay_payload(text)) for text in texts],
+            self.batch_token_budget,
+            self.batch_max_essays
+        )
+        graded = await asyncio.gather(*(
+            self._grade_pack([(keys[i], texts[i]) for i in pack], rubric_type, priority)
+            for pack in packs
+        ))
+        
+        for pack, pack_results in zip(packs, graded):
+            for i, grading_result in zip(pack, pack_results):
+                for position in pending[keys[i]]:
+                    results[position] = grading_result.model_copy(deep=True)
+        return results
+    
+    async def _grade_pack(
+        self, essays: List[Tuple[str, str]], rubric_type: str, priority: str
+    ) -> List[GradingResult]:
+        """Grade a pack of (cache key, essay text) with a single call, regrading what it misses"""
+        if len(essays) == 1:
+            return [await self.grade_essay(essays[0][1], rubric_type, priority=priority)]
+        
+        instructions = self._build_rubric_instructions(rubric_type, batch=True)
+        prompt = build_batch_payload([
+            (len(essay_text.split()), fit_token_budget(essay_text, self.token_budget))
+            for _, essay_text in essays
+        ])
+        try:
+            parsed = parse_batch_response(
+                await self._call_gemini(
+                    prompt, instructions=instructions, priority=priority, batch_size=len(essays),
+                    options={"quick": True} if rubric_type == QUICK_RUBRIC else None
+                )
+            )
+        except Exception as e:
+            logger.error(f"Batch grading call failed, regrading {len(essays)} essays one by one: {e}")
+            parsed = {}
+        
+        results = []
+        batched = []
+        for index, (cache_key, essay_text) in enumerate(essays):
+            grading_result = None
+            if index in parsed:
+                try:
+                    grading_result = self._grading_result_from_data(parsed[index])
+                except Exception as e:
+                    self.parse_failures += 1
+                    logger.error(f"Error parsing batch entry {index}: {e}")
+            if grading_result is None:
+                self.batch_fallbacks += 1
+                results.append(await self.grade_essay(essay_text, rubric_type, priority=priority))
+                continue
+            
+            word_count = len(essay_text.split())
+            grading_result = self.pre_screen.apply_short_essay_gate(grading_result, word_count)
+            grading_result = self._apply_local_scores(grading_result, word_count)
+            await asyncio.to_thread(self.grading_cache.set, cache_key, grading_result)
+            results.append(grading_result)
+            batched.append(essay_text)
+        
+        if batched:
+            # Against one call per essay, each resending the full rubric
+            single_instructions = estimate_tokens(self._build_rubric_instructions(rubric_type))
+            single_tokens = sum(single_instructions + estimate_tokens(self._build_essay_payload(text)) for text in batched)
+            self.batch_calls += 1
+            self.batch_essays += len(batched)
+            self.batch_calls_saved += len(batched) - 1
+            self.batch_tokens_saved += max(0, single_tokens - estimate_tokens(instructions + prompt))
+        return results
+    
+    def _add_score_listener(self, cache_key: str, listener: Callable[[str, CategoryScore], None]) -> None:
+        """Subscribe to streamed category scores, replaying those already received"""
+        self._score_listeners.setdefault(cache_key, []).append(listener)
+        for category, score in self._partial_scores.get(cache_key, {}).items():
+            listener(category, score)
+    
+    def _remove_score_listener(self, cache_key: str, listener: Callable[[str, CategoryScore], None]) -> None:
+        """Unsubscribe from streamed category scores"""
+        listeners = self._score_listeners.get(cache_key, [])
+        if listener in listeners:
+            listeners.remove(listener)
+        if not listeners:
+            self._score_listeners.pop(cache_key, None)
+            self._partial_scores.pop(cache_key, None)
+    
+    def _publish_category_score(self, cache_key: str, key: str, score_data: Dict[str, Any]) -> None:
+        """Forward a streamed category score to every request waiting on this essay"""
+        entry = expand_category(key, score_data)
+        if not entry:
+            return
+        
+        self._notify_score_listeners(cache_key, entry[0], CategoryScore(**entry[1]))
+    
+    def _notify_score_listeners(self, cache_key: str, category: str, score: CategoryScore) -> None:
+        """Record a category score and pass it to the listeners of this essay"""
+        self._partial_scores.setdefault(cache_key, {})[category] = score
+        for listener in list(self._score_listeners.get(cache_key, [])):
+            try:
+                listener(category, score)
+            except Exception as e:
+                logger.warning(f"Category score listener failed: {e}")
+    
+    async def _grade_uncached(
+        self, essay_text: str, rubric_type: str, cache_key: str, priority: str = "interactive"
+    ) -> GradingResult:
+        """Grade an essay with a Gemini call and cache the parsed result"""
+        # Static rubric instructions (cacheable) and the per-essay payload
+        payload = self._build_essay_payload(essay_text)
+        word_count = len(essay_text.split())
+        on_category = lambda key, data: self._publish_category_score(cache_key, key, data)
+        
+        quick = rubric_type == QUICK_RUBRIC
+        if self.category_fanout and self.structured_output and not quick and word_count >= self.fanout_min_words:
+            grading_result = self._grading_result_from_data(
+                await self._grade_category_groups(payload, rubric_type, on_category, priority)
+            )
+        else:
             # Call Gemini API
-            response = await self._call_gemini(prompt)
+            response = await self._call_gemini(
+                payload,
+                on_category=on_category,
+                instructions=self._build_rubric_instructions(rubric_type),
+                priority=priority,
+                options={"quick": True} if quick else None
+            )
             
             # Parse the response
             grading_result = self._parse_ai_response(response)
-            
-            logger.info(f"Essay graded successfully with overall score: {grading_result.overall_score}")
-            return grading_result
-            
-        except Exception as e:
-            logger.error(f"Error grading essay: {e}")
-            # Return fallback result if AI fails
-            return self._create_fallback_result(essay_text)
+        grading_result = self.pre_screen.apply_short_essay_gate(grading_result, word_count)
+        grading_result = self._apply_local_scores(grading_result, word_count)
+        self._notify_score_listeners(
+            cache_key, CATEGORIES["wc"][0], grading_result.category_scores[CATEGORIES["wc"][0]]
+        )
+        
+        # Only genuine AI results are cached, never the fallback
+        await asyncio.to_thread(self.grading_cache.set, cache_key, grading_result)
+        
+        logger.info(f"Essay graded successfully with overall score: {grading_result.overall_score}")
+        return grading_result
+    
+    async def _grade_category_groups(
+        self,
+        payload: str,
+        rubric_type: str,
+        on_category: Callable[[str, Dict[str, Any]], None],
+        priority: str
+    ) -> Dict[str, Any]:
+        """
+        Mark each category group with its own concurrent call and merge the results
+        
+        Returns:
+            The merged compact response; the first failed call fails the grading
+        """
+        tasks = [
+            asyncio.ensure_future(self._call_gemini(
+                payload,
+                on_category=on_category,
+                instructions=self._build_rubric_instructions(rubric_type, categories=keys),
+                priority=priority,
+                options={"categories": keys}
+            ))
+            for keys in CATEGORY_GROUPS.values()
+        ]
+        try:
+            responses = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        parts = []
+        for keys, response in zip(CATEGORY_GROUPS.values(), responses):
+            try:
+                parts.append(restrict_compact_response(json.loads(self._strip_json_fence(response)), keys))
+            except Exception as e:
+                self.parse_failures += 1
+                logger.error(f"Error parsing AI response: {e}")
+                logger.error(f"Raw response: {response}")
+                raise Exception(f"Failed to parse AI response: {str(e)}")
+        
+        self.fanout_gradings += 1
+        return merge_compact_responses(parts)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get AI service statistics"""
+        return {
+            "model": self.model_name,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "structured_output": self.structured_output,
+            "calls": self.call_count,
+            "avg_latency_seconds": round(self.total_latency / self.call_count, 3) if self.call_count else 0.0,
+            "streaming": self.streaming,
+            "avg_first_score_seconds": round(self.total_first_score_latency / self.first_score_count, 3) if self.first_score_count else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_prompt_tokens": self.cached_tokens,
+            "output_tokens": self.output_tokens,
+            "provider": self.provider.get_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "latency": self.latency.get_stats(),
+            "hedging": self.hedging.get_stats(),
+            "circuit_breaker": self.breaker.get_stats(),
+            "parse_failures": self.parse_failures,
+            "batch": {
+                "token_budget": self.batch_token_budget,
+                "max_essays": self.batch_max_essays,
+                "calls": self.batch_calls,
+                "essays": self.batch_essays,
+                "fallbacks": self.batch_fallbacks,
+                "calls_saved": self.batch_calls_saved,
+                "estimated_tokens_saved": self.batch_tokens_saved
+            },
+            "category_fanout": {
+                "enabled": self.category_fanout,
+                "min_words": self.fanout_min_words,
+                "gradings": self.fanout_gradings
+            },
+            "pre_screen": self.pre_screen.get_stats(),
+            "grading_cache": self.grading_cache.get_stats(),
+            "single_flight": self.single_flight.get_stats()
+        }
     
     def _build_grading_prompt(self, essay_text: str, rubric_type: str) -> str:
-        """Build the AI prompt for grading using CSS FPSC rubric"""
+        """Build the full inline AI prompt for grading using CSS FPSC rubric"""
+        return f"{self._build_rubric_instructions(rubric_type)}\n\n{self._build_essay_payload(essay_text)}"
+    
+    def _build_essay_payload(self, essay_text: str) -> str:
+        """Build the per-essay part of the prompt"""
+        # Counted before the budget cut so Word Count & Length Control stays exact
+        word_count = len(essay_text.split())
+        essay_text = fit_token_budget(essay_text, self.token_budget)
         
-        prompt = f"""You are a Senior CSS Essay Examiner (FPSC Pakistan). Evaluate strictly. High marks must be earned, not granted. Most candidates fail; >50 is rare.
+        return f"""The submission is {word_count} words long (counted by the system; do not recount).
+
+ESSAY TO ANALYZE:
+{essay_text}"""
+    
+    def _build_rubric_instructions(
+        self, rubric_type: str, batch: bool = False, categories: Optional[Sequence[str]] = None
+    ) -> str:
+        """Build the static CSS FPSC rubric instructions, identical for every essay"""
+        
+        if rubric_type == QUICK_RUBRIC:
+            # Quick grades are always compact, whatever the structured-output setting
+            output_format = QUICK_OUTPUT_FORMAT
+            response_format = QUICK_BATCH_RESPONSE_FORMAT if batch else QUICK_RESPONSE_FORMAT
+        elif categories:
+            output_format, response_format = build_group_output_format(categories)
+        elif batch:
+            # Batch responses are always compact, one entry per essay index
+            output_format, response_format = COMPACT_OUTPUT_FORMAT, BATCH_RESPONSE_FORMAT
+        elif self.structured_output:
+            output_format, response_format = COMPACT_OUTPUT_FORMAT, COMPACT_RESPONSE_FORMAT
+        else:
+            output_format, response_format = LEGACY_OUTPUT_FORMAT, LEGACY_RESPONSE_FORMAT
+        
+        instructions = f"""You are a Senior CSS Essay Examiner (FPSC Pakistan). Evaluate strictly. High marks must be earned, not granted. Most candidates fail; >50 is rare.
 
 Step 0 — Essay Validity & Sanitization (hard filter)
 
@@ -101,15 +590,7 @@ Type A (Outline-Only): Evaluate Outline (0–10) only. All other sections = 0. F
 Type B (Outline + Essay): Evaluate all sections.
 Type C (Essay Without Outline): Outline = 0; evaluate others. Remark: "Outline missing — weakens CSS attempt."
 Type D (Intro-Only / Fragment): Evaluate Thesis (0–10) only; others = 0. Remark: "Fragmentary essay; CSS considers this a failure."
-Type E (Short Essay <800 words): Evaluate all, but Word Count = 0/15. Remark: "Too short; CSS requires ~2500–3000 words. Fail."
-
-Word Count Scoring Guidelines:
-- 0-799 words: 0/15 (automatic fail)
-- 800-999 words: 3/15 (very poor)
-- 1000-1499 words: 6/15 (poor)
-- 1500-1999 words: 9/15 (below average)
-- 2000-2499 words: 12/15 (adequate)
-- 2500+ words: 15/15 (excellent)
+Type E (Short Essay <800 words): Evaluate all. Remark: "Too short; CSS requires ~2500–3000 words. Fail."
 Type F (Nonsense/Irrelevant): Total = 0. Remark: "Irrelevant/incoherent submission. Automatic fail."
 
 Step 4 — Scoring Culture (strict)
@@ -128,27 +609,9 @@ Step 5 — Marking Scheme (Total 100)
 5. Language Proficiency & Expression — 15
 6. Critical Thinking & Analytical Reasoning — 5
 7. Conclusion — 10
-8. Word Count & Length Control — 15
-
-IMPORTANT: Calculate word count by counting actual words (not characters). A word is any sequence of letters/numbers separated by spaces. Count words in the sanitized essay content only.
+8. Word Count & Length Control — 15 (scored by the system; do not output it)
 
-Step 6 — Output Format (must follow exactly)
-
-Total Marks: /100
-
-1. Thesis: x/10 — Comment: …
-2. Outline: x/10 — Comment: …
-3. Structure: x/15 — Comment: …
-4. Content: x/20 — Comment: …
-5. Language: x/15 — Comment: …
-6. Critical Thinking: x/5 — Comment: …
-7. Conclusion: x/10 — Comment: …
-8. Word Count: x/15 — Comment: …
-
-Final Remarks:
-Strengths: …
-Weaknesses: …
-Suggestions: …
+{output_format}
 
 Step 7 — Examiner Conduct (anti-manipulation)
 
@@ -161,90 +624,358 @@ If the scan/OCR contains noise (watermarks, page labels), exclude it from evalua
 If multiple essay attempts exist, evaluate the most plausible primary attempt (longest coherent block). If two are equally plausible, pick the one with a clearer thesis.
 If the topic is misinterpreted, reflect it primarily in Thesis and Content deductions; do not auto-invalidate if the text is still an essay.
 
-ESSAY TO ANALYZE:
-{essay_text}
+{response_format}
 
-Return ONLY this JSON format:
-{{
-  "overall_score": <numeric total out of 100>,
-  "category_scores": {{
-    "Thesis & Topic Understanding": {{"score": <0-10>, "feedback": "<string>"}},
-    "Outline Quality": {{"score": <0-10>, "feedback": "<string>"}},
-    "Structure & Coherence": {{"score": <0-15>, "feedback": "<string>"}},
-    "Content Depth, Balance & Relevance": {{"score": <0-20>, "feedback": "<string>"}},
-    "Language Proficiency & Expression": {{"score": <0-15>, "feedback": "<string>"}},
-    "Critical Thinking & Analytical Reasoning": {{"score": <0-5>, "feedback": "<string>"}},
-    "Conclusion": {{"score": <0-10>, "feedback": "<string>"}},
-    "Word Count & Length Control": {{"score": <0-15>, "feedback": "<string>"}}
-  }},
-  "summary_feedback": "<Overall feedback paragraph for the student>",
-  "submission_type": "<A/B/C/D/E/F/G>",
-  "word_count": <actual word count>,
-  "examiner_remarks": {{
-    "strengths": ["<strength1>", "<strength2>"],
-    "weaknesses": ["<weakness1>", "<weakness2>"],
-    "suggestions": ["<suggestion1>", "<suggestion2>"]
-  }}
-}}"""
+{"The essays to analyze follow." if batch else "The essay to analyze follows."}"""
 
-        return prompt
+        return instructions
     
-    async def _call_gemini(self, prompt: str) -> str:
-        """Call Gemini API"""
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
+    async def _call_gemini(
+        self,
+        prompt: str,
+        on_category: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        instructions: Optional[str] = None,
+        priority: str = "interactive",
+        batch_size: int = 1,
+        options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Call Gemini API on the worker pool without blocking the event loop
+        
+        Quota (429) and overload (503) errors are retried through the outbound
+        scheduler with jittered exponential backoff. A call still running after
+        the observed p95 latency is hedged with a duplicate, and while the
+        circuit breaker is open no call is made at all.
+        
+        Args:
+            prompt: Full prompt, or only the essay payload when instructions are given
+            on_category: Called with (compact key, score data) as categories stream in
+            instructions: Static rubric instructions served from the context cache
+                (sent inline when caching is unavailable)
+            priority: Outbound queue priority, "interactive" or "batch"
+            batch_size: Number of essays in a batch prompt; batch calls are
+                neither streamed nor hedged
+            options: Extra provider arguments: categories (the only categories this
+                call marks, in fan-out mode) or quick (short, capped output)
             
+        Raises:
+            CircuitOpenError: The circuit breaker is open
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Circuit breaker open: Gemini calls suspended after repeated failures")
+        
+        try:
+            if batch_size > 1:
+                text = await self._call_with_retries(prompt, None, instructions, priority, batch_size=batch_size, options=options)
+            else:
+                text = await self._call_hedged(prompt, on_category, instructions, priority, options)
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
         except Exception as e:
-            logger.error(f"Gemini API error: {e}")
-            raise Exception(f"AI service error: {str(e)}")
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            self.breaker.record_failure(timed_out=timed_out)
+            message = f"no response within {self.breaker.call_timeout():.1f}s" if timed_out else str(e)
+            logger.error(f"Gemini API error: {message}")
+            raise Exception(f"AI service error: {message}")
+        
+        self.breaker.record_success()
+        return text
+    
+    async def _call_hedged(
+        self,
+        prompt: str,
+        on_category: Optional[Callable[[str, Dict[str, Any]], None]],
+        instructions: Optional[str],
+        priority: str,
+        options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Run the call, adding one duplicate if it is still pending after the hedge delay"""
+        delay = self.hedging.delay()
+        self.hedging.record_primary()
+        dispatched = asyncio.Event()
+        primary = asyncio.ensure_future(
+            self._call_with_retries(prompt, on_category, instructions, priority, dispatched, options=options)
+        )
+        if delay is None:
+            return await primary
+        
+        pending = {primary}
+        try:
+            # The hedge delay runs from when the primary left the outbound queue
+            admitted = asyncio.ensure_future(dispatched.wait())
+            await asyncio.wait({primary, admitted}, return_when=asyncio.FIRST_COMPLETED)
+            admitted.cancel()
+            if not primary.done():
+                await asyncio.wait({primary}, timeout=delay)
+            if not primary.done() and self.hedging.try_hedge():
+                logger.info(f"Hedging Gemini call still pending after {delay:.2f}s")
+                # The duplicate does not stream scores; the primary already reports them
+                pending.add(asyncio.ensure_future(
+                    self._call_with_retries(prompt, None, instructions, priority, options=options)
+                ))
+            
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedging.record_hedge_win()
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _call_with_retries(
+        self,
+        prompt: str,
+        on_category: Optional[Callable[[str, Dict[str, Any]], None]],
+        instructions: Optional[str],
+        priority: str,
+        dispatched: Optional[asyncio.Event] = None,
+        batch_size: int = 1,
+        options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """One logical call: admission by the scheduler, timeout and retries on 429/503 (or on another pool key)"""
+        options = options or {}
+        if options.get("quick"):
+            expected_output_tokens = self.quick_max_output_tokens * batch_size
+        elif options.get("categories"):
+            expected_output_tokens = int(self.expected_output_tokens * len(options["categories"]) / len(MODEL_CATEGORIES))
+        else:
+            expected_output_tokens = self.expected_output_tokens * batch_size
+        estimated_tokens = estimate_tokens((instructions or "") + prompt) + expected_output_tokens
+        # Batch calls run longer than the single-essay latencies the timeout is calibrated on
+        timeout = self.breaker.call_timeout() if batch_size == 1 else self.breaker.max_timeout
+        attempt = 0
+        while True:
+            try:
+                async with self.scheduler.reserve(estimated_tokens, priority) as reservation:
+                    if dispatched:
+                        dispatched.set()
+                    self.in_flight += 1
+                    try:
+                        started = time.perf_counter()
+                        text, response = await asyncio.wait_for(
+                            self._generate(prompt, on_category, started, instructions, batch_size > 1, options, reservation),
+                            timeout
+                        )
+                        latency = time.perf_counter() - started
+                        reservation.actual_tokens = self._record_call(response, latency)
+                        # Percentiles describe full single-essay calls only
+                        if batch_size == 1 and not options:
+                            self.latency.record(latency)
+                    finally:
+                        self.in_flight -= 1
+                self.scheduler.record_success()
+                return text
+                
+            except Exception as e:
+                if not is_throttle_error(e):
+                    raise
+                if self.provider.can_fail_over(e):
+                    # Only one key of the pool is out of quota: no global backoff
+                    logger.warning(f"Gemini key throttled ({e}); retrying on another key")
+                    continue
+                self.scheduler.record_throttle()
+                if attempt >= self.scheduler.max_retries:
+                    raise
+                delay = self.scheduler.retry_delay(attempt)
+                attempt += 1
+                logger.warning(f"Gemini throttled ({e}); retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+    
+    async def _generate(
+        self,
+        prompt: str,
+        on_category: Optional[Callable[[str, Dict[str, Any]], None]],
+        started: float,
+        instructions: Optional[str],
+        batch: bool = False,
+        options: Optional[Dict[str, Any]] = None,
+        reservation=None
+    ):
+        """
+        Make a single provider call on the worker pool
+        
+        The scheduler reservation, when given, is held until the worker thread
+        returns: cancelling this coroutine cannot stop the blocking SDK call.
+        
+        Returns:
+            Tuple of (full response text, final SDK response)
+        """
+        if self.streaming and not batch:
+            return await self._stream_gemini(prompt, on_category, started, instructions, options, reservation)
+        if batch:
+            call = partial(self.provider.generate, prompt, instructions, batch=True, **(options or {}))
+        else:
+            call = partial(self.provider.generate, prompt, instructions, **(options or {}))
+        response = await self._run_in_worker(call, reservation)
+        return response.text, response
+    
+    def _run_in_worker(self, call: Callable[[], Any], reservation=None) -> "asyncio.Future":
+        """Submit a blocking call to the worker pool; its scheduler slot is freed when it returns"""
+        worker = self._executor.submit(call)
+        if reservation is not None:
+            reservation.hold_until_done(worker)
+        return asyncio.wrap_future(worker)
+    
+    async def _stream_gemini(
+        self,
+        prompt: str,
+        on_category: Optional[Callable[[str, Dict[str, Any]], None]],
+        started: float,
+        instructions: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+        reservation=None
+    ):
+        """
+        Stream a Gemini generation, reporting category scores as they complete
+        
+        Returns:
+            Tuple of (full response text, final SDK response)
+        """
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        
+        def produce():
+            try:
+                response = self.provider.generate(prompt, instructions, stream=True, **(options or {}))
+                for chunk in response:
+                    loop.call_soon_threadsafe(chunks.put_nowait, chunk.text)
+                return response
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
+        
+        producer = self._run_in_worker(produce, reservation)
+        parser = CategoryStreamParser()
+        parts = []
+        first_score = True
+        
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                break
+            parts.append(chunk)
+            for key, score_data in parser.feed(chunk):
+                if first_score:
+                    first_score = False
+                    self.first_score_count += 1
+                    self.total_first_score_latency += time.perf_counter() - started
+                if on_category:
+                    on_category(key, score_data)
+        
+        # Re-raises any error from the SDK thread
+        response = await producer
+        return "".join(parts), response
+    
+    def _record_call(self, response, latency: float) -> Optional[int]:
+        """
+        Accumulate latency and token usage of a completed call
+        
+        Returns:
+            Prompt plus output tokens of the call, or None when not reported
+        """
+        self.call_count += 1
+        self.total_latency += latency
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return None
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += getattr(usage, "cached_content_token_count", 0) or 0
+        self.output_tokens += output_tokens
+        return prompt_tokens + output_tokens
     
     def _parse_ai_response(self, response: str) -> GradingResult:
         """Parse AI response into GradingResult"""
         try:
             # Clean the response to extract JSON
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.endswith("```"):
-                response = response[:-3]
-            
-            # Parse JSON
-            data = json.loads(response)
-            
-            # Validate required fields
-            if "overall_score" not in data or "category_scores" not in data:
-                raise ValueError("Missing required fields in AI response")
-            
-            # Create CategoryScore objects
-            category_scores = {}
-            for category, score_data in data["category_scores"].items():
-                category_scores[category] = CategoryScore(
-                    score=score_data["score"],
-                    feedback=score_data["feedback"]
-                )
-            
-            return GradingResult(
-                overall_score=data["overall_score"],
-                category_scores=category_scores,
-                summary_feedback=data.get("summary_feedback", "No summary feedback provided."),
-                submission_type=data.get("submission_type", "B"),
-                word_count=0,  # Word count will be calculated separately from actual essay text
-                examiner_remarks=data.get("examiner_remarks", {
-                    "strengths": [],
-                    "weaknesses": [],
-                    "suggestions": []
-                })
-            )
+            response = self._strip_json_fence(response)
+            return self._grading_result_from_data(json.loads(response))
             
         except Exception as e:
+            self.parse_failures += 1
             logger.error(f"Error parsing AI response: {e}")
             logger.error(f"Raw response: {response}")
             raise Exception(f"Failed to parse AI response: {str(e)}")
     
-    def _create_fallback_result(self, essay_text: str) -> GradingResult:
-        """Create a fallback result when AI fails"""
-        logger.warning("Using fallback grading result")
+    def _strip_json_fence(self, response: str) -> str:
+        """Remove a ```json code fence around a response"""
+        response = response.strip()
+        if response.startswith("```json"):
+            response = response[7:]
+        if response.endswith("```"):
+            response = response[:-3]
+        return response
+    
+    def _grading_result_from_data(self, data: Dict[str, Any]) -> GradingResult:
+        """Build a GradingResult from a parsed response, expanding the compact structured-output keys"""
+        if is_compact_response(data):
+            data = expand_compact_response(data)
+        
+        # Validate required fields
+        if "overall_score" not in data or "category_scores" not in data:
+            raise ValueError("Missing required fields in AI response")
+        
+        # Create CategoryScore objects
+        category_scores = {}
+        for category, score_data in data["category_scores"].items():
+            category_scores[category] = CategoryScore(
+                score=score_data["score"],
+                feedback=score_data["feedback"]
+            )
+        
+        return GradingResult(
+            overall_score=data["overall_score"],
+            category_scores=category_scores,
+            summary_feedback=data.get("summary_feedback", "No summary feedback provided."),
+            submission_type=data.get("submission_type", "B"),
+            word_count=0,  # Word count will be calculated separately from actual essay text
+            examiner_remarks=data.get("examiner_remarks", {
+                "strengths": [],
+                "weaknesses": [],
+                "suggestions": []
+            })
+        )
+    
+    def _apply_local_scores(self, grading_result: GradingResult, word_count: int) -> GradingResult:
+        """
+        Merge the server-scored categories into an AI result and recompute the total
+        
+        Args:
+            grading_result: Parsed AI grading result
+            word_count: Word count of the submission
+            
+        Returns:
+            The result with Word Count & Length Control, word_count and overall_score set
+        """
+        score, feedback = score_word_count(word_count, grading_result.submission_type)
+        grading_result.category_scores[CATEGORIES["wc"][0]] = CategoryScore(score=score, feedback=feedback)
+        grading_result.word_count = word_count
+        
+        # Invalid and nonsense submissions are 0 regardless of section marks
+        if grading_result.submission_type in ("F", "G"):
+            grading_result.overall_score = 0
+        else:
+            grading_result.overall_score = min(100, sum(
+                category_score.score for category_score in grading_result.category_scores.values()
+            ))
+        return grading_result
+    
+    def _create_fallback_result(self, essay_text: str, reason: str = "provider_error") -> GradingResult:
+        """
+        Create a degraded fallback result when AI grading is unavailable
+        
+        Args:
+            essay_text: The essay text
+            reason: provider_error (the call failed) or circuit_open (no call was made)
+        """
+        logger.warning(f"Using fallback grading result ({reason})")
         
         # Simple fallback scoring based on text length and basic analysis
         word_count = len(essay_text.split())
@@ -262,21 +993,28 @@ Return ONLY this JSON format:
         return GradingResult(
             overall_score=overall_score,
             category_scores={
-                "Thesis & Topic Understanding": CategoryScore(score=overall_score * 0.1, feedback="Thesis analysis unavailable"),
-                "Outline Quality": CategoryScore(score=overall_score * 0.1, feedback="Outline analysis unavailable"),
-                "Structure & Coherence": CategoryScore(score=overall_score * 0.15, feedback="Structure analysis unavailable"),
-                "Content Depth, Balance & Relevance": CategoryScore(score=overall_score * 0.2, feedback="Content analysis unavailable"),
-                "Language Proficiency & Expression": CategoryScore(score=overall_score * 0.15, feedback="Language analysis unavailable"),
-                "Critical Thinking & Analytical Reasoning": CategoryScore(score=overall_score * 0.05, feedback="Critical thinking analysis unavailable"),
-                "Conclusion": CategoryScore(score=overall_score * 0.1, feedback="Conclusion analysis unavailable"),
-                "Word Count & Length Control": CategoryScore(score=overall_score * 0.15, feedback="Word count analysis unavailable")
+                "Thesis & Topic Understanding": CategoryScore(score=int(overall_score * 0.1), feedback="Thesis analysis unavailable"),
+                "Outline Quality": CategoryScore(score=int(overall_score * 0.1), feedback="Outline analysis unavailable"),
+                "Structure & Coherence": CategoryScore(score=int(overall_score * 0.15), feedback="Structure analysis unavailable"),
+                "Content Depth, Balance & Relevance": CategoryScore(score=int(overall_score * 0.2), feedback="Content analysis unavailable"),
+                "Language Proficiency & Expression": CategoryScore(score=int(overall_score * 0.15), feedback="Language analysis unavailable"),
+                "Critical Thinking & Analytical Reasoning": CategoryScore(score=int(overall_score * 0.05), feedback="Critical thinking analysis unavailable"),
+                "Conclusion": CategoryScore(score=int(overall_score * 0.1), feedback="Conclusion analysis unavailable"),
+                "Word Count & Length Control": CategoryScore(score=int(overall_score * 0.15), feedback="Word count analysis unavailable")
             },
-            summary_feedback="AI grading service temporarily unavailable. This is a fallback assessment based on essay length.",
+            summary_feedback=(
+                "AI grading suspended after repeated provider failures (circuit breaker open). "
+                "This is a degraded estimate based on essay length, not an examiner assessment."
+                if reason == "circuit_open" else
+                "AI grading service temporarily unavailable. This is a fallback assessment based on essay length."
+            ),
             submission_type="B",
             word_count=word_count,
             examiner_remarks={
                 "strengths": ["Basic essay structure present"],
                 "weaknesses": ["AI analysis unavailable"],
                 "suggestions": ["Please try again when AI service is available"]
-            }
+            },
+            degraded=True,
+            degraded_reason=reason
         )
@@ -0,0 +1,190 @@
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from services.essay_sanitizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Smallest cached context each Gemini model family accepts, in tokens (the longest matching prefix wins).
+# The ~1.4k-token rubric is only above the floor of the 2.5 Flash models; on the others it is sent inline
+MIN_CACHED_TOKENS = {
+    "gemini-1.5": 32768,
+    "gemini-2.0": 4096,
+    "gemini-2.5-pro": 4096,
+    "gemini-2.5-flash": 1024,
+}
+# Models not listed above (the strictest known floor)
+DEFAULT_MIN_CACHED_TOKENS = 32768
+
+def min_cached_tokens(model_name: str) -> int:
+    """Provider minimum size of a cached context for a model ("models/" prefix optional)"""
+    name = model_name.rsplit("/", 1)[-1]
+    prefixes = [prefix for prefix in MIN_CACHED_TOKENS if name.startswith(prefix)]
+    return MIN_CACHED_TOKENS[max(prefixes, key=len)] if prefixes else DEFAULT_MIN_CACHED_TOKENS
+
+class GeminiContextCacheBackend:
+    """Creates and refreshes Gemini CachedContent objects holding the rubric"""
+
+    def __init__(self, model_name: str, generation_config=None):
+        # The grading model unless a versioned one is configured for caching
+        self.model_name = os.getenv("GEMINI_CACHE_MODEL") or f"models/{model_name}"
+        self.generation_config = generation_config
+
+    def create(self, system_instruction: str, ttl_seconds: int) -> Any:
+        from google.generativeai import caching
+        return caching.CachedContent.create(
+            model=self.model_name,
+            display_name="css-essay-rubric",
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl_seconds)
+        )
+
+    def refresh(self, handle: Any, ttl_seconds: int) -> None:
+        handle.update(ttl=datetime.timedelta(seconds=ttl_seconds))
+
+    def model_for(self, handle: Any) -> Any:
+        import google.generativeai as genai
+        return genai.GenerativeModel.from_cached_content(handle, generation_config=self.generation_config)
+
+class _Entry:
+    def __init__(self, handle: Any, model: Any, expires_at: float):
+        self.handle = handle
+        self.model = model
+        self.expires_at = expires_at
+
+class ContextCache:
+    """
+    Provider-side cache of the static rubric instructions
+
+    One cached context per distinct instruction text is created on first use
+    and its TTL extended shortly before it expires, so each request only sends
+    the essay. Whenever caching is unavailable get_model returns None and the
+    caller falls back to the inline prompt; creation is then retried after a
+    cool-down. Instructions below the model's minimum cached-content size
+    (MIN_CACHED_TOKENS) are never sent. Creation and refresh run outside the lock, one per
+    instruction text at a time: concurrent callers meanwhile use the current
+    context or the inline prompt instead of waiting on the provider.
+    """
+
+    def __init__(self, backend: Any, ttl_seconds: int = None, refresh_margin_seconds: int = None,
+                 min_tokens: int = None):
+        self.backend = backend
+        self.enabled = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+        if min_tokens is None:
+            min_tokens = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS") or min_cached_tokens(getattr(backend, "model_name", "")))
+        self.min_tokens = min_tokens
+        self.ttl_seconds = ttl_seconds or int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+        self.refresh_margin_seconds = refresh_margin_seconds or int(os.getenv("GEMINI_CONTEXT_CACHE_REFRESH_SECONDS", "300"))
+        self.retry_after_seconds = int(os.getenv("GEMINI_CONTEXT_CACHE_RETRY_SECONDS", "600"))
+
+        self._entries: Dict[str, _Entry] = {}
+        self._unavailable_until: Dict[str, float] = {}
+        self._too_small = set()
+        self._updating = set()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.fallbacks = 0
+        self.creates = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.too_small = 0
+
+    def get_model(self, system_instruction: str) -> Optional[Any]:
+        """
+        Get a model bound to the cached instructions, creating or refreshing the cache
+
+        Blocking (it may call the provider), so call it from a worker thread.
+
+        Args:
+            system_instruction: Static instruction text to cache
+
+        Returns:
+            Model whose requests only need the essay payload, or None to use the inline prompt
+        """
+        if not self.enabled:
+            return None
+
+        key = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+        with self._lock:
+            now = time.time()
+            if key in self._too_small or self._unavailable_until.get(key, 0) > now:
+                self.fallbacks += 1
+                return None
+
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now and (
+                    entry.expires_at - now > self.refresh_margin_seconds or key in self._updating):
+                self.hits += 1
+                return entry.model
+            if key in self._updating:
+                # Another thread is creating this context; do not wait for it
+                self.fallbacks += 1
+                return None
+
+            if entry is None and estimate_tokens(system_instruction) < self.min_tokens:
+                self._too_small.add(key)
+                self.too_small += 1
+                self.fallbacks += 1
+                logger.warning(f"Rubric instructions are below the {self.min_tokens}-token minimum for "
+                               f"context caching; using the inline prompt")
+                return None
+            self._updating.add(key)
+
+        try:
+            if entry is None or entry.expires_at <= now:
+                entry = self._create(system_instruction)
+            else:
+                entry = self._refresh(entry, system_instruction)
+        except Exception as e:
+            with self._lock:
+                self._updating.discard(key)
+                self.failures += 1
+                self.fallbacks += 1
+                self._entries.pop(key, None)
+                self._unavailable_until[key] = time.time() + self.retry_after_seconds
+            logger.warning(f"Context caching unavailable, using inline prompt for {self.retry_after_seconds}s: {e}")
+            return None
+
+        with self._lock:
+            self._updating.discard(key)
+            self._entries[key] = entry
+            self.hits += 1
+        return entry.model
+
+    def _create(self, system_instruction: str) -> _Entry:
+        handle = self.backend.create(system_instruction, self.ttl_seconds)
+        entry = _Entry(handle, self.backend.model_for(handle), time.time() + self.ttl_seconds)
+        self.creates += 1
+        logger.info(f"Created rubric context cache (ttl {self.ttl_seconds}s)")
+        return entry
+
+    def _refresh(self, entry: _Entry, system_instruction: str) -> _Entry:
+        """Extend the TTL, recreating the cache if the provider no longer has it"""
+        try:
+            self.backend.refresh(entry.handle, self.ttl_seconds)
+            entry.expires_at = time.time() + self.ttl_seconds
+            self.refreshes += 1
+            return entry
+        except Exception as e:
+            logger.warning(f"Context cache refresh failed, recreating: {e}")
+            return self._create(system_instruction)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get context cache statistics"""
+        return {
+            "enabled": self.enabled,
+            "contexts": len(self._entries),
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "creates": self.creates,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "too_small": self.too_small,
+            "min_tokens": self.min_tokens
+        }
@@ -0,0 +1,81 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+BATCH_ESSAY_HEADER = "ESSAY {index} ({words} words, counted by the system; do not recount):"
+BATCH_ESSAY_PATTERN = re.compile(r"^ESSAY (\d+) \((\d+) words, counted by the system; do not recount\):$", re.MULTILINE)
+
+BATCH_RESPONSE_FORMAT = """Return ONLY this JSON format, with exactly one entry per essay and "i" set to the essay number:
+{"results": [{"i": 0, "c": {"th": {"s": 0, "f": ""}, "ol": {"s": 0, "f": ""}, "st": {"s": 0, "f": ""}, "ct": {"s": 0, "f": ""}, "lg": {"s": 0, "f": ""}, "cr": {"s": 0, "f": ""}, "cn": {"s": 0, "f": ""}}, "sf": "", "t": "", "r": {"s": [], "w": [], "g": []}}]}"""
+
+QUICK_BATCH_RESPONSE_FORMAT = """Return ONLY this JSON format, with exactly one entry per essay and "i" set to the essay number:
+{"results": [{"i": 0, "c": {"th": {"s": 0, "f": ""}, "ol": {"s": 0, "f": ""}, "st": {"s": 0, "f": ""}, "ct": {"s": 0, "f": ""}, "lg": {"s": 0, "f": ""}, "cr": {"s": 0, "f": ""}, "cn": {"s": 0, "f": ""}}, "sf": "", "t": ""}]}"""
+
+def build_batch_payload(essays: List[Tuple[int, str]]) -> str:
+    """
+    Build the per-call part of a batch prompt
+
+    Args:
+        essays: (word count, essay text) per essay, in index order
+    """
+    sections = [
+        "Several separate submissions follow. Grade each one on its own against the rubric; "
+        "never compare them with each other or let one influence another's marks."
+    ]
+    for index, (word_count, essay_text) in enumerate(essays):
+        sections.append(f"{BATCH_ESSAY_HEADER.format(index=index, words=word_count)}\n{essay_text}")
+    return "\n\n".join(sections)
+
+def split_batch_payload(prompt: str) -> List[Tuple[int, int, str]]:
+    """Recover (index, word count, essay text) of every essay in a batch prompt"""
+    matches = list(BATCH_ESSAY_PATTERN.finditer(prompt))
+    essays = []
+    for position, match in enumerate(matches):
+        end = matches[position + 1].start() if position + 1 < len(matches) else len(prompt)
+        essays.append((int(match.group(1)), int(match.group(2)), prompt[match.end():end].strip()))
+    return essays
+
+def pack_essays(token_costs: List[int], token_budget: int, max_essays: int) -> List[List[int]]:
+    """
+    Group essays into calls, in order, under a prompt token budget
+
+    An essay too large to share a call gets a call of its own.
+
+    Args:
+        token_costs: Estimated prompt tokens of each essay
+        token_budget: Maximum estimated essay tokens per call
+        max_essays: Maximum essays per call (bounds the response length)
+
+    Returns:
+        Lists of positions into token_costs, one list per call
+    """
+    packs, current, current_tokens = [], [], 0
+    for position, tokens in enumerate(token_costs):
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_essays):
+            packs.append(current)
+            current, current_tokens = [], 0
+        current.append(position)
+        current_tokens += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def parse_batch_response(response: str) -> Dict[int, Dict[str, Any]]:
+    """
+    Parse a batch response into the compact grading of each essay index
+
+    Entries without a valid index are dropped; the caller regrades missing essays.
+    """
+    response = response.strip()
+    if response.startswith("```json"):
+        response = response[7:]
+    if response.endswith("```"):
+        response = response[:-3]
+
+    data = json.loads(response)
+    entries = data.get("results", []) if isinstance(data, dict) else data
+    parsed = {}
+    for entry in entries:
+        if isinstance(entry, dict) and isinstance(entry.get("i"), int) and "c" in entry:
+            parsed[entry["i"]] = entry
+    return parsed
@@ -0,0 +1,267 @@
+import logging
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Same rough estimate used by the benchmarks: about 4 characters per token
+CHARS_PER_TOKEN = 4
+
+# Scanner/app watermarks, page labels and similar noise, removed wherever they appear
+SCANNER_APPS = r"(?:camscanner|cam scanner|adobe scan|microsoft lens|office lens|tapscanner|genius scan|ilovepdf|smallpdf)"
+WATERMARK_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    rf"\b(?:scanned|created|made|generated|edited) (?:with|by|using) {SCANNER_APPS}\b",
+    rf"\b{SCANNER_APPS}\b",
+    r"\bdownloaded from\s+\S+",
+    r"\bpage\s+\d+\s*(?:of|/)\s*\d+\b",
+    r"(?:^|\s)-\s*\d{1,3}\s*-(?=\s|$)",
+)]
+
+URL_PATTERN = re.compile(r"\bhttps?://\S+|\bwww\.\S+|\b[\w.+-]+@[\w-]+\.[\w.]+\b", re.IGNORECASE)
+
+# Short metadata paragraphs: candidate name, roll number, teacher, date, ...
+METADATA_PARAGRAPH = re.compile(
+    r"^(?:name|student(?: name| id)?|roll\s*(?:no|number|#)|registration(?: no)?|teacher|instructor|"
+    r"course|class|section|subject|date|submitted (?:to|by))\s*[:\-.]",
+    re.IGNORECASE
+)
+
+# Longest header/footer (in words) looked for at paragraph boundaries
+MAX_AFFIX_WORDS = 12
+
+# The only single-word affixes stripped: bare page numbers ("7", "Page7", "3of12").
+# Outline numbering ("1.") and years ending a sentence ("1947.") are essay content
+PAGE_NUMBER = re.compile(r"^(?:page\s*)?\d{1,3}(?:\s*of\s*\d{1,3})?$", re.IGNORECASE)
+PAGE_LABEL = re.compile(r"\bpage\s*\d", re.IGNORECASE)
+
+# End of a sentence, where an oversized paragraph is preferably cut
+SENTENCE_END = re.compile(r"[.!?][\"')\]]?\s+")
+# Characters reserved for the elision marker and its separators
+MARKER_CHARS = 80
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt token estimate of a text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+def fit_token_budget(text: str, token_budget: int) -> str:
+    """
+    Shorten a text to the token budget at paragraph boundaries
+
+    The opening (thesis, outline) and the ending (conclusion) are kept; the
+    middle is elided with a marker. A budget of 0 disables the limit.
+    """
+    if not token_budget or estimate_tokens(text) <= token_budget:
+        return text
+
+    paragraphs = text.split("\n\n")
+    head_budget = token_budget * 3 // 4
+    head, tail = [], []
+    used = 0
+
+    for paragraph in paragraphs:
+        cost = estimate_tokens(paragraph) + 1
+        if used + cost > head_budget:
+            break
+        head.append(paragraph)
+        used += cost
+
+    for paragraph in reversed(paragraphs[len(head):]):
+        cost = estimate_tokens(paragraph) + 1
+        if used + cost > token_budget:
+            break
+        tail.insert(0, paragraph)
+        used += cost
+
+    # A huge opening paragraph: cut inside it, keeping the opening and the final quarter
+    if not head:
+        return _elide_within(text, head_budget * CHARS_PER_TOKEN, (token_budget - head_budget) * CHARS_PER_TOKEN - MARKER_CHARS)
+
+    omitted = len(paragraphs) - len(head) - len(tail)
+    omitted_words = sum(len(paragraph.split()) for paragraph in paragraphs[len(head):len(paragraphs) - len(tail)])
+    return "\n\n".join(head + [_elision_marker(omitted_words, omitted)] + tail)
+
+def _elision_marker(omitted_words: int, omitted_paragraphs: int) -> str:
+    return f"[... {omitted_words} words in {max(omitted_paragraphs, 1)} paragraphs omitted for length ...]"
+
+def _elide_within(text: str, head_chars: int, tail_chars: int) -> str:
+    """Keep about head_chars of the opening and tail_chars of the ending, cut at sentence or word boundaries"""
+    # Prefer the last sentence end in the second half of the head window, else the last word
+    sentence_ends = [match.end() for match in SENTENCE_END.finditer(text, head_chars // 2, head_chars)]
+    head_end = sentence_ends[-1] if sentence_ends else max(text.rfind(" ", 0, head_chars), 0)
+
+    # Prefer the first sentence start in the first half of the tail window, else the first word
+    tail_from = max(len(text) - max(tail_chars, 0), head_end)
+    match = SENTENCE_END.search(text, tail_from, tail_from + tail_chars // 2)
+    if match:
+        tail_start = match.end()
+    else:
+        space = text.find(" ", tail_from)
+        tail_start = space + 1 if space != -1 else len(text)
+
+    omitted = text[head_end:tail_start]
+    marker = _elision_marker(len(omitted.split()), omitted.count("\n\n") + 1)
+    return "\n\n".join(part for part in (text[:head_end].rstrip(), marker, text[tail_start:].lstrip()) if part)
+
+@dataclass
+class SanitizedEssay:
+    """Sanitized essay text and what the sanitizer saved"""
+    text: str
+    tokens_before: int
+    tokens_after: int
+    truncated: bool = False
+    removed: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+class EssaySanitizer:
+    """
+    Local Step 0 sanitization: strips non-essay noise before the text reaches the prompt
+
+    Removes headers/footers repeated across pages, scanner watermarks, page
+    labels, URLs and metadata lines, and reports the prompt tokens saved
+    (including those cut by the token budget applied in prompt construction).
+    """
+
+    def __init__(self, token_budget: int = None, min_repeats: int = None):
+        self.enabled = os.getenv("SANITIZER_ENABLED", "true").lower() == "true"
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv("ESSAY_TOKEN_BUDGET", "8000"))
+        self.min_repeats = min_repeats or int(os.getenv("SANITIZER_MIN_REPEATS", "3"))
+
+        self.essays = 0
+        self.truncated = 0
+        self.total_tokens_before = 0
+        self.total_tokens_saved = 0
+
+    def sanitize(self, text: str) -> SanitizedEssay:
+        """
+        Remove non-essay noise from extracted or submitted text
+
+        Args:
+            text: Essay text after PDFService.clean_text (or as submitted)
+
+        Returns:
+            SanitizedEssay with the cleaned text (not truncated) and token savings
+        """
+        tokens_before = estimate_tokens(text)
+        if not self.enabled or not text:
+            return SanitizedEssay(text=text, tokens_before=tokens_before, tokens_after=tokens_before)
+
+        removed: Dict[str, int] = {}
+        paragraphs = [paragraph.strip() for paragraph in text.split("\n\n") if paragraph.strip()]
+
+        paragraphs = self._strip_repeated_affixes(paragraphs, removed)
+        paragraphs = [self._strip_noise(paragraph, removed) for paragraph in paragraphs]
+
+        kept = []
+        for paragraph in paragraphs:
+            if not paragraph:
+                continue
+            if len(paragraph.split()) <= MAX_AFFIX_WORDS and METADATA_PARAGRAPH.match(paragraph):
+                removed["metadata"] = removed.get("metadata", 0) + 1
+                continue
+            kept.append(paragraph)
+
+        cleaned = "\n\n".join(kept)
+        budgeted = fit_token_budget(cleaned, self.token_budget)
+        result = SanitizedEssay(
+            text=cleaned,
+            tokens_before=tokens_before,
+            tokens_after=estimate_tokens(budgeted),
+            truncated=budgeted != cleaned,
+            removed=removed
+        )
+
+        self.essays += 1
+        self.truncated += int(result.truncated)
+        self.total_tokens_before += tokens_before
+        self.total_tokens_saved += result.tokens_saved
+        if result.tokens_saved:
+            logger.info(f"Sanitizer saved ~{result.tokens_saved} of {tokens_before} prompt tokens "
+                        f"(removed: {removed}, truncated: {result.truncated})")
+        return result
+
+    def _strip_repeated_affixes(self, paragraphs: List[str], removed: Dict[str, int]) -> List[str]:
+        """Remove header/footer phrases repeated at the start or end of several paragraphs"""
+        if len(paragraphs) < self.min_repeats:
+            return paragraphs
+
+        # Identical short paragraphs on several pages (a header block on its own line)
+        counts = Counter(self._normalize(paragraph.split()) for paragraph in paragraphs
+                         if len(paragraph.split()) <= MAX_AFFIX_WORDS and self._looks_like_header(paragraph.split()))
+        repeated = {paragraph for paragraph, count in counts.items() if count >= self.min_repeats}
+        if repeated:
+            kept = [paragraph for paragraph in paragraphs if self._normalize(paragraph.split()) not in repeated]
+            removed["headers_footers"] = removed.get("headers_footers", 0) + len(paragraphs) - len(kept)
+            paragraphs = kept
+
+        # Each paragraph (page) loses at most one header and one footer, longest first
+        words = [paragraph.split() for paragraph in paragraphs]
+        stripped = [{True: False, False: False} for _ in words]
+        for size in range(MAX_AFFIX_WORDS, 0, -1):
+            for from_start in (True, False):
+                candidates = {}
+                for index, w in enumerate(words):
+                    if len(w) >= size and not stripped[index][from_start]:
+                        affix = w[:size] if from_start else w[-size:]
+                        candidates.setdefault(self._normalize(affix), (affix, []))[1].append(index)
+
+                for affix, indexes in candidates.values():
+                    if len(indexes) < self.min_repeats or not self._looks_like_header(affix):
+                        continue
+                    for index in indexes:
+                        words[index] = words[index][size:] if from_start else words[index][:-size]
+                        stripped[index][from_start] = True
+                    removed["headers_footers"] = removed.get("headers_footers", 0) + len(indexes)
+
+        return [" ".join(w) for w in words]
+
+    def _strip_noise(self, paragraph: str, removed: Dict[str, int]) -> str:
+        """Remove watermarks, page labels and URLs inside a paragraph"""
+        for pattern in WATERMARK_PATTERNS:
+            paragraph, count = pattern.subn(" ", paragraph)
+            if count:
+                removed["watermarks"] = removed.get("watermarks", 0) + count
+
+        paragraph, count = URL_PATTERN.subn(" ", paragraph)
+        if count:
+            removed["urls"] = removed.get("urls", 0) + count
+
+        return re.sub(r" {2,}", " ", paragraph).strip()
+
+    def _normalize(self, words: List[str]) -> str:
+        """Affix identity ignoring case and page-specific numbers"""
+        return re.sub(r"\d+", "#", " ".join(words).lower())
+
+    def _looks_like_header(self, words: List[str]) -> bool:
+        """Whether a repeated affix is page furniture rather than a recurring prose phrase"""
+        text = " ".join(words)
+        if len(words) == 1:
+            return PAGE_NUMBER.match(text) is not None
+        # Sentence punctuation means prose ("No." and initials are fine, "in 1947." is not)
+        if re.search(r"[,;!?]|[a-z\d]{3,}\.(?:\s|$)", text):
+            return False
+        if ":" in text or PAGE_LABEL.search(text):
+            return True
+        # A page number next to a title ("CSS Essay 7")
+        if PAGE_NUMBER.match(words[0]) or PAGE_NUMBER.match(words[-1]):
+            title = words[1:] if PAGE_NUMBER.match(words[0]) else words[:-1]
+            return all(word[:1].isupper() for word in title)
+        capitalized = sum(1 for word in words if word[:1].isupper())
+        return len(words) >= 3 and capitalized / len(words) >= 0.6
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sanitizer statistics"""
+        return {
+            "enabled": self.enabled,
+            "token_budget": self.token_budget,
+            "essays": self.essays,
+            "truncated": self.truncated,
+            "tokens_saved": self.total_tokens_saved,
+            "avg_tokens_saved": round(self.total_tokens_saved / self.essays, 1) if self.essays else 0.0,
+            "saved_fraction": round(self.total_tokens_saved / self.total_tokens_before, 3) if self.total_tokens_before else 0.0
+        }
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+class ExtractionCache:
+    """Persistent cache of extracted PDF text keyed by a hash of the file's bytes, bounded by total size"""
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.enabled = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+        self.db_path = db_path or os.getenv("EXTRACTION_CACHE_PATH", "storage/cache/extraction_cache.sqlite3")
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        if self.enabled:
+            self._connect()
+
+    def _connect(self):
+        """Open the SQLite database shared by all worker processes"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS extraction_cache (
+                cache_key TEXT PRIMARY KEY,
+                result_json TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_access ON extraction_cache(last_access)")
+        self._conn.commit()
+        logger.info(f"ExtractionCache ready at {self.db_path} (max {self.max_bytes} bytes)")
+
+    def make_key(self, pdf_file_path: str, *settings: Any) -> str:
+        """
+        Build the cache key from the SHA-256 of the file's bytes and the extraction settings
+
+        Args:
+            pdf_file_path: Path to the uploaded PDF
+            settings: Anything else the extracted text depends on (caps, extractor version)
+        """
+        digest = hashlib.sha256()
+        with open(pdf_file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        for setting in settings:
+            digest.update(b"\x00")
+            digest.update(str(setting).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached extraction
+
+        Args:
+            cache_key: Key from make_key
+
+        Returns:
+            The stored extraction fields, or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT result_json FROM extraction_cache WHERE cache_key = ?",
+                    (cache_key,)
+                ).fetchone()
+
+                if not row:
+                    self.misses += 1
+                    return None
+
+                self._conn.execute(
+                    "UPDATE extraction_cache SET last_access = ? WHERE cache_key = ?",
+                    (time.time(), cache_key)
+                )
+                self._conn.commit()
+                self.hits += 1
+
+            return json.loads(row[0])
+
+        except Exception as e:
+            logger.error(f"Error reading extraction cache: {e}")
+            return None
+
+    def set(self, cache_key: str, extraction: Dict[str, Any]) -> None:
+        """
+        Store an extraction and evict least recently used entries above max_bytes
+
+        Args:
+            cache_key: Key from make_key
+            extraction: Extraction fields, JSON-serializable
+        """
+        if not self.enabled:
+            return
+
+        try:
+            result_json = json.dumps(extraction)
+            size_bytes = len(result_json.encode("utf-8"))
+            if size_bytes > self.max_bytes:
+                return
+
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    """INSERT OR REPLACE INTO extraction_cache
+                    (cache_key, result_json, size_bytes, created_at, last_access) VALUES (?, ?, ?, ?, ?)""",
+                    (cache_key, result_json, size_bytes, now, now)
+                )
+                self.stores += 1
+                self._evict()
+                self._conn.commit()
+
+        except Exception as e:
+            logger.error(f"Error writing extraction cache: {e}")
+
+    def _evict(self) -> None:
+        """Drop the least recently used entries until the total size fits max_bytes"""
+        self.evictions += self._conn.execute(
+            """DELETE FROM extraction_cache WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key, SUM(size_bytes) OVER (ORDER BY last_access DESC, rowid DESC) AS total
+                    FROM extraction_cache
+                ) WHERE total > ?
+            )""",
+            (self.max_bytes,)
+        ).rowcount
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "max_bytes": self.max_bytes
+        }
+
+        if self.enabled:
+            try:
+                with self._lock:
+                    entries, size_bytes = self._conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM extraction_cache"
+                    ).fetchone()
+                stats["entries"] = entries
+                stats["size_bytes"] = size_bytes
+            except Exception as e:
+                logger.error(f"Error counting extraction cache entries: {e}")
+
+        return stats
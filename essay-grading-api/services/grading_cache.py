@@ -0,0 +1,179 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, Any, Optional
+from models import GradingResult
+
+logger = logging.getLogger(__name__)
+
+class GradingCache:
+    """Persistent content-addressed cache of parsed grading results"""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        self.enabled = os.getenv("GRADING_CACHE_ENABLED", "true").lower() == "true"
+        self.db_path = db_path or os.getenv("GRADING_CACHE_PATH", "storage/cache/grading_cache.sqlite3")
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("GRADING_CACHE_MAX_ENTRIES", "5000"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("GRADING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        if self.enabled:
+            self._connect()
+
+    def _connect(self):
+        """Open the SQLite database shared by all worker processes"""
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS grading_cache (
+                cache_key TEXT PRIMARY KEY,
+                result_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_grading_cache_access ON grading_cache(last_access)")
+        self._conn.commit()
+        logger.info(f"GradingCache ready at {self.db_path} (max {self.max_entries} entries, TTL {self.ttl_seconds}s)")
+
+    @staticmethod
+    def normalize_text(essay_text: str) -> str:
+        """Normalize essay text so trivially different resubmissions share a key"""
+        text = unicodedata.normalize("NFC", essay_text or "")
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def make_key(self, essay_text: str, rubric_type: Optional[str], model_name: str) -> str:
+        """Build the cache key from normalized text, rubric type and model name"""
+        digest = hashlib.sha256()
+        for part in (self.normalize_text(essay_text), rubric_type or "default", model_name):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, cache_key: str) -> Optional[GradingResult]:
+        """
+        Look up a cached grading result
+
+        Args:
+            cache_key: Key from make_key
+
+        Returns:
+            Cached GradingResult or None on a miss or expired entry
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            now = time.time()
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT result_json, created_at FROM grading_cache WHERE cache_key = ?",
+                    (cache_key,)
+                ).fetchone()
+
+                if row and now - row[1] > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM grading_cache WHERE cache_key = ?", (cache_key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                    row = None
+
+                if not row:
+                    self.misses += 1
+                    return None
+
+                self._conn.execute(
+                    "UPDATE grading_cache SET last_access = ? WHERE cache_key = ?",
+                    (now, cache_key)
+                )
+                self._conn.commit()
+                self.hits += 1
+
+            return GradingResult.model_validate_json(row[0])
+
+        except Exception as e:
+            logger.error(f"Error reading grading cache: {e}")
+            return None
+
+    def set(self, cache_key: str, grading_result: GradingResult) -> None:
+        """
+        Store a grading result and evict expired or least recently used entries
+
+        Args:
+            cache_key: Key from make_key
+            grading_result: Parsed AI grading result (never a fallback result)
+        """
+        if not self.enabled:
+            return
+
+        try:
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO grading_cache (cache_key, result_json, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (cache_key, grading_result.model_dump_json(), now, now)
+                )
+                self.stores += 1
+                self._evict(now)
+                self._conn.commit()
+
+        except Exception as e:
+            logger.error(f"Error writing grading cache: {e}")
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        expired = self._conn.execute(
+            "DELETE FROM grading_cache WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        ).rowcount
+
+        overflow = self._conn.execute(
+            """DELETE FROM grading_cache WHERE cache_key IN (
+                SELECT cache_key FROM grading_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,)
+        ).rowcount
+
+        self.evictions += expired + overflow
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+        if self.enabled:
+            try:
+                with self._lock:
+                    stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM grading_cache").fetchone()[0]
+            except Exception as e:
+                logger.error(f"Error counting grading cache entries: {e}")
+
+        return stats
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from google.api_core import exceptions as api_exceptions
+
+from services.context_cache import ContextCache, GeminiContextCacheBackend
+from services.essay_batcher import split_batch_payload
+from services.rubric import (
+    CATEGORY_GROUPS, MODEL_CATEGORIES, REMARK_KEYS, build_batch_response_schema, build_response_schema
+)
+
+logger = logging.getLogger(__name__)
+
+class GradingProvider(ABC):
+    """
+    Model backend behind AIService
+
+    generate() is blocking and returns an object shaped like the Gemini SDK
+    response: .text, .usage_metadata and, when streaming, iteration over
+    chunks with .text.
+    """
+
+    name = "base"
+    model_name = "unknown"
+
+    @abstractmethod
+    def generate(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                 batch: bool = False, categories: Optional[Sequence[str]] = None, quick: bool = False) -> Any:
+        """
+        Generate a grading response
+
+        Args:
+            prompt: Full prompt, or only the essay payload when instructions are given
+            instructions: Static rubric instructions (cached by the provider if it can)
+            stream: Return an iterable of chunks instead of a complete response
+            batch: The prompt holds several essays and asks for the batch response format
+            categories: Compact keys of the only categories to mark (category fan-out)
+            quick: Quick-grade tier: short feedback under a hard output token cap
+        """
+
+    def quota(self) -> Optional[Tuple[int, int]]:
+        """Combined (requests, tokens) per minute of this backend, or None to use the configured limits"""
+        return None
+
+    def can_fail_over(self, error: Exception) -> bool:
+        """Whether a throttle error is local to one key and another key of this backend can take the retry"""
+        return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get provider statistics"""
+        return {"name": self.name, "model": self.model_name}
+
+class GeminiProvider(GradingProvider):
+    """Google Gemini backend with provider-side caching of the rubric"""
+
+    name = "gemini"
+
+    def __init__(self, structured_output: bool = True, api_key: str = None, model_name: str = None,
+                 dedicated_client: bool = False):
+        """
+        Args:
+            structured_output: Constrain replies to the compact JSON schema
+            api_key: API key (default: GEMINI_API_KEY)
+            model_name: Model to call (default: gemini-1.5-flash)
+            dedicated_client: Use a client of its own for this key instead of the
+                process-wide SDK configuration (for additional keys of a pool)
+        """
+        import google.generativeai as genai
+
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+
+        self.model_name = model_name or 'gemini-1.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
+        if dedicated_client:
+            # The SDK has no public per-model client option: GenerativeModel only falls
+            # back to the process-wide client while _client is unset. The SDK version is
+            # pinned and test_provider_pool checks that each key's requests use that key
+            import google.ai.generativelanguage as glm
+            self.model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+        else:
+            genai.configure(api_key=api_key)
+
+        # Structured-output mode constrains the reply to a compact JSON schema
+        self.generation_config = genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=build_response_schema()
+        ) if structured_output else None
+        self.batch_generation_config = genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=build_batch_response_schema()
+        ) if structured_output else None
+        # The quick tier is capped hard; the prompt keeps its JSON well under the cap
+        self.quick_max_output_tokens = int(os.getenv("GEMINI_QUICK_MAX_OUTPUT_TOKENS", "400"))
+        self.quick_generation_config = genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=build_response_schema(quick=True),
+            max_output_tokens=self.quick_max_output_tokens
+        ) if structured_output else genai.GenerationConfig(max_output_tokens=self.quick_max_output_tokens)
+        self.group_generation_configs = {
+            keys: genai.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=build_response_schema(keys)
+            ) for keys in CATEGORY_GROUPS.values()
+        } if structured_output else {}
+        # A quick batch holds up to GEMINI_BATCH_MAX_ESSAYS quick gradings under one cap
+        quick_batch_max_output_tokens = self.quick_max_output_tokens * int(os.getenv("GEMINI_BATCH_MAX_ESSAYS", "8"))
+        self.quick_batch_generation_config = genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=build_batch_response_schema(quick=True),
+            max_output_tokens=quick_batch_max_output_tokens
+        ) if structured_output else genai.GenerationConfig(max_output_tokens=quick_batch_max_output_tokens)
+
+        # The static rubric is cached provider-side so each call only sends the essay
+        self.context_cache = ContextCache(GeminiContextCacheBackend(self.model_name, self.generation_config))
+        if dedicated_client:
+            # The SDK creates cached contents with the process-wide key only
+            self.context_cache.enabled = False
+
+    def generate(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                 batch: bool = False, categories: Optional[Sequence[str]] = None, quick: bool = False) -> Any:
+        if batch:
+            # Batch calls share one inline rubric across their essays
+            prompt = f"{instructions}\n\n{prompt}" if instructions else prompt
+            generation_config = self.quick_batch_generation_config if quick else self.batch_generation_config
+            return self.model.generate_content(prompt, generation_config=generation_config, stream=stream)
+
+        model = self.context_cache.get_model(instructions) if instructions else None
+        if model is None:
+            model = self.model
+            if instructions:
+                prompt = f"{instructions}\n\n{prompt}"
+
+        generation_config = self.generation_config
+        if quick:
+            generation_config = self.quick_generation_config
+        elif categories:
+            generation_config = self.group_generation_configs.get(tuple(categories), self.generation_config)
+        if stream:
+            return model.generate_content(prompt, generation_config=generation_config, stream=True)
+        return model.generate_content(prompt, generation_config=generation_config)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["context_cache"] = self.context_cache.get_stats()
+        return stats
+
+class MockUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.cached_content_token_count = 0
+
+class MockChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class MockResponse:
+    """SDK-shaped response; iterating it streams the text in chunks over the latency"""
+
+    def __init__(self, text: str, usage: MockUsage, latency: float, chunk_size: int):
+        self.text = text
+        self.usage_metadata = usage
+        self.latency = latency
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[MockChunk]:
+        starts = range(0, len(self.text), self.chunk_size)
+        for start in starts:
+            time.sleep(self.latency / len(starts))
+            yield MockChunk(self.text[start:start + self.chunk_size])
+
+class MockProvider(GradingProvider):
+    """
+    Local backend returning valid rubric JSON without network access
+
+    Latency follows a configurable distribution (fixed, uniform, normal or
+    lognormal), a configurable share of calls fails with 429/503 errors, and
+    the reported token counts are configurable. Scores are derived from a hash
+    of the essay so the same submission always gets the same result.
+    """
+
+    name = "mock"
+
+    def __init__(self):
+        self.model_name = "mock"
+        self.latency_distribution = os.getenv("MOCK_LATENCY_DISTRIBUTION", "lognormal").lower()
+        self.latency_mean = float(os.getenv("MOCK_LATENCY_MEAN_SECONDS", "2.0"))
+        self.latency_stddev = float(os.getenv("MOCK_LATENCY_STDDEV_SECONDS", "0.5"))
+        self.error_rate = float(os.getenv("MOCK_ERROR_RATE", "0.0"))
+        self.prompt_tokens = int(os.getenv("MOCK_PROMPT_TOKENS", "0"))
+        self.output_tokens = int(os.getenv("MOCK_OUTPUT_TOKENS", "0"))
+        # Generation speed: a longer response adds latency (0 = latency independent of length)
+        self.output_tokens_per_second = float(os.getenv("MOCK_OUTPUT_TOKENS_PER_SECOND", "0"))
+        self.quick_max_output_tokens = int(os.getenv("GEMINI_QUICK_MAX_OUTPUT_TOKENS", "400"))
+        self.chunk_size = int(os.getenv("MOCK_STREAM_CHUNK_CHARS", "64"))
+
+        if self.latency_distribution not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown MOCK_LATENCY_DISTRIBUTION: {self.latency_distribution}")
+
+        self._random = random.Random(os.getenv("MOCK_SEED"))
+        self.calls = 0
+        self.errors = 0
+
+    def generate(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                 batch: bool = False, categories: Optional[Sequence[str]] = None, quick: bool = False) -> Any:
+        self.calls += 1
+        latency = self.sample_latency()
+
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            time.sleep(latency / 4)
+            if self._random.random() < 0.5:
+                raise api_exceptions.ResourceExhausted("Mock provider: 429 Resource has been exhausted (e.g. check quota).")
+            raise api_exceptions.ServiceUnavailable("Mock provider: 503 The model is overloaded. Please try again later.")
+
+        text = self.build_batch_response(prompt, quick) if batch else self.build_response(prompt, categories, quick)
+        # A partial or quick grading reports its padded size rather than the full count
+        output_tokens = self.output_tokens if self.output_tokens and not (categories or quick) else math.ceil(len(text) / 4)
+        usage = MockUsage(self.prompt_tokens or math.ceil(len((instructions or "") + prompt) / 4), output_tokens)
+        if self.output_tokens_per_second:
+            latency += usage.candidates_token_count / self.output_tokens_per_second
+        response = MockResponse(text, usage, latency, self.chunk_size)
+        if not stream:
+            time.sleep(latency)
+        return response
+
+    def sample_latency(self, rng: Optional[random.Random] = None) -> float:
+        """Draw one call latency in seconds from the configured distribution"""
+        rng = rng or self._random
+        mean, stddev = self.latency_mean, self.latency_stddev
+        if self.latency_distribution == "fixed" or mean <= 0:
+            return max(0.0, mean)
+        if self.latency_distribution == "uniform":
+            spread = stddev * math.sqrt(3)
+            return max(0.0, rng.uniform(mean - spread, mean + spread))
+        if self.latency_distribution == "normal":
+            return max(0.0, rng.gauss(mean, stddev))
+
+        # Lognormal with the requested mean and standard deviation (long right tail)
+        sigma = math.sqrt(math.log(1 + (stddev / mean) ** 2))
+        return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+
+    def build_response(self, prompt: str, categories: Optional[Sequence[str]] = None, quick: bool = False) -> str:
+        """Compact rubric JSON with scores seeded by the essay text, optionally for some categories only"""
+        essay = prompt.split("ESSAY TO ANALYZE:", 1)[-1]
+        match = re.search(r"The submission is (\d+) words long", prompt)
+        word_count = int(match.group(1)) if match else len(essay.split())
+        grading = self._grading(essay, word_count, categories, quick)
+        return json.dumps(grading, separators=(",", ":"))
+
+    def build_batch_response(self, prompt: str, quick: bool = False) -> str:
+        """Batch JSON holding one seeded compact (or quick) grading per essay of the prompt"""
+        results = [
+            dict(i=index, **self._grading(essay, word_count, quick=quick))
+            for index, word_count, essay in split_batch_payload(prompt)
+        ]
+        return json.dumps({"results": results}, separators=(",", ":"))
+
+    def _grading(self, essay: str, word_count: int, only: Optional[Sequence[str]] = None,
+                 quick: bool = False) -> Dict[str, Any]:
+        scores = random.Random(hashlib.sha256(essay.strip().encode("utf-8")).hexdigest())
+        # Scores are drawn for every category so a subset matches the full grading
+        categories = {
+            key: {"s": scores.randint(0, max(1, int(max_score * 0.7))), "f": f"Mock assessment of {name.lower()}."}
+            for key, (name, max_score) in MODEL_CATEGORIES.items()
+        }
+        if only:
+            categories = {key: value for key, value in categories.items() if key in only}
+        summary = "Mock grading result generated locally for load testing."
+        if self.output_tokens:
+            # Pad the feedback so the payload size matches the configured token count
+            # (a grading of some categories gets their share of it, a quick one stays under its cap)
+            target_tokens = int(self.output_tokens * len(categories) / len(MODEL_CATEGORIES))
+            if quick:
+                target_tokens = min(target_tokens, self.quick_max_output_tokens // 2)
+            filler = " Additional mock feedback text."
+            target_chars = target_tokens * 4 - len(json.dumps(categories)) - 200
+            summary += filler * max(0, target_chars // len(filler))
+
+        grading = {
+            "c": categories,
+            "sf": summary,
+            "t": "B" if word_count >= 800 else "E"
+        }
+        if not quick:
+            grading["r"] = {key: [f"Mock {remark[:-1]}"] for key, remark in REMARK_KEYS.items()}
+        return grading
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update({
+            "latency_distribution": self.latency_distribution,
+            "latency_mean_seconds": self.latency_mean,
+            "error_rate": self.error_rate,
+            "calls": self.calls,
+            "errors": self.errors
+        })
+        return stats
+
+def create_provider(structured_output: bool = True) -> GradingProvider:
+    """
+    Create the grading provider selected by GRADING_PROVIDER (gemini, mock, replay or record)
+
+    With GEMINI_KEY_POOL or GEMINI_API_KEYS set, gemini calls are spread over a pool of keys.
+    """
+    from services.provider_pool import create_provider_pool
+
+    provider = os.getenv("GRADING_PROVIDER", "gemini").lower()
+    if provider == "gemini":
+        return create_provider_pool(structured_output) or GeminiProvider(structured_output)
+    if provider == "mock":
+        return MockProvider()
+    if provider in ("replay", "record"):
+        from services.replay_provider import RecordingProvider, ReplayProvider
+        if provider == "replay":
+            return ReplayProvider()
+        return RecordingProvider(create_provider_pool(structured_output) or GeminiProvider(structured_output))
+    raise ValueError(f"Unknown GRADING_PROVIDER: {provider}")
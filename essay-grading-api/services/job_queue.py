@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(Exception):
+    """Raised when the grading queue cannot accept more jobs"""
+
+class JobQueue:
+    """Bounded in-process queue of grading jobs served by a fixed pool of workers"""
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        positions_callback: Optional[Callable[[Dict[str, int]], None]] = None
+    ):
+        """
+        Args:
+            num_workers: Jobs run concurrently (default: JOB_WORKERS)
+            max_size: Queued jobs before submit() is rejected (default: JOB_QUEUE_MAX_SIZE)
+            positions_callback: Blocking function recording the new positions of waiting
+                jobs ({task_id: position}); runs in a thread, once per batch of dequeues
+        """
+        self.num_workers = num_workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.max_size = max_size or int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+        self.positions_callback = positions_callback
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop = None
+        self._workers: List[asyncio.Task] = []
+        self._pending: List[str] = []
+        self._positions_task: Optional[asyncio.Task] = None
+        self._positions_stale = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.running = 0
+        self.position_writes = 0
+
+    def _ensure_workers(self) -> None:
+        """Start the worker pool on the running event loop if needed"""
+        loop = asyncio.get_running_loop()
+        if self._queue is not None and self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._pending = []
+        self._workers = [
+            loop.create_task(self._worker(index)) for index in range(self.num_workers)
+        ]
+        logger.info(f"Started {self.num_workers} grading workers (queue size {self.max_size})")
+
+    def submit(
+        self,
+        task_id: str,
+        job: Callable[[], Awaitable[Any]],
+        on_drop: Optional[Callable[[], None]] = None
+    ) -> int:
+        """
+        Queue a job for background execution
+
+        Args:
+            task_id: Task ID used for progress tracking
+            job: Coroutine factory running the grading pipeline
+            on_drop: Called instead of the job if the queue stops before it starts
+
+        Returns:
+            1-based position of the job in the queue
+
+        Raises:
+            QueueFullError: If the queue is at capacity
+        """
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((task_id, job, on_drop))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError("Grading queue is full, please try again later")
+
+        self.submitted += 1
+        self._pending.append(task_id)
+        return len(self._pending)
+
+    def get_position(self, task_id: str) -> Optional[int]:
+        """Get the 1-based queue position of a job, or None once it has started"""
+        try:
+            return self._pending.index(task_id) + 1
+        except ValueError:
+            return None
+
+    async def _worker(self, index: int) -> None:
+        """Run queued jobs one at a time"""
+        while True:
+            task_id, job, _ = await self._queue.get()
+            self._dequeue(task_id)
+            self.running += 1
+            try:
+                await job()
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Grading job {task_id} failed on worker {index}: {e}")
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    def _dequeue(self, task_id: str) -> None:
+        """Remove a started job and schedule a position update for those behind it"""
+        if task_id in self._pending:
+            self._pending.remove(task_id)
+        if not self.positions_callback or not self._pending:
+            return
+        self._positions_stale = True
+        if self._positions_task is None or self._positions_task.done():
+            self._positions_task = self._loop.create_task(self._write_positions())
+
+    async def _write_positions(self) -> None:
+        """
+        Report the positions of waiting jobs off the event loop
+
+        Dequeues arriving while a write is in progress are folded into one
+        more write, so a burst costs two batches rather than one per job.
+        """
+        while self._positions_stale and self._pending:
+            self._positions_stale = False
+            positions = {task_id: position for position, task_id in enumerate(self._pending, start=1)}
+            try:
+                await asyncio.to_thread(self.positions_callback, positions)
+                self.position_writes += 1
+            except Exception as e:
+                logger.warning(f"Failed to update queue positions: {e}")
+
+    async def stop(self) -> None:
+        """Cancel the worker pool and drop the jobs that have not started"""
+        # Workers started on another (already finished) loop cannot be awaited here
+        if self._loop is asyncio.get_running_loop():
+            tasks = self._workers + ([self._positions_task] if self._positions_task else [])
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        dropped = 0
+        while self._queue is not None and not self._queue.empty():
+            task_id, _, on_drop = self._queue.get_nowait()
+            dropped += 1
+            if on_drop:
+                try:
+                    on_drop()
+                except Exception as e:
+                    logger.warning(f"Failed to clean up dropped job {task_id}: {e}")
+        if dropped:
+            self.dropped += dropped
+            logger.warning(f"Job queue stopped; {dropped} queued jobs dropped")
+
+        self._workers = []
+        self._pending = []
+        self._positions_task = None
+        self._queue = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics"""
+        return {
+            "workers": self.num_workers,
+            "max_size": self.max_size,
+            "queued": len(self._pending),
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "position_writes": self.position_writes
+        }
@@ -0,0 +1,287 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from google.api_core import exceptions as api_exceptions
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first; quick grades go ahead of full interactive
+# uploads, which go ahead of bulk grading
+PRIORITIES = {
+    "quick": 0,
+    "interactive": 1,
+    "batch": 2,
+}
+
+THROTTLE_ERRORS = (
+    api_exceptions.ResourceExhausted,
+    api_exceptions.TooManyRequests,
+    api_exceptions.ServiceUnavailable,
+)
+
+def is_throttle_error(error: Exception) -> bool:
+    """True for quota (429) and overload (503) errors worth retrying"""
+    return isinstance(error, THROTTLE_ERRORS) or getattr(error, "code", None) in (429, 503)
+
+class TokenBucket:
+    """Refilling allowance of units per minute; a limit of 0 means unlimited"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, rate_factor: float) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60 * rate_factor)
+        self._updated = now
+
+    def delay_for(self, amount: float, rate_factor: float = 1.0) -> float:
+        """Seconds until amount units are available (0 when they are now)"""
+        if self.unlimited:
+            return 0.0
+        self._refill(rate_factor)
+        # A single request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.capacity / 60 * rate_factor)
+
+    def remaining(self, rate_factor: float = 1.0) -> float:
+        """Share of the per-minute allowance currently available (1.0 when unlimited)"""
+        if self.unlimited:
+            return 1.0
+        self._refill(rate_factor)
+        return max(0.0, self.level / self.capacity)
+
+    def take(self, amount: float) -> None:
+        """Consume units; the level may go negative when a call used more than estimated"""
+        if not self.unlimited:
+            self.level -= amount
+
+class _Reservation:
+    def __init__(self, tokens: int, priority: str, waited: float):
+        self.tokens = tokens
+        self.priority = priority
+        self.waited = waited
+        self.actual_tokens: Optional[int] = None
+        self.worker: Optional[Future] = None
+
+    def hold_until_done(self, worker: Future) -> None:
+        """Keep the slot until this worker-thread call returns, even if the caller stops waiting"""
+        self.worker = worker
+
+class _Waiter:
+    def __init__(self, tokens: int, loop: asyncio.AbstractEventLoop):
+        self.tokens = tokens
+        self.loop = loop
+        self.event = asyncio.Event()
+
+class OutboundScheduler:
+    """
+    Process-wide gate in front of every outbound model call
+
+    Calls wait in a priority queue (quick, then interactive, then batch; FIFO
+    within a priority) and are admitted while a concurrency slot and both token buckets
+    (requests and tokens per minute) allow. A 429/503 halves the refill rate
+    and pauses admissions with exponential backoff; successes restore the rate
+    step by step. Callers retry throttled calls after a jittered delay.
+    """
+
+    def __init__(self, max_concurrency: int = None, rpm_limit: int = None, tpm_limit: int = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+        self.requests = TokenBucket(rpm_limit if rpm_limit is not None else int(os.getenv("GEMINI_RPM_LIMIT", "2000")))
+        self.tokens = TokenBucket(tpm_limit if tpm_limit is not None else int(os.getenv("GEMINI_TPM_LIMIT", "4000000")))
+        self.max_retries = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+        self.backoff_base = float(os.getenv("GEMINI_RETRY_BASE_SECONDS", "1.0"))
+        self.backoff_max = float(os.getenv("GEMINI_RETRY_MAX_SECONDS", "30.0"))
+        self.min_rate_factor = float(os.getenv("GEMINI_MIN_RATE_FACTOR", "0.1"))
+        self.recovery_step = float(os.getenv("GEMINI_RATE_RECOVERY_STEP", "0.05"))
+
+        self._lock = threading.Lock()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._random = random.Random()
+        self.in_flight = 0
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self.consecutive_throttles = 0
+
+        self.max_queue_depth = 0
+        self.admitted = {name: 0 for name in PRIORITIES}
+        self.total_wait = {name: 0.0 for name in PRIORITIES}
+        self._recent_waits = {name: deque(maxlen=1000) for name in PRIORITIES}
+        self.throttles = 0
+        self.retries = 0
+        self.abandoned_calls = 0
+
+    @asynccontextmanager
+    async def reserve(self, tokens: int, priority: str = "interactive"):
+        """
+        Wait for admission and hold a call slot for the duration of the block
+
+        Set actual_tokens on the yielded reservation once usage is known so the
+        token bucket is charged for what the call really used. A blocking call
+        registered with hold_until_done keeps the slot after the block exits
+        (timeout, lost hedge) until its thread actually returns.
+
+        Args:
+            tokens: Estimated prompt plus output tokens of the call
+            priority: "quick", "interactive" or "batch"
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+
+        reservation = await self._acquire(tokens, priority)
+        try:
+            yield reservation
+        finally:
+            worker = reservation.worker
+            if worker is None:
+                self._release(reservation)
+            else:
+                if not worker.done():
+                    with self._lock:
+                        self.abandoned_calls += 1
+                # Runs at once if the call already returned
+                worker.add_done_callback(lambda _: self._release(reservation))
+
+    async def _acquire(self, tokens: int, priority: str) -> _Reservation:
+        waiter = _Waiter(tokens, asyncio.get_running_loop())
+        entry = (PRIORITIES[priority], next(self._sequence), waiter)
+        started = time.perf_counter()
+
+        with self._lock:
+            heapq.heappush(self._queue, entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+
+        try:
+            while True:
+                with self._lock:
+                    waiter.event.clear()
+                    delay = self._try_admit(entry)
+                if delay == 0:
+                    break
+                try:
+                    # Woken early by releases and by reaching the head of the queue
+                    await asyncio.wait_for(waiter.event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                if entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                self._wake_head()
+            raise
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.admitted[priority] += 1
+            self.total_wait[priority] += waited
+            self._recent_waits[priority].append(waited)
+        return _Reservation(tokens, priority, waited)
+
+    def _try_admit(self, entry) -> Optional[float]:
+        """Admit the entry if it can go now; else the seconds to wait (None: until woken)"""
+        if self._queue[0] is not entry or self.in_flight >= self.max_concurrency:
+            return None
+
+        waiter = entry[2]
+        delay = max(
+            self.paused_until - time.monotonic(),
+            self.requests.delay_for(1, self.rate_factor),
+            self.tokens.delay_for(waiter.tokens, self.rate_factor)
+        )
+        if delay > 0:
+            return delay
+
+        self.requests.take(1)
+        self.tokens.take(waiter.tokens)
+        heapq.heappop(self._queue)
+        self.in_flight += 1
+        self._wake_head()
+        return 0
+
+    def _release(self, reservation: _Reservation) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if reservation.actual_tokens is not None:
+                self.tokens.take(reservation.actual_tokens - reservation.tokens)
+            self._wake_head()
+
+    def _wake_head(self) -> None:
+        if not self._queue:
+            return
+        waiter = self._queue[0][2]
+        try:
+            waiter.loop.call_soon_threadsafe(waiter.event.set)
+        except RuntimeError:
+            # Its event loop is gone; drop the waiter and try the next one
+            heapq.heappop(self._queue)
+            self._wake_head()
+
+    def record_success(self) -> None:
+        """Additively restore the request rate after a successful call"""
+        with self._lock:
+            self.consecutive_throttles = 0
+            self.rate_factor = min(1.0, self.rate_factor + self.recovery_step)
+
+    def record_throttle(self) -> None:
+        """Halve the request rate and pause admissions after a 429/503"""
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now < self.paused_until:
+                # Calls already in flight when the pause began fail together; count them once
+                return
+            self.consecutive_throttles += 1
+            self.rate_factor = max(self.min_rate_factor, self.rate_factor / 2)
+            pause = min(self.backoff_max, self.backoff_base * 2 ** (self.consecutive_throttles - 1))
+            self.paused_until = now + pause
+        logger.warning(f"Provider throttled; rate factor {self.rate_factor:.2f}, pausing {pause:.1f}s")
+
+    def retry_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number attempt + 1"""
+        self.retries += 1
+        return self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, wait time and rate limiting statistics"""
+        with self._lock:
+            waits = {}
+            for name in PRIORITIES:
+                recent = sorted(self._recent_waits[name])
+                waits[name] = {
+                    "admitted": self.admitted[name],
+                    "avg_wait_seconds": round(self.total_wait[name] / self.admitted[name], 3) if self.admitted[name] else 0.0,
+                    "p95_wait_seconds": round(recent[int(len(recent) * 0.95) - 1 if len(recent) > 1 else 0], 3) if recent else 0.0
+                }
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "rpm_limit": int(self.requests.capacity),
+                "tpm_limit": int(self.tokens.capacity),
+                "rate_factor": round(self.rate_factor, 3),
+                "paused_seconds": round(max(0.0, self.paused_until - time.monotonic()), 3),
+                "throttles": self.throttles,
+                "retries": self.retries,
+                "abandoned_calls": self.abandoned_calls,
+                "by_priority": waits
+            }
@@ -1,15 +1,91 @@
 import pdfplumber
 import logging
+import math
+import multiprocessing
 import os
 import re
-from typing import Tuple, Optional
+import numpy as np
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+
+from services.extraction_cache import ExtractionCache
+from services.text_normalizer import TextNormalizer
 
 logger = logging.getLogger(__name__)
 
+# Gap between glyphs, as a share of the line's mean glyph width, read as a word space
+SPACE_GAP_RATIO = 0.3
+MIN_SPACE_GAP = 0.5  # points
+
+WORD_PATTERN = re.compile(r'\S+')
+
+# Part of the extraction cache key: bump when a change alters extracted or formatted text
+EXTRACTOR_VERSION = 1
+
+# Page extractor of a pool worker process, created on its first task
+_worker_service = None
+
+def _extract_page_range(pdf_file_path: str, start: int, stop: int) -> List[str]:
+    """Pool task: open the PDF in the worker and return the text of pages [start, stop)"""
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = PDFService(parallel_workers=1)
+    texts = []
+    with pdfplumber.open(pdf_file_path) as pdf:
+        for page_num in range(start, stop):
+            page = pdf.pages[page_num]
+            texts.append(_worker_service._extract_page(page, page_num))
+            _release_page(page)
+    return texts
+
+def _release_page(page) -> None:
+    """Drop a page's parsed layout and objects once its text is out"""
+    if hasattr(page, 'close'):
+        page.close()
+    else:
+        page.flush_cache()
+
+def _trim_to_words(text: str, words: int) -> str:
+    """The text up to and including its first `words` words, layout kept"""
+    last = None
+    for last in islice(WORD_PATTERN.finditer(text), words):
+        pass
+    return text[:last.end()] if last else ""
+
+@dataclass
+class ExtractedText:
+    """Extracted PDF text and how much of the document it covers"""
+    text: str
+    pages: int
+    total_pages: int
+    words: int
+    truncated: bool = False
+
 class PDFService:
     """Service for extracting text from PDF files with professional formatting preservation"""
     
-    def __init__(self):
+    def __init__(self, parallel_workers: Optional[int] = None, extraction_cache: Optional[ExtractionCache] = None):
+        # Extraction stops at whichever cap is reached first (0 = no cap)
+        self.max_words = int(os.getenv("PDF_MAX_WORDS", "6000"))
+        self.max_pages = int(os.getenv("PDF_MAX_PAGES", "50"))
+        # Documents of at least parallel_min_pages pages are extracted page-parallel on a process pool
+        self.parallel_workers = parallel_workers or int(os.getenv("PDF_PARALLEL_WORKERS", "0")) or os.cpu_count() or 1
+        self.parallel_min_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "30"))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.normalizer = TextNormalizer()
+        self.extraction_cache = extraction_cache if extraction_cache is not None else ExtractionCache()
+        
+        self.documents = 0
+        self.pages = 0
+        self.truncated = 0
+        self.pages_skipped = 0
+        self.parallel_documents = 0
+        self.parallel_failures = 0
         logger.info("PDFService initialized with professional formatting preservation")
     
     def extract_text_from_pdf(self, pdf_file_path: str) -> str:
@@ -20,62 +96,194 @@ class PDFService:
         3. Handle complex layouts and formatting
         4. Ensure readable text for accurate AI grading
         """
+        return self.extract(pdf_file_path).text
+    
+    def extract(self, pdf_file_path: str) -> ExtractedText:
+        """
+        Extract formatted text from a PDF, stopping at the word and page caps
+        
+        Args:
+            pdf_file_path: Path to the PDF
+            
+        Returns:
+            ExtractedText with the formatted text and whether the document was truncated
+        """
         try:
             logger.info(f"Starting professional text extraction from: {pdf_file_path}")
             
             if not os.path.exists(pdf_file_path):
                 raise Exception(f"PDF file not found: {pdf_file_path}")
             
+            # A re-uploaded file (same bytes, same caps) skips parsing entirely
+            cache_key = self.extraction_cache.make_key(pdf_file_path, EXTRACTOR_VERSION, self.max_words, self.max_pages) \
+                if self.extraction_cache.enabled else None
+            cached = self.extraction_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                extracted = ExtractedText(**cached)
+                self.normalizer.mark_normalized(extracted.text)
+                logger.info(f"Extracted text served from cache: {len(extracted.text)} characters")
+                return extracted
+            
             # Extract text with professional formatting
-            extracted_text = self._extract_professional_text(pdf_file_path)
+            extracted = self._extract_professional_text(pdf_file_path)
             
-            if not extracted_text.strip():
+            if not extracted.text.strip():
                 raise Exception("No text could be extracted from the PDF")
             
             # Apply professional formatting for AI grading
-            formatted_text = self._apply_professional_formatting(extracted_text)
+            extracted.text = self._apply_professional_formatting(extracted.text)
+            if cache_key:
+                self.extraction_cache.set(cache_key, asdict(extracted))
             
-            logger.info(f"Final professionally formatted text: {len(formatted_text)} characters")
-            return formatted_text
+            logger.info(f"Final professionally formatted text: {len(extracted.text)} characters")
+            return extracted
             
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
-    def _extract_professional_text(self, pdf_file_path: str) -> str:
-        """Extract text while preserving professional formatting and structure"""
+    def _extract_professional_text(self, pdf_file_path: str) -> ExtractedText:
+        """Extract text while preserving professional formatting and structure, up to the caps"""
+        page_texts = []
+        words = pages = total_pages = 0
+        truncated = False
+        try:
+            with closing(self.iter_page_texts(pdf_file_path)) as page_iter:
+                for page_num, total_pages, page_text in page_iter:
+                    pages = page_num + 1
+                    page_words = len(page_text.split())
+                    if self.max_words and words + page_words >= self.max_words:
+                        page_text = _trim_to_words(page_text, self.max_words - words)
+                        truncated = words + page_words > self.max_words or pages < total_pages
+                        page_words = self.max_words - words
+                    if page_text.strip():
+                        page_texts.append(page_text)
+                    words += page_words
+                    if truncated:
+                        break
+            # The page cap: pages past it were never opened
+            truncated = truncated or pages < total_pages
+        except Exception as e:
+            logger.warning(f"Professional text extraction failed: {e}")
+            return ExtractedText("", 0, 0, 0)
+        
+        self.documents += 1
+        self.pages += pages
+        if truncated:
+            self.truncated += 1
+            self.pages_skipped += total_pages - pages
+            logger.info(f"Extraction stopped at {words} words on page {pages} of {total_pages}")
+        # Join pages with proper spacing
+        return ExtractedText("\n\n".join(page_texts), pages, total_pages, words, truncated)
+    
+    def iter_page_texts(self, pdf_file_path: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        Yield (page index, page count, page text) one page at a time, in page order
+        
+        Pages past max_pages are never parsed and each page's parsed objects are
+        released once its text is out, so memory stays flat however long the
+        document is. Closing the generator early stops the extraction.
+        """
+        with pdfplumber.open(pdf_file_path) as pdf:
+            page_count = len(pdf.pages)
+            limit = min(page_count, self.max_pages) if self.max_pages else page_count
+            logger.info(f"PDF opened successfully, {page_count} pages found")
+            
+            next_page = 0
+            if self.parallel_workers > 1 and limit >= self.parallel_min_pages:
+                for page_text in self._iter_pages_in_parallel(pdf_file_path, limit):
+                    yield next_page, page_count, page_text
+                    next_page += 1
+            
+            # Sequential extraction, or the rest of a document whose parallel extraction failed
+            for page_num in range(next_page, limit):
+                page = pdf.pages[page_num]
+                try:
+                    yield page_num, page_count, self._extract_page(page, page_num)
+                finally:
+                    _release_page(page)
+    
+    def _extract_page(self, page, page_num: int) -> str:
+        """Text of one page, or an empty string if it has none or cannot be read"""
         try:
-            all_pages_text = []
-            with pdfplumber.open(pdf_file_path) as pdf:
-                logger.info(f"PDF opened successfully, {len(pdf.pages)} pages found")
-                
-                for page_num, page in enumerate(pdf.pages):
-                    try:
-                        # Get page dimensions
-                        page_width = page.width
-                        page_height = page.height
-                        
-                        # Extract text using multiple methods for best results
-                        page_text = self._extract_page_text_professionally(page, page_width, page_height)
-                        
-                        if page_text.strip():
-                            all_pages_text.append(page_text)
-                            logger.info(f"Page {page_num + 1}: Extracted {len(page_text)} characters (professional)")
-                        else:
-                            logger.info(f"Page {page_num + 1}: No text found")
-                            
-                    except Exception as e:
-                        logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
-                        continue
+            # Extract text using multiple methods for best results
+            page_text = self._extract_page_text_professionally(page, page.width, page.height)
             
-            # Join pages with proper spacing
-            full_text = "\n\n".join(all_pages_text)
-            return full_text
+            if page_text.strip():
+                logger.info(f"Page {page_num + 1}: Extracted {len(page_text)} characters (professional)")
+            else:
+                logger.info(f"Page {page_num + 1}: No text found")
+            return page_text
             
         except Exception as e:
-            logger.warning(f"Professional text extraction failed: {e}")
+            logger.warning(f"Error extracting text from page {page_num + 1}: {e}")
             return ""
     
+    def _iter_pages_in_parallel(self, pdf_file_path: str, page_count: int) -> Iterator[str]:
+        """
+        Extract page ranges on the process pool, each worker opening the file itself
+        
+        Page texts are yielded in page order with one range per worker in flight,
+        so a consumer that stops early leaves little work behind. If the pool
+        fails the generator ends early and the caller extracts the remaining
+        pages sequentially.
+        """
+        # Two ranges per worker, so a slow range does not leave the others idle
+        range_size = math.ceil(page_count / (self.parallel_workers * 2))
+        starts = iter(range(0, page_count, range_size))
+        in_flight = deque()
+        try:
+            pool = self._get_pool()
+            for start in islice(starts, self.parallel_workers):
+                in_flight.append(pool.submit(_extract_page_range, pdf_file_path, start, min(start + range_size, page_count)))
+            self.parallel_documents += 1
+            while in_flight:
+                page_texts = in_flight.popleft().result()
+                for start in islice(starts, 1):
+                    in_flight.append(pool.submit(_extract_page_range, pdf_file_path, start, min(start + range_size, page_count)))
+                yield from page_texts
+        except Exception as e:
+            self.parallel_failures += 1
+            logger.warning(f"Parallel extraction failed, extracting the remaining pages sequentially: {e}")
+            self.shutdown()
+            return
+        finally:
+            for future in in_flight:
+                future.cancel()
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Start the persistent extraction pool on first use"""
+        if self._pool is None:
+            # Spawned workers: forking a process that runs threads can deadlock the child
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.parallel_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started PDF extraction pool with {self.parallel_workers} processes")
+        return self._pool
+    
+    def shutdown(self) -> None:
+        """Stop the extraction pool, if one was started"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Extraction counters, the caps and the parallel extraction settings"""
+        return {
+            "documents": self.documents,
+            "pages": self.pages,
+            "truncated": self.truncated,
+            "pages_skipped": self.pages_skipped,
+            "max_words": self.max_words,
+            "max_pages": self.max_pages,
+            "parallel_documents": self.parallel_documents,
+            "parallel_failures": self.parallel_failures,
+            "parallel_workers": self.parallel_workers,
+            "parallel_min_pages": self.parallel_min_pages,
+            "normalizer": self.normalizer.get_stats(),
+            "extraction_cache": self.extraction_cache.get_stats()
+        }
+    
     def _extract_page_text_professionally(self, page, page_width, page_height):
         """Extract text from a single page with professional formatting"""
         try:
@@ -105,42 +313,42 @@ class PDFService:
         if not chars:
             return ""
         
-        # Sort characters by position (top to bottom, left to right)
-        sorted_chars = sorted(chars, key=lambda c: (c['top'], c['x0']))
+        # Pack text and coordinates into arrays, one C-level pass per field over pdfplumber's char dicts
+        count = len(chars)
+        texts = np.array(list(map(itemgetter('text'), chars)), dtype=object)
+        top = np.fromiter(map(itemgetter('top'), chars), dtype=float, count=count)
+        x0 = np.fromiter(map(itemgetter('x0'), chars), dtype=float, count=count)
+        x1 = np.fromiter(map(itemgetter('x1'), chars), dtype=float, count=count)
+        
+        # Whitespace glyphs are dropped; word spaces come from the gaps between visible glyphs
+        visible = np.fromiter(map(bool, texts), dtype=bool, count=count)
+        visible &= ~np.fromiter(map(str.isspace, texts), dtype=bool, count=count)
+        if not visible.any():
+            return ""
+        texts, top, x0, x1 = texts[visible], top[visible], x0[visible], x1[visible]
         
-        # Group characters into lines based on vertical position
-        lines = []
-        current_line = []
-        current_y = None
+        # Group characters into lines: a jump in y-position between neighbours starts a new line
         line_height_threshold = 3  # pixels for line detection
-        
-        for char in sorted_chars:
-            char_text = char.get('text', '')
-            char_y = char.get('top', 0)
-            char_x = char.get('x0', 0)
-            
-            # Skip non-printable characters
-            if not char_text or not char_text.strip():
-                continue
-            
-            # Start new line if y-position changes significantly
-            if current_y is None or abs(char_y - current_y) > line_height_threshold:
-                if current_line:
-                    lines.append(self._format_line(current_line))
-                    current_line = []
-                current_y = char_y
-            
-            current_line.append({
-                'text': char_text,
-                'x': char_x,
-                'y': char_y
-            })
-        
-        # Add the last line
-        if current_line:
-            lines.append(self._format_line(current_line))
-        
-        return '\n'.join(lines)
+        by_top = np.argsort(top, kind='stable')
+        line_of = np.empty(len(texts), dtype=np.int64)
+        line_of[by_top] = np.concatenate(([0], np.cumsum(np.diff(top[by_top]) > line_height_threshold)))
+        
+        # Order left to right within each line
+        order = np.lexsort((x0, line_of))
+        line_of, texts, x0, x1 = line_of[order], texts[order], x0[order], x1[order]
+        
+        # A space is a horizontal gap wider than a share of the line's mean glyph width
+        widths = np.maximum(x1 - x0, 0)
+        mean_width = np.bincount(line_of, weights=widths) / np.bincount(line_of)
+        gaps = x0[1:] - x1[:-1]
+        new_line = line_of[1:] != line_of[:-1]
+        space = ~new_line & (gaps > np.maximum(mean_width[line_of[1:]] * SPACE_GAP_RATIO, MIN_SPACE_GAP))
+        
+        # Interleave characters and separators, then join once
+        pieces = np.empty(2 * len(texts) - 1, dtype=object)
+        pieces[0::2] = texts
+        pieces[1::2] = np.where(new_line, '\n', np.where(space, ' ', ''))
+        return ''.join(pieces.tolist())
     
     def _extract_text_from_words_professionally(self, words, page_width, page_height):
         """Extract text from words with professional formatting"""
@@ -184,32 +392,6 @@ class PDFService:
         
         return '\n'.join(lines)
     
-    def _format_line(self, chars):
-        """Format a line of characters with proper spacing"""
-        if not chars:
-            return ""
-        
-        # Sort characters by x-position
-        sorted_chars = sorted(chars, key=lambda c: c['x'])
-        
-        # Join characters with appropriate spacing
-        line_text = ""
-        for i, char in enumerate(sorted_chars):
-            char_text = char['text']
-            
-            # Add space before character if needed
-            if i > 0:
-                prev_char = sorted_chars[i-1]
-                space_needed = char['x'] - (prev_char['x'] + len(prev_char['text']) * 5)  # Approximate char width
-                if space_needed > 15:  # If significant gap, add space
-                    line_text += " "
-                elif space_needed > 5:  # If small gap, add space
-                    line_text += " "
-            
-            line_text += char_text
-        
-        return line_text.strip()
-    
     def _format_word_line(self, words):
         """Format a line of words with proper spacing"""
         if not words:
@@ -238,161 +420,7 @@ class PDFService:
     
     def _apply_professional_formatting(self, text: str) -> str:
         """Apply professional formatting for optimal AI grading"""
-        if not text:
-            return ""
-        
-        # Step 1: Basic cleaning
-        text = self._basic_cleaning(text)
-        
-        # Step 2: Fix spacing issues
-        text = self._fix_spacing_issues(text)
-        
-        # Step 3: Paragraph detection and formatting
-        text = self._detect_and_format_paragraphs(text)
-        
-        # Step 4: Sentence formatting
-        text = self._format_sentences(text)
-        
-        # Step 5: Final professional formatting
-        text = self._final_professional_formatting(text)
-        
-        return text.strip()
-    
-    def _basic_cleaning(self, text: str) -> str:
-        """Basic text cleaning"""
-        # Remove non-printable characters except newlines and tabs
-        text = ''.join(char for char in text if char.isprintable() or char in '\n\t')
-        
-        # Replace common PDF artifacts
-        text = text.replace('|', ' ')  # Table separators
-        text = text.replace('\t', ' ')  # Tabs to spaces
-        
-        return text
-    
-    def _fix_spacing_issues(self, text: str) -> str:
-        """Fix common spacing issues in extracted text"""
-        if not text:
-            return ""
-        
-        # Fix run-on text by adding spaces between words
-        # Look for patterns where lowercase letters are followed by uppercase letters
-        text = re.sub(r'([a-z])([A-Z])', r'\1 \2', text)
-        
-        # Fix spacing around punctuation
-        text = re.sub(r'([.!?])([A-Z])', r'\1 \2', text)
-        text = re.sub(r'([.!?])([a-z])', r'\1 \2', text)
-        
-        # Fix spacing around common words
-        common_words = ['The', 'This', 'That', 'These', 'Those', 'In', 'On', 'At', 'By', 'For', 'With', 'As', 'Since', 'Because', 'However', 'Moreover', 'Furthermore', 'Additionally', 'Therefore', 'Thus', 'Hence', 'In conclusion']
-        for word in common_words:
-            text = re.sub(rf'([a-z])({word})', r'\1 \2', text, flags=re.IGNORECASE)
-        
-        # Normalize multiple spaces
-        text = re.sub(r' +', ' ', text)
-        
-        return text.strip()
-    
-    def _detect_and_format_paragraphs(self, text: str) -> str:
-        """Detect and format paragraphs professionally"""
-        lines = text.split('\n')
-        formatted_paragraphs = []
-        current_paragraph = []
-        
-        for line in lines:
-            line = line.strip()
-            
-            if not line:
-                # Empty line indicates paragraph break
-                if current_paragraph:
-                    formatted_paragraphs.append(' '.join(current_paragraph))
-                    current_paragraph = []
-            else:
-                # Check if this line starts a new paragraph
-                if self._is_new_paragraph_start(line, current_paragraph):
-                    if current_paragraph:
-                        formatted_paragraphs.append(' '.join(current_paragraph))
-                        current_paragraph = []
-                current_paragraph.append(line)
-        
-        # Add the last paragraph
-        if current_paragraph:
-            formatted_paragraphs.append(' '.join(current_paragraph))
-        
-        # Join paragraphs with proper spacing
-        return '\n\n'.join(formatted_paragraphs)
-    
-    def _is_new_paragraph_start(self, line: str, current_paragraph: list) -> bool:
-        """Determine if a line starts a new paragraph"""
-        if not current_paragraph:
-            return True
-        
-        # Check for paragraph indicators
-        paragraph_indicators = [
-            r'^\d+\.',  # Numbered lists
-            r'^[A-Z][a-z]+\.',  # Capitalized words followed by period
-            r'^[A-Z][A-Z\s]+:',  # ALL CAPS headers
-            r'^[A-Z][a-z\s]+:',  # Title case headers
-            r'^[A-Z][a-z\s]+\.',  # Title case followed by period
-        ]
-        
-        for pattern in paragraph_indicators:
-            if re.match(pattern, line):
-                return True
-        
-        # Check for common paragraph starters
-        paragraph_starters = [
-            'However,', 'Moreover,', 'Furthermore,', 'Additionally,',
-            'In conclusion,', 'Therefore,', 'Thus,', 'Hence,',
-            'On the other hand,', 'In contrast,', 'Similarly,',
-            'First,', 'Second,', 'Third,', 'Finally,',
-            'The', 'This', 'These', 'Those',
-            'It is', 'There is', 'There are',
-            'In', 'At', 'By', 'For', 'With',
-            'As', 'Since', 'Because', 'Although',
-            'While', 'When', 'Where', 'Why', 'How'
-        ]
-        
-        for starter in paragraph_starters:
-            if line.startswith(starter):
-                return True
-        
-        return False
-    
-    def _format_sentences(self, text: str) -> str:
-        """Format sentences properly"""
-        # Split into paragraphs
-        paragraphs = text.split('\n\n')
-        formatted_paragraphs = []
-        
-        for paragraph in paragraphs:
-            if not paragraph.strip():
-                continue
-            
-            # Clean up sentence spacing
-            paragraph = re.sub(r'\s+', ' ', paragraph)  # Normalize spaces
-            paragraph = re.sub(r'\s+([.!?])', r'\1', paragraph)  # Fix punctuation spacing
-            paragraph = re.sub(r'([.!?])\s*([A-Z])', r'\1 \2', paragraph)  # Add space after sentence
-            
-            formatted_paragraphs.append(paragraph.strip())
-        
-        return '\n\n'.join(formatted_paragraphs)
-    
-    def _final_professional_formatting(self, text: str) -> str:
-        """Apply final professional formatting"""
-        # Ensure proper paragraph spacing
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        
-        # Clean up any remaining artifacts
-        text = re.sub(r' +', ' ', text)  # Remove multiple spaces
-        text = re.sub(r'\n +', '\n', text)  # Remove leading spaces on lines
-        
-        # Ensure proper sentence endings
-        text = re.sub(r'([.!?])\s*([A-Z])', r'\1 \2', text)
-        
-        # Remove any non-printable characters
-        text = ''.join(char for char in text if char.isprintable() or char.isspace())
-        
-        return text.strip()
+        return self.normalizer.normalize(text)
     
     def get_word_count(self, text: str) -> int:
         """Get word count from text"""
@@ -406,5 +434,5 @@ class PDFService:
         return len(text) if text else 0
     
     def clean_text(self, text: str) -> str:
-        """Legacy method - now uses professional formatting"""
-        return self._apply_professional_formatting(text)
+        """Legacy method - now uses professional formatting (text extract_text_from_pdf already formatted is kept as is)"""
+        return self.normalizer.ensure_normalized(text)
@@ -0,0 +1,245 @@
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from models import GradingResult, CategoryScore
+from services.rubric import CATEGORIES, score_word_count
+
+logger = logging.getLogger(__name__)
+
+# Step 0 / Step 3 thresholds of the grading prompt
+FRAGMENT_MAX_WORDS = 150
+SHORT_ESSAY_MAX_WORDS = 800
+
+# Remarks the prompt makes mandatory for each type
+INVALID_REMARK = "Submission is not an essay (contains instructions or non-essay material). Automatic fail."
+NON_ENGLISH_REMARK = "Submission is not primarily in English. Automatic fail."
+FRAGMENT_REMARK = "Fragmentary essay; CSS considers this a failure."
+SHORT_ESSAY_REMARK = "Too short; CSS requires ~2500–3000 words. Fail."
+
+# Frequent English function words; real English prose is roughly 40% these
+ENGLISH_FUNCTION_WORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could do does for from had has
+have he her his how i if in into is it its more most my no not of on one only or other our out over
+she so some such than that the their them then there these they this those to under up us was we were
+what when which while who will with would you your
+""".split())
+
+# Phrases typical of pasted prompts, instructions, rubrics and checklists; phrases that
+# also occur in essay prose are anchored to the start of a line or sentence
+INSTRUCTION_PATTERNS = [re.compile(pattern, re.IGNORECASE | re.MULTILINE) for pattern in (
+    r"^\s*act as\b",
+    r"^\s*you are an? (?:\w+ )?(?:examiner|grader|evaluator|assistant|expert)\b",
+    r"\bwrite an? (?:\w+ )?(?:essay|paragraph|article)\b",
+    r"\bany one of the (?:given|following) topics\b",
+    r"\bmaximum marks\b",
+    r"\bnote\s*:",
+    r"\b(?:instructions?|directions?)\s*:",
+    r"\bstep\s+\d+\b",
+    r"\brubric\b",
+    r"\bmarking scheme\b",
+    r"\(\s*\d+\s*marks?\s*\)",
+    r"\bword (?:limit|count)\s*:",
+    r"^\s*(?:please )?do not (?:exceed|use|write|include)\b",
+    r"\battempt (?:any|all)\b",
+    r"\btime allowed\b",
+    r"\bchecklist\b",
+    r"\bprompt\s*:",
+)]
+
+# Lines that look like list items, numbered steps or checkboxes
+LIST_LINE = re.compile(r"^\s*(?:[-*•▪☐✓]|\(?\d+[.)]|\(?[a-zA-Z][.)]|[IVX]+\.)\s+")
+# Sentence boundaries, not after numbered items such as "1."
+SENTENCE_BREAK = re.compile(r"(?<=[^\d\s][.!?])\s+")
+# Lines longer than this are whole extracted paragraphs and are judged sentence by sentence
+LONG_LINE_WORDS = 40
+
+@dataclass
+class ScreenResult:
+    """Outcome of the local pre-screen for one submission"""
+    word_count: int
+    submission_type: Optional[str] = None
+    reason: Optional[str] = None
+    grading_result: Optional[GradingResult] = None
+
+class PreScreen:
+    """
+    Deterministic pre-classifier applying Steps 0–3 of the grading prompt locally
+
+    Fragments (Type D), instruction paste-ins and non-English text (Type G) are
+    graded here without a Gemini call; short essays are flagged as Type E so the
+    word-count gate can be enforced on the AI result.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("PRESCREEN_ENABLED", "true").lower() == "true"
+        self.min_english_ratio = float(os.getenv("PRESCREEN_MIN_ENGLISH_RATIO", "0.15"))
+
+        self.screened = 0
+        self.short_circuited: Dict[str, int] = {}
+        self.short_essays = 0
+
+    def screen(self, essay_text: str) -> ScreenResult:
+        """
+        Classify a submission with the local rules
+
+        Args:
+            essay_text: The essay text to classify
+
+        Returns:
+            ScreenResult carrying a complete GradingResult when no AI call is needed
+        """
+        words = essay_text.split()
+        result = ScreenResult(word_count=len(words))
+        if not self.enabled:
+            return result
+
+        self.screened += 1
+
+        if not self._is_english(words):
+            result.submission_type, result.reason = "G", "non_english"
+            result.grading_result = self._invalid_result(
+                result.word_count, NON_ENGLISH_REMARK,
+                "The submission is not primarily written in English, so it cannot be assessed as a CSS English essay."
+            )
+        elif self._is_instruction_paste(essay_text):
+            result.submission_type, result.reason = "G", "instructions"
+            result.grading_result = self._invalid_result(
+                result.word_count, INVALID_REMARK,
+                "The submission consists of instructions, prompts or checklists rather than discursive essay prose."
+            )
+        elif result.word_count < FRAGMENT_MAX_WORDS:
+            result.submission_type, result.reason = "D", "fragment"
+            result.grading_result = self._fragment_result(essay_text, result.word_count)
+        elif result.word_count < SHORT_ESSAY_MAX_WORDS:
+            result.submission_type, result.reason = "E", "short_essay"
+            self.short_essays += 1
+
+        if result.grading_result is not None:
+            self.short_circuited[result.reason] = self.short_circuited.get(result.reason, 0) + 1
+            logger.info(f"Pre-screen graded submission locally as Type {result.submission_type} ({result.word_count} words)")
+
+        return result
+
+    def apply_short_essay_gate(self, grading_result: GradingResult, word_count: int) -> GradingResult:
+        """
+        Enforce the Type E rule on an AI result: full attempts under 800 words are short essays
+
+        Word Count & Length Control itself is scored from the band table afterwards.
+
+        Args:
+            grading_result: Parsed AI grading result
+            word_count: Word count of the submission
+
+        Returns:
+            The result, re-typed as E with the mandatory remark if the gate applies
+        """
+        if not self.enabled or word_count >= SHORT_ESSAY_MAX_WORDS or grading_result.submission_type not in ("B", "C", "E"):
+            return grading_result
+
+        grading_result.submission_type = "E"
+        weaknesses = grading_result.examiner_remarks.setdefault("weaknesses", [])
+        if SHORT_ESSAY_REMARK not in weaknesses:
+            weaknesses.insert(0, SHORT_ESSAY_REMARK)
+        return grading_result
+
+    def _is_english(self, words: list) -> bool:
+        """Whether the text is primarily English (script and function-word frequency)"""
+        letters = [char for char in "".join(words) if char.isalpha()]
+        if not letters:
+            return False
+        if sum(1 for char in letters if char.isascii()) / len(letters) < 0.5:
+            return False
+
+        # Too little text, or extraction glued the words together: cannot judge reliably
+        if len(words) < 30 or len(letters) / len(words) > 9:
+            return True
+
+        tokens = [word.strip(".,;:!?\"'()[]").lower() for word in words]
+        english = sum(1 for token in tokens if token in ENGLISH_FUNCTION_WORDS)
+        return english / len(tokens) >= self.min_english_ratio
+
+    def _is_instruction_paste(self, essay_text: str) -> bool:
+        """Whether instruction lines and list items make up most of the text"""
+        markers = sum(1 for pattern in INSTRUCTION_PATTERNS if pattern.search(essay_text))
+        if markers < 3:
+            return False
+
+        instruction_words = total_words = 0
+        for line in essay_text.splitlines():
+            units = SENTENCE_BREAK.split(line) if len(line.split()) > LONG_LINE_WORDS else [line]
+            for unit in units:
+                words = len(unit.split())
+                total_words += words
+                if LIST_LINE.match(unit) or any(pattern.search(unit) for pattern in INSTRUCTION_PATTERNS):
+                    instruction_words += words
+        return instruction_words > total_words / 2
+
+    def _thesis_score(self, essay_text: str) -> int:
+        """Conservative Thesis score (0–4) for a fragment"""
+        sentences = [s for s in re.split(r"[.!?]+", essay_text) if len(s.split()) >= 8]
+        if not sentences:
+            return 0
+        score = 2
+        if re.search(r"\b(?:this essay|i (?:will|shall)|argue|thesis|therefore|because)\b", essay_text, re.IGNORECASE):
+            score += 1
+        if len(sentences) >= 3:
+            score += 1
+        return score
+
+    def _empty_scores(self, feedback: str) -> Dict[str, CategoryScore]:
+        return {name: CategoryScore(score=0, feedback=feedback) for name, _ in CATEGORIES.values()}
+
+    def _invalid_result(self, word_count: int, remark: str, summary: str) -> GradingResult:
+        """Type G: every section 0 with the mandatory remark"""
+        return GradingResult(
+            overall_score=0,
+            category_scores=self._empty_scores("Not assessed: submission is invalid."),
+            summary_feedback=summary,
+            submission_type="G",
+            word_count=word_count,
+            examiner_remarks={
+                "strengths": [],
+                "weaknesses": [remark],
+                "suggestions": ["Submit a complete discursive essay written in English."]
+            }
+        )
+
+    def _fragment_result(self, essay_text: str, word_count: int) -> GradingResult:
+        """Type D: Thesis only, all other sections 0"""
+        thesis = self._thesis_score(essay_text)
+        category_scores = self._empty_scores("Not assessed: fragmentary submission.")
+        category_scores[CATEGORIES["th"][0]] = CategoryScore(
+            score=thesis,
+            feedback="A topic-aligned opening is present but undeveloped." if thesis
+            else "No identifiable thesis or topic statement."
+        )
+        score, feedback = score_word_count(word_count, "D")
+        category_scores[CATEGORIES["wc"][0]] = CategoryScore(score=score, feedback=feedback)
+        return GradingResult(
+            overall_score=thesis,
+            category_scores=category_scores,
+            summary_feedback=f"Only {word_count} words were submitted: an introduction or fragment without "
+                             "developed body paragraphs or a conclusion. Only the thesis has been assessed.",
+            submission_type="D",
+            word_count=word_count,
+            examiner_remarks={
+                "strengths": ["Attempts an opening on the topic"] if thesis else [],
+                "weaknesses": [FRAGMENT_REMARK],
+                "suggestions": ["Develop a full essay with an outline, body paragraphs and a conclusion (~2500–3000 words)."]
+            }
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pre-screen statistics"""
+        handled = sum(self.short_circuited.values())
+        return {
+            "enabled": self.enabled,
+            "screened": self.screened,
+            "handled_locally": handled,
+            "handled_fraction": round(handled / self.screened, 3) if self.screened else 0.0,
+            "by_reason": dict(self.short_circuited),
+            "short_essays_gated": self.short_essays
+        }
@@ -0,0 +1,325 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ProgressStore(ABC):
+    """Base class for task progress storage with TTL and size bounds"""
+
+    backend = "base"
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("PROGRESS_TTL_SECONDS", "3600"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("PROGRESS_MAX_ENTRIES", "10000"))
+        self.evictions = 0
+
+    @abstractmethod
+    def create(self, task_id: str, record: Dict[str, Any]) -> None:
+        """Create (or replace) the progress record of a task"""
+
+    @abstractmethod
+    def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        """
+        Merge fields into a task's progress record
+
+        Fields set to None are removed from the record.
+
+        Returns:
+            The updated record, or None if the task is unknown or expired
+        """
+
+    @abstractmethod
+    def update_many(self, updates: Dict[str, Dict[str, Any]], status: Optional[str] = None) -> int:
+        """
+        Merge fields into several tasks' progress records in one write
+
+        Args:
+            updates: task_id -> fields, merged as by update()
+            status: Only update records currently in this status
+
+        Returns:
+            Number of records updated
+        """
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Get the progress record of a task, or None if unknown or expired"""
+
+    @abstractmethod
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Get the record snapshots written for a task after a sequence number
+
+        Every create and update appends a snapshot, so stream consumers see each
+        stage transition even when several happen between two polls.
+
+        Returns:
+            List of (sequence number, record snapshot) in write order
+        """
+
+    @abstractmethod
+    def delete(self, task_id: str) -> None:
+        """Remove the progress record of a task"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of stored records"""
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics"""
+        return {
+            "backend": self.backend,
+            "entries": self.count(),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions
+        }
+
+class InMemoryProgressStore(ProgressStore):
+    """Per-process progress store (only consistent with a single worker)"""
+
+    backend = "memory"
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None):
+        super().__init__(ttl_seconds, max_entries)
+        # task_id -> (updated_at, record, events), oldest update first
+        self._records: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def create(self, task_id: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            now = time.time()
+            self._seq += 1
+            self._records[task_id] = (now, dict(record), [(self._seq, dict(record))])
+            self._records.move_to_end(task_id)
+            self._evict(now)
+
+    def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._merge(task_id, fields)
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]], status: Optional[str] = None) -> int:
+        with self._lock:
+            return sum(1 for task_id, fields in updates.items() if self._merge(task_id, fields, status) is not None)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._live_entry(task_id)
+            return dict(entry[1]) if entry else None
+
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._live_entry(task_id)
+            if entry is None:
+                return []
+            return [(seq, dict(record)) for seq, record in entry[2] if seq > after_seq]
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            self._records.pop(task_id, None)
+
+    def count(self) -> int:
+        return len(self._records)
+
+    def _merge(self, task_id: str, fields: Dict[str, Any], status: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Merge fields into a live record (caller holds the lock)"""
+        entry = self._live_entry(task_id)
+        if entry is None:
+            return None
+
+        _, record, events = entry
+        if status is not None and record.get("status") != status:
+            return None
+        for key, value in fields.items():
+            if value is None:
+                record.pop(key, None)
+            else:
+                record[key] = value
+
+        self._seq += 1
+        events.append((self._seq, dict(record)))
+        self._records[task_id] = (time.time(), record, events)
+        self._records.move_to_end(task_id)
+        return dict(record)
+
+    def _live_entry(self, task_id: str) -> Optional[tuple]:
+        """Return the entry for task_id, dropping it if it has expired"""
+        entry = self._records.get(task_id)
+        if entry and time.time() - entry[0] > self.ttl_seconds:
+            del self._records[task_id]
+            self.evictions += 1
+            return None
+        return entry
+
+    def _evict(self, now: float) -> None:
+        """Drop expired records, then the least recently updated above max_entries"""
+        while self._records:
+            task_id, (updated_at, _, _) = next(iter(self._records.items()))
+            if now - updated_at <= self.ttl_seconds and len(self._records) <= self.max_entries:
+                break
+            del self._records[task_id]
+            self.evictions += 1
+
+class SQLiteProgressStore(ProgressStore):
+    """Progress store in a shared SQLite database (WAL mode) for multi-worker deployments"""
+
+    backend = "sqlite"
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None
+    ):
+        super().__init__(ttl_seconds, max_entries)
+        self.db_path = db_path or os.getenv("PROGRESS_STORE_PATH", "storage/cache/progress.sqlite3")
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._creates = 0
+        self._conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS progress (
+                task_id TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_updated ON progress(updated_at)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS progress_events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                task_id TEXT NOT NULL,
+                record TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_progress_events_task ON progress_events(task_id, seq)")
+        self._conn.commit()
+        logger.info(f"SQLiteProgressStore ready at {self.db_path}")
+
+    def create(self, task_id: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            now = time.time()
+            record_json = json.dumps(record)
+            self._conn.execute("DELETE FROM progress_events WHERE task_id = ?", (task_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress (task_id, record, updated_at) VALUES (?, ?, ?)",
+                (task_id, record_json, now)
+            )
+            self._conn.execute(
+                "INSERT INTO progress_events (task_id, record) VALUES (?, ?)",
+                (task_id, record_json)
+            )
+            # Eviction scans the table, so it runs every EVICT_EVERY creates
+            self._creates += 1
+            if self._creates % self.EVICT_EVERY == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def update(self, task_id: str, **fields) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            now = time.time()
+            # json_patch merges atomically and removes keys patched with null
+            row = self._conn.execute(
+                """UPDATE progress SET record = json_patch(record, ?), updated_at = ?
+                WHERE task_id = ? AND updated_at >= ?
+                RETURNING record""",
+                (json.dumps(fields), now, task_id, now - self.ttl_seconds)
+            ).fetchone()
+            if row:
+                self._conn.execute(
+                    "INSERT INTO progress_events (task_id, record) VALUES (?, ?)",
+                    (task_id, row[0])
+                )
+            self._conn.commit()
+            return json.loads(row[0]) if row else None
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]], status: Optional[str] = None) -> int:
+        with self._lock:
+            now = time.time()
+            rows = []
+            for task_id, fields in updates.items():
+                row = self._conn.execute(
+                    """UPDATE progress SET record = json_patch(record, ?), updated_at = ?
+                    WHERE task_id = ? AND updated_at >= ? AND (? IS NULL OR json_extract(record, '$.status') = ?)
+                    RETURNING record""",
+                    (json.dumps(fields), now, task_id, now - self.ttl_seconds, status, status)
+                ).fetchone()
+                if row:
+                    rows.append((task_id, row[0]))
+            self._conn.executemany("INSERT INTO progress_events (task_id, record) VALUES (?, ?)", rows)
+            # One transaction for the whole batch
+            self._conn.commit()
+            return len(rows)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record FROM progress WHERE task_id = ? AND updated_at >= ?",
+                (task_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_events(self, task_id: str, after_seq: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT e.seq, e.record FROM progress_events e
+                JOIN progress p ON p.task_id = e.task_id
+                WHERE e.task_id = ? AND e.seq > ? AND p.updated_at >= ?
+                ORDER BY e.seq""",
+                (task_id, after_seq, time.time() - self.ttl_seconds)
+            ).fetchall()
+        return [(seq, json.loads(record)) for seq, record in rows]
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM progress WHERE task_id = ?", (task_id,))
+            self._conn.execute("DELETE FROM progress_events WHERE task_id = ?", (task_id,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM progress").fetchone()[0]
+
+    def _evict(self, now: float) -> None:
+        """Drop expired records, then the least recently updated above max_entries"""
+        expired = self._conn.execute(
+            "DELETE FROM progress WHERE updated_at < ?",
+            (now - self.ttl_seconds,)
+        ).rowcount
+
+        overflow = self._conn.execute(
+            """DELETE FROM progress WHERE task_id IN (
+                SELECT task_id FROM progress ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,)
+        ).rowcount
+
+        self._conn.execute(
+            "DELETE FROM progress_events WHERE task_id NOT IN (SELECT task_id FROM progress)"
+        )
+
+        self.evictions += expired + overflow
+
+def create_progress_store() -> ProgressStore:
+    """Create the progress store selected by PROGRESS_STORE_BACKEND (sqlite or memory)"""
+    backend = os.getenv("PROGRESS_STORE_BACKEND", "sqlite").lower()
+    if backend == "memory":
+        return InMemoryProgressStore()
+    if backend == "sqlite":
+        return SQLiteProgressStore()
+    raise ValueError(f"Unknown PROGRESS_STORE_BACKEND: {backend}")
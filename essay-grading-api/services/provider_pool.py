@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from google.api_core import exceptions as api_exceptions
+
+from services.essay_sanitizer import estimate_tokens
+from services.grading_provider import GeminiProvider, GradingProvider, MockProvider
+from services.outbound_scheduler import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+def is_quota_error(error: Exception) -> bool:
+    """True for 429 quota errors, which are specific to one key/project"""
+    return isinstance(error, (api_exceptions.ResourceExhausted, api_exceptions.TooManyRequests)) \
+        or getattr(error, "code", None) == 429
+
+def mask_key(api_key: str) -> str:
+    """Key label safe for logs and /stats"""
+    return f"...{api_key[-4:]}" if api_key else "none"
+
+class PoolMember:
+    """One key/model of the pool with its quota, ejection state and usage"""
+
+    def __init__(self, name: str, provider: GradingProvider, weight: float = 1.0,
+                 rpm_limit: int = 2000, tpm_limit: int = 4000000):
+        self.name = name
+        self.provider = provider
+        self.weight = weight
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+
+        self.ejected_until = 0.0
+        self.consecutive_quota_errors = 0
+        self.calls = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.ejections = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def remaining_quota(self) -> float:
+        """Share of this minute's request and token allowance still available"""
+        return min(self.requests.remaining(), self.tokens.remaining())
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "model": self.provider.model_name,
+            "weight": self.weight,
+            "remaining_quota": round(self.remaining_quota(), 3),
+            "ejected_seconds": round(max(0.0, self.ejected_until - now), 1),
+            "calls": self.calls,
+            "errors": self.errors,
+            "quota_errors": self.quota_errors,
+            "ejections": self.ejections,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens
+        }
+
+class _TrackedStream:
+    """Passes chunks through and settles the member's accounting when the stream ends"""
+
+    def __init__(self, stream: Any, on_complete, on_error):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._on_error = on_error
+
+    @property
+    def usage_metadata(self) -> Any:
+        return getattr(self._stream, "usage_metadata", None)
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                yield chunk
+        except Exception as e:
+            self._on_error(e)
+            raise
+        self._on_complete(self.usage_metadata)
+
+class ProviderPool(GradingProvider):
+    """
+    Spreads calls over several API keys and/or models
+
+    Each call goes to a member picked at random in proportion to weight times
+    remaining quota (requests and tokens per minute), so traffic follows spare
+    capacity. A member answering with a quota error is ejected for a while,
+    longer on repeated errors and the call is retried at once on another
+    member. With every member ejected the call fails with a 429, which the
+    outbound scheduler backs off and retries.
+    """
+
+    name = "pool"
+
+    def __init__(self, members: List[PoolMember]):
+        if not members:
+            raise ValueError("Provider pool needs at least one member")
+        self.members = members
+        self.model_name = members[0].provider.model_name
+        self.eject_seconds = float(os.getenv("GEMINI_POOL_EJECT_SECONDS", "60"))
+        self.max_eject_seconds = float(os.getenv("GEMINI_POOL_MAX_EJECT_SECONDS", "600"))
+        self.expected_output_tokens = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "1200"))
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.exhausted = 0
+        self.failovers = 0
+
+    def quota(self) -> Optional[Tuple[int, int]]:
+        """The pool's quota is the sum of its members' (0 when any member is unlimited)"""
+        rpm = 0 if any(m.rpm_limit <= 0 for m in self.members) else sum(m.rpm_limit for m in self.members)
+        tpm = 0 if any(m.tpm_limit <= 0 for m in self.members) else sum(m.tpm_limit for m in self.members)
+        return rpm, tpm
+
+    def choose(self, tokens: int) -> PoolMember:
+        """
+        Pick the member for the next call and charge it the estimated usage
+
+        Raises:
+            ResourceExhausted: Every member is ejected
+        """
+        with self._lock:
+            now = time.monotonic()
+            available = [m for m in self.members if m.ejected_until <= now]
+            if not available:
+                self.exhausted += 1
+                raise api_exceptions.ResourceExhausted("All API keys of the pool are ejected after quota errors")
+
+            scores = [m.weight * m.remaining_quota() for m in available]
+            if sum(scores) <= 0:
+                # Everyone is at quota; the outbound scheduler paces the calls
+                scores = [m.weight for m in available]
+            member = self._random.choices(available, weights=scores)[0]
+
+            member.calls += 1
+            member.requests.take(1)
+            member.tokens.take(tokens)
+            return member
+
+    def generate(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                 batch: bool = False, categories: Optional[Sequence[str]] = None, quick: bool = False) -> Any:
+        tokens = estimate_tokens((instructions or "") + prompt) + self.expected_output_tokens
+        member = self.choose(tokens)
+        try:
+            response = member.provider.generate(prompt, instructions, stream, batch, categories, quick)
+        except Exception as e:
+            self._record_error(member, e)
+            raise
+
+        if stream:
+            return _TrackedStream(
+                response,
+                lambda usage: self._record_success(member, usage, tokens),
+                lambda error: self._record_error(member, error)
+            )
+        self._record_success(member, getattr(response, "usage_metadata", None), tokens)
+        return response
+
+    def can_fail_over(self, error: Exception) -> bool:
+        """A quota error ejected one member: retry on another while any is left"""
+        if not is_quota_error(error):
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if not any(m.ejected_until <= now for m in self.members):
+                return False
+            self.failovers += 1
+            return True
+
+    def _record_success(self, member: PoolMember, usage: Any, estimated_tokens: int) -> None:
+        with self._lock:
+            member.consecutive_quota_errors = 0
+            if usage:
+                prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+                output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+                member.prompt_tokens += prompt_tokens
+                member.output_tokens += output_tokens
+                member.tokens.take(prompt_tokens + output_tokens - estimated_tokens)
+
+    def _record_error(self, member: PoolMember, error: Exception) -> None:
+        with self._lock:
+            member.errors += 1
+            if not is_quota_error(error):
+                return
+            member.quota_errors += 1
+            member.consecutive_quota_errors += 1
+            member.ejections += 1
+            duration = min(self.max_eject_seconds, self.eject_seconds * 2 ** (member.consecutive_quota_errors - 1))
+            member.ejected_until = time.monotonic() + duration
+        logger.warning(f"Ejecting pool member {member.name} for {duration:.0f}s after a quota error")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        rpm, tpm = self.quota()
+        now = time.monotonic()
+        stats.update({
+            "members": len(self.members),
+            "available": sum(1 for m in self.members if m.ejected_until <= now),
+            "rpm_limit": rpm,
+            "tpm_limit": tpm,
+            "exhausted": self.exhausted,
+            "failovers": self.failovers,
+            "by_member": [m.get_stats() for m in self.members]
+        })
+        return stats
+
+def load_pool_config() -> List[Dict[str, Any]]:
+    """
+    Pool entries from GEMINI_KEY_POOL (JSON list) or GEMINI_API_KEYS (comma-separated keys)
+
+    A GEMINI_KEY_POOL entry may set api_key, model, weight, rpm, tpm and
+    provider (gemini or mock, the latter for offline load tests).
+    """
+    pool = os.getenv("GEMINI_KEY_POOL", "").strip()
+    if pool:
+        entries = json.loads(pool)
+        if not isinstance(entries, list):
+            raise ValueError("GEMINI_KEY_POOL must be a JSON list of key entries")
+        return entries
+
+    keys = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") if key.strip()]
+    return [{"api_key": key} for key in keys]
+
+def create_provider_pool(structured_output: bool = True) -> Optional[ProviderPool]:
+    """Build the key pool when one is configured, else None"""
+    entries = load_pool_config()
+    if not entries:
+        return None
+
+    rpm_default = int(os.getenv("GEMINI_RPM_LIMIT", "2000"))
+    tpm_default = int(os.getenv("GEMINI_TPM_LIMIT", "4000000"))
+    members = []
+    for index, entry in enumerate(entries):
+        if entry.get("provider", "gemini") == "mock":
+            provider = MockProvider()
+            label = f"mock-{index}"
+        else:
+            # The first key is the process-wide SDK configuration (and owns the context cache)
+            provider = GeminiProvider(
+                structured_output, entry.get("api_key"), entry.get("model"), dedicated_client=index > 0
+            )
+            label = mask_key(entry.get("api_key") or os.getenv("GEMINI_API_KEY", ""))
+        members.append(PoolMember(
+            f"{label}/{provider.model_name}",
+            provider,
+            float(entry.get("weight", 1.0)),
+            int(entry.get("rpm", rpm_default)),
+            int(entry.get("tpm", tpm_default))
+        ))
+
+    logger.info(f"Grading with a pool of {len(members)} keys/models")
+    return ProviderPool(members)
@@ -0,0 +1,263 @@
+import glob
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+from services.essay_sanitizer import fit_token_budget
+from services.grading_cache import GradingCache
+from services.grading_provider import GradingProvider, MockProvider, MockResponse, MockUsage
+from services.rubric import CATEGORIES, MODEL_CATEGORIES, REMARK_KEYS, restrict_compact_response
+
+logger = logging.getLogger(__name__)
+
+ESSAY_MARKER = "ESSAY TO ANALYZE:"
+
+def essay_from_prompt(prompt: str) -> str:
+    """Extract the essay text from a grading prompt or essay payload"""
+    return prompt.split(ESSAY_MARKER, 1)[-1].strip()
+
+def text_hash(essay_text: str) -> str:
+    """Hash of the normalized essay text used to index recorded gradings"""
+    return hashlib.sha256(GradingCache.normalize_text(essay_text).encode("utf-8")).hexdigest()
+
+def grading_to_response_text(grading_result: Dict[str, Any]) -> str:
+    """Turn a stored grading_result back into the compact JSON the model returns"""
+    names = {name: key for key, (name, _) in CATEGORIES.items()}
+    categories = {}
+    for name, score in grading_result.get("category_scores", {}).items():
+        key = names.get(name)
+        if key in MODEL_CATEGORIES:
+            categories[key] = {"s": score.get("score", 0), "f": score.get("feedback", "")}
+
+    remarks = grading_result.get("examiner_remarks") or {}
+    return json.dumps({
+        "c": categories,
+        "sf": grading_result.get("summary_feedback", ""),
+        "t": grading_result.get("submission_type", "B"),
+        "r": {key: remarks.get(name, []) for key, name in REMARK_KEYS.items()}
+    }, separators=(",", ":"))
+
+class _Recording:
+    def __init__(self, response_text: str, source: str, latency: Optional[float] = None,
+                 prompt_tokens: int = 0, output_tokens: int = 0):
+        self.response_text = response_text
+        self.source = source
+        self.latency = latency
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+class ReplayProvider(GradingProvider):
+    """
+    Serves recorded gradings for known essays without calling the model
+
+    The index is built from the stored results corpus (storage/results) and
+    from fixtures captured by RecordingProvider, keyed by a hash of the
+    normalized essay text. Inputs are matched both as stored and as cut to the
+    prompt token budget. Latency is the recorded one where a fixture has it,
+    otherwise a synthetic draw from the mock distribution seeded by the essay,
+    so repeated runs see identical timings. Unknown essays are graded by the
+    mock provider or fail, depending on REPLAY_ON_MISS.
+    """
+
+    name = "replay"
+
+    def __init__(self, corpus_glob: str = None, fixtures_dir: str = None):
+        self.model_name = "replay"
+        self.corpus_glob = corpus_glob or os.getenv("REPLAY_CORPUS_GLOB", "storage/results/*.json")
+        self.fixtures_dir = fixtures_dir or os.getenv("REPLAY_FIXTURES_DIR", "storage/fixtures")
+        self.latency_mode = os.getenv("REPLAY_LATENCY", "recorded").lower()
+        self.on_miss = os.getenv("REPLAY_ON_MISS", "mock").lower()
+        self.token_budget = int(os.getenv("ESSAY_TOKEN_BUDGET", "8000"))
+        self.chunk_size = int(os.getenv("MOCK_STREAM_CHUNK_CHARS", "64"))
+
+        if self.latency_mode not in ("recorded", "synthetic", "none"):
+            raise ValueError(f"Unknown REPLAY_LATENCY: {self.latency_mode}")
+        if self.on_miss not in ("mock", "error"):
+            raise ValueError(f"Unknown REPLAY_ON_MISS: {self.on_miss}")
+
+        self.fallback = MockProvider()
+        self._recordings: Dict[str, _Recording] = {}
+        self.load()
+
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> None:
+        """(Re)build the index from the results corpus, then the fixtures on top"""
+        self._recordings = {}
+        for path in sorted(glob.glob(self.corpus_glob)):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+                self._index(record["original_text"], _Recording(
+                    grading_to_response_text(record["grading_result"]), "corpus"
+                ))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable replay record {path}: {e}")
+
+        for path in sorted(glob.glob(os.path.join(self.fixtures_dir, "*.json"))):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    fixture = json.load(f)
+                self._index(fixture["essay_text"], _Recording(
+                    fixture["response_text"], "fixture", fixture.get("latency_seconds"),
+                    fixture.get("prompt_tokens", 0), fixture.get("output_tokens", 0)
+                ))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable replay fixture {path}: {e}")
+
+        logger.info(f"Replay index holds {len(self._recordings)} keys")
+
+    def _index(self, essay_text: str, recording: _Recording) -> None:
+        self._recordings[text_hash(essay_text)] = recording
+        self._recordings[text_hash(fit_token_budget(essay_text, self.token_budget))] = recording
+
+    def generate(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                 batch: bool = False, categories: Optional[Sequence[str]] = None, quick: bool = False) -> Any:
+        # Gradings are recorded per essay, so batch calls are always misses
+        key = text_hash(essay_from_prompt(prompt))
+        recording = None if batch else self._recordings.get(key)
+        if recording is None:
+            self.misses += 1
+            if self.on_miss == "error":
+                raise KeyError(f"No recorded grading for essay {key[:12]}")
+            return self.fallback.generate(prompt, instructions, stream, batch, categories, quick)
+
+        self.hits += 1
+        latency = self._latency(key, recording)
+        response_text = recording.response_text
+        if categories or quick:
+            # Served from the full recorded grading: only the requested categories, no remarks when quick
+            data = json.loads(response_text)
+            if categories:
+                data = restrict_compact_response(data, categories)
+            if quick:
+                data.pop("r", None)
+            response_text = json.dumps(data, separators=(",", ":"))
+        usage = MockUsage(
+            recording.prompt_tokens or math.ceil(len((instructions or "") + prompt) / 4),
+            recording.output_tokens if recording.output_tokens and response_text is recording.response_text
+            else math.ceil(len(response_text) / 4)
+        )
+        response = MockResponse(response_text, usage, latency, self.chunk_size)
+        if not stream:
+            time.sleep(latency)
+        return response
+
+    def _latency(self, key: str, recording: _Recording) -> float:
+        if self.latency_mode == "none":
+            return 0.0
+        if self.latency_mode == "recorded" and recording.latency is not None:
+            return recording.latency
+        return self.fallback.sample_latency(random.Random(key))
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        lookups = self.hits + self.misses
+        stats.update({
+            "recordings": len(set(map(id, self._recordings.values()))),
+            "latency_mode": self.latency_mode,
+            "on_miss": self.on_miss,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        })
+        return stats
+
+class _RecordingStream:
+    """Passes chunks through and writes the fixture once the stream completes"""
+
+    def __init__(self, stream: Any, on_complete):
+        self._stream = stream
+        self._on_complete = on_complete
+
+    @property
+    def usage_metadata(self) -> Any:
+        return getattr(self._stream, "usage_metadata", None)
+
+    def __iter__(self):
+        parts = []
+        for chunk in self._stream:
+            parts.append(chunk.text)
+            yield chunk
+        self._on_complete("".join(parts), self.usage_metadata)
+
+class RecordingProvider(GradingProvider):
+    """
+    Wraps a live provider and captures each successful response as a fixture
+
+    Fixtures hold the essay, the raw response text, the observed latency and
+    token counts, and are what ReplayProvider serves back later.
+    """
+
+    name = "record"
+
+    def __init__(self, inner: GradingProvider, fixtures_dir: str = None):
+        self.inner = inner
+        self.model_name = inner.model_name
+        self.fixtures_dir = fixtures_dir or os.getenv("REPLAY_FIXTURES_DIR", "storage/fixtures")
+        os.makedirs(self.fixtures_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def generate(self, prompt: str, instructions: Optional[str] = None, stream: bool = False,
+                 batch: bool = False, categories: Optional[Sequence[str]] = None, quick: bool = False) -> Any:
+        if batch or categories or quick:
+            # Fixtures hold one full grading of one essay; other responses are not recorded
+            return self.inner.generate(prompt, instructions, stream, batch, categories, quick)
+
+        essay_text = essay_from_prompt(prompt)
+        started = time.perf_counter()
+        response = self.inner.generate(prompt, instructions, stream)
+
+        def save(text: str, usage: Any) -> None:
+            self.save_fixture(essay_text, text, time.perf_counter() - started, usage)
+
+        if stream:
+            return _RecordingStream(response, save)
+        save(response.text, getattr(response, "usage_metadata", None))
+        return response
+
+    def save_fixture(self, essay_text: str, response_text: str, latency: float, usage: Any = None) -> str:
+        """
+        Write one fixture file named after the essay hash
+
+        Returns:
+            Path of the written fixture
+        """
+        key = text_hash(essay_text)
+        fixture = {
+            "text_hash": key,
+            "essay_text": essay_text,
+            "response_text": response_text,
+            "latency_seconds": round(latency, 3),
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "output_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+            "model": self.model_name,
+            "recorded_at": datetime.now().isoformat()
+        }
+        path = os.path.join(self.fixtures_dir, f"{key}.json")
+        try:
+            with self._lock:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(fixture, f, indent=2, ensure_ascii=False)
+                self.recorded += 1
+        except Exception as e:
+            logger.warning(f"Failed to record fixture {path}: {e}")
+        return path
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update({
+            "fixtures_dir": self.fixtures_dir,
+            "recorded": self.recorded,
+            "inner": self.inner.get_stats()
+        })
+        return stats
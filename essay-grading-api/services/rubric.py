@@ -0,0 +1,224 @@
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+# Compact response key -> (category name, maximum score)
+CATEGORIES = {
+    "th": ("Thesis & Topic Understanding", 10),
+    "ol": ("Outline Quality", 10),
+    "st": ("Structure & Coherence", 15),
+    "ct": ("Content Depth, Balance & Relevance", 20),
+    "lg": ("Language Proficiency & Expression", 15),
+    "cr": ("Critical Thinking & Analytical Reasoning", 5),
+    "cn": ("Conclusion", 10),
+    "wc": ("Word Count & Length Control", 15),
+}
+
+CATEGORY_MAX_SCORES = {name: max_score for name, max_score in CATEGORIES.values()}
+
+# Categories scored on the server rather than by the model
+LOCAL_CATEGORIES = ("wc",)
+MODEL_CATEGORIES = {key: value for key, value in CATEGORIES.items() if key not in LOCAL_CATEGORIES}
+
+# Word Count & Length Control bands: (minimum words, score, label)
+WORD_COUNT_BANDS = [
+    (2500, 15, "excellent"),
+    (2000, 12, "adequate"),
+    (1500, 9, "below average"),
+    (1000, 6, "poor"),
+    (800, 3, "very poor"),
+    (0, 0, "automatic fail"),
+]
+
+# Submission types whose length is marked (A, D, F and G score every other section 0)
+WORD_COUNT_SCORED_TYPES = ("B", "C", "E")
+
+SUBMISSION_TYPES = ["A", "B", "C", "D", "E", "F", "G"]
+
+# Sections every submission type leaves at 0 (Step 3 of the rubric)
+TYPE_ZEROED_CATEGORIES = {
+    "A": tuple(key for key in MODEL_CATEGORIES if key != "ol"),
+    "C": ("ol",),
+    "D": tuple(key for key in MODEL_CATEGORIES if key != "th"),
+    "F": tuple(MODEL_CATEGORIES),
+    "G": tuple(MODEL_CATEGORIES),
+}
+
+# rubric_type of the quick-grade tier: scores with short feedback under a hard output cap
+QUICK_RUBRIC = "quick"
+
+# Category groups marked by separate concurrent calls in fan-out mode
+CATEGORY_GROUPS = {
+    "structure": ("th", "ol", "st"),
+    "content": ("ct", "cr"),
+    "language": ("lg", "cn"),
+}
+
+# Compact response key -> examiner_remarks key
+REMARK_KEYS = {
+    "s": "strengths",
+    "w": "weaknesses",
+    "g": "suggestions",
+}
+
+def build_response_schema(categories: Optional[Sequence[str]] = None, quick: bool = False) -> Dict[str, Any]:
+    """
+    JSON schema of the compact grading response used in structured-output mode
+
+    Args:
+        categories: Compact keys of the categories to mark (default: every model category)
+        quick: Quick-grade tier: one-line comments, a short summary and no final remarks
+    """
+    categories = list(categories or MODEL_CATEGORIES)
+    category_schema = {
+        "type": "object",
+        "properties": {
+            "s": {"type": "integer", "description": "Score"},
+            "f": {"type": "string", "description": "One-line comment (at most 12 words)" if quick else "Concise examiner comment"},
+        },
+        "required": ["s", "f"],
+    }
+
+    schema = {
+        "type": "object",
+        "properties": {
+            "c": {
+                "type": "object",
+                "properties": {
+                    key: dict(category_schema, description=f"{CATEGORIES[key][0]} (0-{CATEGORIES[key][1]})")
+                    for key in categories
+                },
+                "required": categories,
+            },
+            "sf": {"type": "string", "description": "Overall feedback paragraph for the student"},
+            "t": {"type": "string", "enum": SUBMISSION_TYPES, "description": "Submission type"},
+            "r": {
+                "type": "object",
+                "properties": {
+                    key: {"type": "array", "items": {"type": "string"}, "description": remark}
+                    for key, remark in REMARK_KEYS.items()
+                },
+                "required": list(REMARK_KEYS),
+            },
+        },
+        "required": ["c", "sf", "t", "r"],
+    }
+    if quick:
+        del schema["properties"]["r"]
+        schema["required"].remove("r")
+        schema["properties"]["sf"]["description"] = "One short summary paragraph (at most 60 words)"
+    return schema
+
+def build_batch_response_schema(quick: bool = False) -> Dict[str, Any]:
+    """JSON schema of a batch response: one compact (or quick) grading per essay, keyed by its index"""
+    item_schema = build_response_schema(quick=quick)
+    item_schema["properties"] = {"i": {"type": "integer", "description": "Essay index"}, **item_schema["properties"]}
+    item_schema["required"] = ["i"] + item_schema["required"]
+
+    return {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": item_schema}},
+        "required": ["results"],
+    }
+
+def is_compact_response(data: Dict[str, Any]) -> bool:
+    """Whether a parsed response uses the compact short-key format"""
+    return "c" in data
+
+def expand_category(key: str, score_data: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Convert one category entry (compact or long key) to (category name, score dict)
+
+    Compact scores are clamped to their rubric maximum; unknown keys give None.
+    """
+    if key in CATEGORIES:
+        name, max_score = CATEGORIES[key]
+        return name, {
+            "score": max(0, min(int(score_data.get("s", 0)), max_score)),
+            "feedback": score_data.get("f", ""),
+        }
+    if key in CATEGORY_MAX_SCORES and "score" in score_data:
+        return key, {"score": score_data["score"], "feedback": score_data.get("feedback", "")}
+    return None
+
+def expand_compact_response(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Expand a compact grading response into the long-key format of GradingResult
+
+    Category scores are clamped to their rubric maximum; the total is their sum.
+    """
+    category_scores = {}
+    for key, score_data in data.get("c", {}).items():
+        if key in CATEGORIES:
+            name, score = expand_category(key, score_data)
+            category_scores[name] = score
+
+    remarks = data.get("r", {})
+    return {
+        "overall_score": sum(score["score"] for score in category_scores.values()),
+        "category_scores": category_scores,
+        "summary_feedback": data.get("sf", "No summary feedback provided."),
+        "submission_type": data.get("t", "B"),
+        "examiner_remarks": {
+            remark: list(remarks.get(key, []))
+            for key, remark in REMARK_KEYS.items()
+        },
+    }
+
+def restrict_compact_response(data: Dict[str, Any], categories: Sequence[str]) -> Dict[str, Any]:
+    """Copy of a compact response keeping only the given categories"""
+    return dict(data, c={key: value for key, value in data.get("c", {}).items() if key in categories})
+
+def merge_compact_responses(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge the compact responses of the category groups into one response
+
+    The submission type is the one most groups agree on (the first group's
+    on a tie) and sections that type leaves at 0 are zeroed, so every group's
+    marks follow the same Step 3 rule. Summaries are joined and remarks
+    concatenated without duplicates.
+    """
+    types = [part.get("t") for part in parts if part.get("t") in SUBMISSION_TYPES] or ["B"]
+    submission_type = max(types, key=lambda value: (types.count(value), -types.index(value)))
+
+    categories = {}
+    for part in parts:
+        categories.update(part.get("c", {}))
+    for key in TYPE_ZEROED_CATEGORIES.get(submission_type, ()):
+        if key in categories and categories[key].get("s", 0):
+            categories[key] = {"s": 0, "f": f"Not marked for a Type {submission_type} submission."}
+
+    remarks = {key: [] for key in REMARK_KEYS}
+    for part in parts:
+        for key in REMARK_KEYS:
+            for remark in part.get("r", {}).get(key, []):
+                if remark not in remarks[key]:
+                    remarks[key].append(remark)
+
+    summaries = []
+    for part in parts:
+        summary = part.get("sf", "").strip()
+        if summary and summary not in summaries:
+            summaries.append(summary)
+
+    return {
+        "c": categories,
+        "sf": " ".join(summaries),
+        "t": submission_type,
+        "r": remarks,
+    }
+
+def score_word_count(word_count: int, submission_type: str) -> Tuple[int, str]:
+    """
+    Score Word Count & Length Control from the fixed band table
+
+    Returns:
+        Tuple of (score out of 15, examiner comment)
+    """
+    if submission_type not in WORD_COUNT_SCORED_TYPES:
+        return 0, f"{word_count} words; length is not assessed for a Type {submission_type} submission."
+
+    for minimum, score, label in WORD_COUNT_BANDS:
+        if word_count >= minimum:
+            if score == 0:
+                return 0, f"{word_count} words; under the 800-word CSS minimum ({label}, 0/15)."
+            return score, f"{word_count} words ({label}, {score}/15); CSS expects ~2500–3000 words."
+    return 0, f"{word_count} words."
@@ -0,0 +1,56 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call"""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn for key, or join the call already running for the same key
+
+        Args:
+            key: Identity of the work (e.g. essay content hash)
+            fn: Coroutine factory that performs the work
+
+        Returns:
+            The shared result of the single execution
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        else:
+            self.coalesced += 1
+            logger.info(f"Joined in-flight call for key {key[:12]} ({self.coalesced} calls saved so far)")
+
+        # Shield so one caller disconnecting does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        """Forget a finished call and mark its exception as retrieved"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get coalescing statistics"""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "calls_saved": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
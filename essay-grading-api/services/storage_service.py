@@ -57,7 +57,9 @@ class StorageService:
                     "summary_feedback": grading_result.summary_feedback,
                     "submission_type": grading_result.submission_type,
                     "word_count": grading_result.word_count,
-                    "examiner_remarks": grading_result.examiner_remarks
+                    "examiner_remarks": grading_result.examiner_remarks,
+                    "degraded": grading_result.degraded,
+                    "degraded_reason": grading_result.degraded_reason
                 },
                 "annotated_pdf_path": annotated_pdf_path,
                 "graded_at": datetime.now().isoformat(),
@@ -127,6 +129,7 @@ class StorageService:
                         metadata = {
                             "essay_id": essay_id,
                             "overall_score": result_data["grading_result"]["overall_score"],
+                            "degraded": result_data["grading_result"].get("degraded", False),
                             "graded_at": result_data["graded_at"],
                             "word_count": result_data.get("word_count", 0)
                         }
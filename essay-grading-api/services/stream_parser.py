@@ -0,0 +1,94 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Top-level keys whose child objects are category scores (compact and legacy format)
+CATEGORY_CONTAINER_KEYS = ("c", "category_scores")
+
+class CategoryStreamParser:
+    """
+    Incremental JSON scanner that yields category score objects as soon as they close
+
+    Chunks of a streamed grading response are fed in order; every object directly
+    under the top-level "c" / "category_scores" key is returned once its closing
+    brace arrives. The full text is still parsed normally at the end.
+    """
+
+    def __init__(self, container_keys: Tuple[str, ...] = CATEGORY_CONTAINER_KEYS):
+        self.container_keys = container_keys
+        self._text = ""
+        self._position = 0
+        # Frames: [kind, key in parent, start index, expecting key, pending key]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Consume the next chunk of the response
+
+        Returns:
+            List of (category key, category object) completed by this chunk
+        """
+        self._text += chunk
+        completed = []
+
+        text = self._text
+        for index in range(self._position, len(text)):
+            char = text[index]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(text, index)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                parent_key = self._stack[-1][4] if self._stack and self._stack[-1][0] == "obj" else None
+                self._stack.append(["obj" if char == "{" else "arr", parent_key, index, char == "{", None])
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                frame = self._stack.pop()
+                category = self._completed_category(frame, text, index)
+                if category:
+                    completed.append(category)
+            elif char == ":" and self._stack and self._stack[-1][0] == "obj":
+                self._stack[-1][3] = False
+            elif char == "," and self._stack and self._stack[-1][0] == "obj":
+                self._stack[-1][3] = True
+
+        self._position = len(text)
+        return completed
+
+    def _close_string(self, text: str, index: int) -> None:
+        """Record a finished string as the pending key if an object expects one"""
+        if self._stack and self._stack[-1][0] == "obj" and self._stack[-1][3]:
+            try:
+                self._stack[-1][4] = json.loads(text[self._string_start:index + 1])
+            except ValueError:
+                self._stack[-1][4] = None
+
+    def _completed_category(self, frame: list, text: str, index: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return (key, object) if the frame just closed is a category score object"""
+        if frame[0] != "obj" or len(self._stack) != 2:
+            return None
+        container = self._stack[1]
+        if container[0] != "obj" or container[1] not in self.container_keys:
+            return None
+
+        try:
+            return frame[1], json.loads(text[frame[2]:index + 1])
+        except ValueError as e:
+            logger.warning(f"Could not parse streamed category {frame[1]}: {e}")
+            return None
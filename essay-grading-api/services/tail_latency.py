@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open"""
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies"""
+
+    def __init__(self, window: int = None, min_samples: int = None):
+        self.window = window or int(os.getenv("GEMINI_LATENCY_WINDOW", "200"))
+        self.min_samples = min_samples or int(os.getenv("GEMINI_LATENCY_MIN_SAMPLES", "20"))
+        self._samples = deque(maxlen=self.window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency at percentile p (0-100), or None until min_samples calls were seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50, p95, p99 = (self.percentile(p) for p in (50, 95, 99))
+        return {
+            "samples": len(self._samples),
+            "p50_seconds": round(p50, 3) if p50 is not None else None,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "p99_seconds": round(p99, 3) if p99 is not None else None
+        }
+
+class HedgingPolicy:
+    """
+    When to fire a second, duplicate call for a slow one
+
+    The hedge goes out once the primary has run for the observed p95 latency
+    (never sooner than the configured floor), and hedges may not exceed the
+    configured share of primary calls, which caps the extra load.
+    """
+
+    def __init__(self, tracker: LatencyTracker):
+        self.tracker = tracker
+        self.enabled = os.getenv("GEMINI_HEDGING", "true").lower() == "true"
+        self.percentile = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))
+        self.min_delay = float(os.getenv("GEMINI_HEDGE_MIN_DELAY_SECONDS", "1.0"))
+        self.max_ratio = float(os.getenv("GEMINI_HEDGE_MAX_RATIO", "0.05"))
+        self._lock = threading.Lock()
+
+        self.primaries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None when hedging is off or not yet calibrated"""
+        if not self.enabled:
+            return None
+        observed = self.tracker.percentile(self.percentile)
+        if observed is None:
+            return None
+        return max(self.min_delay, observed)
+
+    def record_primary(self) -> None:
+        with self._lock:
+            self.primaries += 1
+
+    def try_hedge(self) -> bool:
+        """Take one hedge from the budget if the extra-load cap allows"""
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.primaries:
+                self.budget_denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def record_hedge_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        delay = self.delay()
+        return {
+            "enabled": self.enabled,
+            "delay_seconds": round(delay, 3) if delay is not None else None,
+            "max_ratio": self.max_ratio,
+            "primaries": self.primaries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.budget_denied,
+            "extra_load": round(self.hedges / self.primaries, 3) if self.primaries else 0.0
+        }
+
+class CircuitBreaker:
+    """
+    Fails fast while the provider is failing or hanging
+
+    Closed: calls pass. After failure_threshold consecutive failures (errors
+    or timeouts) it opens and calls are refused for reset_seconds. Then it is
+    half-open: one trial call passes, closing the circuit on success and
+    reopening it on failure. The per-call timeout follows the observed p99
+    latency, so hung calls are cut off well before the hard limit once the
+    service has calibrated.
+    """
+
+    def __init__(self, tracker: LatencyTracker):
+        self.tracker = tracker
+        self.enabled = os.getenv("GEMINI_BREAKER_ENABLED", "true").lower() == "true"
+        self.failure_threshold = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+        self.reset_seconds = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
+        self.max_timeout = float(os.getenv("GEMINI_CALL_TIMEOUT_SECONDS", "120"))
+        self.min_timeout = float(os.getenv("GEMINI_CALL_MIN_TIMEOUT_SECONDS", "20"))
+        self.timeout_multiplier = float(os.getenv("GEMINI_CALL_TIMEOUT_P99_MULTIPLIER", "4"))
+        self._lock = threading.Lock()
+
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+        self.opened = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def call_timeout(self) -> float:
+        """Per-call timeout: a multiple of the observed p99, within the configured bounds"""
+        p99 = self.tracker.percentile(99)
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; counts a rejection when it may not"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit breaker closed after a successful trial call")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def abandon(self) -> None:
+        """Forget a cancelled call without counting it either way"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, timed_out: bool = False) -> None:
+        with self._lock:
+            self.timeouts += int(timed_out)
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or (
+                self.state == "closed" and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning(f"Circuit breaker opened for {self.reset_seconds}s after {self.consecutive_failures} failures")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "call_timeout_seconds": round(self.call_timeout(), 3),
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts
+        }
@@ -0,0 +1,172 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Run-on text: a space between a lowercase and an uppercase letter, and after
+# sentence punctuation glued to the next word
+GLUED_WORDS = re.compile(r'(?<=[a-z])(?=[A-Z])|(?<=[.!?])(?=[A-Za-z])')
+
+# Words split off a preceding letter, case-insensitively and one word at a time:
+# each pass sees the spaces inserted by the earlier ones
+COMMON_WORDS = [
+    'The', 'This', 'That', 'These', 'Those', 'In', 'On', 'At', 'By', 'For', 'With', 'As', 'Since', 'Because',
+    'However', 'Moreover', 'Furthermore', 'Additionally', 'Therefore', 'Thus', 'Hence', 'In conclusion'
+]
+COMMON_WORD_PATTERNS = [
+    (word.lower(), re.compile(rf'([a-z])({word})', re.IGNORECASE)) for word in COMMON_WORDS
+]
+
+# Non-ASCII characters re.IGNORECASE matches against ASCII letters (İ, ı, ſ and the Kelvin sign)
+CASE_FOLDED_SPECIALS = re.compile('[\u0130\u0131\u017f\u212a]')
+
+MULTIPLE_SPACES = re.compile(r' +')
+SPACE_BEFORE_PUNCTUATION = re.compile(r' +([.!?])')
+SENTENCE_GAP = re.compile(r'([.!?])\s*([A-Z])')
+
+# A line opening a new paragraph: numbered items, headers, short capitalized
+# sentences and common paragraph starters
+PARAGRAPH_STARTERS = [
+    'However,', 'Moreover,', 'Furthermore,', 'Additionally,',
+    'In conclusion,', 'Therefore,', 'Thus,', 'Hence,',
+    'On the other hand,', 'In contrast,', 'Similarly,',
+    'First,', 'Second,', 'Third,', 'Finally,',
+    'The', 'This', 'These', 'Those',
+    'It is', 'There is', 'There are',
+    'In', 'At', 'By', 'For', 'With',
+    'As', 'Since', 'Because', 'Although',
+    'While', 'When', 'Where', 'Why', 'How'
+]
+PARAGRAPH_START = re.compile('|'.join(
+    [r'\d+\.', r'[A-Z][a-z]+\.', r'[A-Z][A-Z\s]+:', r'[A-Z][a-z\s]+:', r'[A-Z][a-z\s]+\.']
+    + [re.escape(starter) for starter in PARAGRAPH_STARTERS]
+))
+
+def _remove_non_printable(text: str) -> str:
+    """Drop non-printable characters other than newlines and tabs"""
+    if text.replace('\n', '').replace('\t', '').isprintable():
+        return text
+    return ''.join(char for char in text if char.isprintable() or char in '\n\t')
+
+def _split_common_words(text: str) -> str:
+    """Separate common words glued to the previous word, in COMMON_WORDS order"""
+    if CASE_FOLDED_SPECIALS.search(text):
+        for _, pattern in COMMON_WORD_PATTERNS:
+            text = pattern.sub(r'\1 \2', text)
+        return text
+
+    # Without those characters lower() keeps every position and maps no other character to ASCII
+    lowered = text.lower()
+    for word, _ in COMMON_WORD_PATTERNS:
+        cuts = _glued_word_positions(lowered, word)
+        if cuts:
+            bounds = list(zip([0] + cuts, cuts + [len(text)]))
+            text = ' '.join(text[start:end] for start, end in bounds)
+            lowered = ' '.join(lowered[start:end] for start, end in bounds)
+    return text
+
+def _glued_word_positions(lowered: str, word: str) -> List[int]:
+    """
+    Positions where re.sub(r'([a-z])(word)', r'\1 \2', text, flags=re.IGNORECASE) inserts a space
+
+    Without CASE_FOLDED_SPECIALS a case-insensitive match is a match in the lowercased text. The
+    regex consumes the letter before the word, so an occurrence directly following
+    the previous match (as in "ining") is left alone.
+    """
+    cuts = []
+    resume = 0
+    position = lowered.find(word, 1)
+    while position != -1:
+        if position > resume and 'a' <= lowered[position - 1] <= 'z':
+            cuts.append(position)
+            resume = position + len(word)
+        position = lowered.find(word, position + 1)
+    return cuts
+
+def _paragraphs(text: str) -> List[str]:
+    """Group lines into paragraphs: blank lines and paragraph-opening lines start a new one"""
+    paragraphs = []
+    current = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            if current:
+                paragraphs.append(' '.join(current))
+                current = []
+        elif current and PARAGRAPH_START.match(line) is None:
+            current.append(line)
+        else:
+            if current:
+                paragraphs.append(' '.join(current))
+            current = [line]
+    if current:
+        paragraphs.append(' '.join(current))
+    return paragraphs
+
+class TextNormalizer:
+    """
+    Single-pass formatting of extracted PDF text for grading
+
+    Cleans PDF artifacts, repairs run-on words, rebuilds paragraphs and sentence
+    spacing with precompiled patterns. Output is identical to the original
+    step-by-step pipeline (see storage/golden/normalization.json). Normalizing
+    is not idempotent, so ensure_normalized recognizes text this normalizer
+    produced recently and returns it as is instead of formatting it again.
+    """
+
+    def __init__(self, remember: int = 256):
+        self.remember = remember
+        self._recent: "OrderedDict[int, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.normalized = 0
+        self.skipped = 0
+
+    def normalize(self, text: str) -> str:
+        """Format text for grading"""
+        if not text:
+            return ""
+        normalized = self._normalize(text)
+        self.normalized += 1
+        self.mark_normalized(normalized)
+        return normalized
+
+    def mark_normalized(self, text: str) -> None:
+        """Remember text as an output of this normalizer, e.g. one restored from a cache"""
+        with self._lock:
+            self._recent[hash(text)] = len(text)
+            while len(self._recent) > self.remember:
+                self._recent.popitem(last=False)
+
+    def ensure_normalized(self, text: str) -> str:
+        """Format text for grading, unless it already is the output of this normalizer"""
+        if text and self.is_normalized(text):
+            self.skipped += 1
+            return text
+        return self.normalize(text)
+
+    def is_normalized(self, text: str) -> bool:
+        """Whether the text is a recent output of this normalizer"""
+        with self._lock:
+            return self._recent.get(hash(text)) == len(text)
+
+    def _normalize(self, text: str) -> str:
+        # Only spaces and newlines are left as whitespace after this
+        text = _remove_non_printable(text).replace('|', ' ').replace('\t', ' ')
+
+        text = GLUED_WORDS.sub(' ', text)
+        text = _split_common_words(text)
+        text = MULTIPLE_SPACES.sub(' ', text).strip()
+
+        # Paragraphs hold single spaces only, so punctuation spacing can run on the joined text:
+        # sentence gaps also join a paragraph ending a sentence to the next capitalized one
+        text = '\n\n'.join(_paragraphs(text))
+        text = SPACE_BEFORE_PUNCTUATION.sub(r'\1', text)
+        text = SENTENCE_GAP.sub(r'\1 \2', text)
+        return text.strip()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Texts normalized and repeat passes skipped"""
+        return {"normalized": self.normalized, "skipped": self.skipped}
@@ -0,0 +1,131 @@
+"""
+Tests for AIService prompt construction and response parsing
+"""
+
+import asyncio
+import json
+
+import pytest
+from google.generativeai.types import generation_types
+
+from conftest import MOCK_RESPONSE, SAMPLE_ESSAY, SlowModel
+from services.ai_service import AIService
+from services.stream_parser import CategoryStreamParser
+from services.rubric import CATEGORIES, MODEL_CATEGORIES, build_response_schema, score_word_count
+
+COMPACT_RESPONSE = json.dumps({
+    "c": {
+        "th": {"s": 5, "f": "Adequate thesis."},
+        "ol": {"s": 0, "f": "Outline missing."},
+        "st": {"s": 8, "f": "Reasonable flow."},
+        "ct": {"s": 10, "f": "Thin content."},
+        "lg": {"s": 7, "f": "Some errors."},
+        "cr": {"s": 0, "f": "Descriptive only."},
+        "cn": {"s": 0, "f": "No conclusion."}
+    },
+    "sf": "Fragmentary attempt.",
+    "t": "C",
+    "r": {"s": [], "w": [], "g": []}
+})
+
+
+@pytest.fixture
+def service():
+    return AIService()
+
+
+def test_compact_response_expands_to_legacy_result(service):
+    compact = service._apply_local_scores(service._parse_ai_response(COMPACT_RESPONSE), 200)
+    legacy = service._apply_local_scores(service._parse_ai_response(MOCK_RESPONSE), 200)
+    assert compact == legacy
+    assert compact.overall_score == 30
+
+
+def test_compact_scores_are_clamped_to_rubric_maximum(service):
+    data = json.loads(COMPACT_RESPONSE)
+    data["c"]["cr"]["s"] = 9
+    result = service._parse_ai_response(json.dumps(data))
+    assert result.category_scores["Critical Thinking & Analytical Reasoning"].score == 5
+
+
+def test_response_schema_is_accepted_by_sdk():
+    config = generation_types.to_generation_config_dict({
+        "response_mime_type": "application/json",
+        "response_schema": build_response_schema()
+    })
+    schema = config["response_schema"]
+    assert set(schema.properties["c"].properties) == set(MODEL_CATEGORIES)
+    assert "o" not in schema.properties
+    assert list(schema.properties["t"].enum) == ["A", "B", "C", "D", "E", "F", "G"]
+
+
+def test_prompt_output_format_follows_mode(service, monkeypatch):
+    assert '"c": {"th"' in service._build_grading_prompt("Essay text", "default")
+    monkeypatch.setattr(service, "structured_output", False)
+    assert '"overall_score"' in service._build_grading_prompt("Essay text", "default")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_stream_parser_emits_each_category_once(chunk_size):
+    parser = CategoryStreamParser()
+    emitted = []
+    for start in range(0, len(COMPACT_RESPONSE), chunk_size):
+        emitted.extend(parser.feed(COMPACT_RESPONSE[start:start + chunk_size]))
+    assert emitted == list(json.loads(COMPACT_RESPONSE)["c"].items())
+
+
+def test_stream_parser_reads_legacy_categories_and_ignores_braces_in_strings():
+    data = json.loads(MOCK_RESPONSE)
+    data["summary_feedback"] = 'Uses "{quotes}" and } braces'
+    data["category_scores"]["Conclusion"]["feedback"] = 'Ends with "}" {'
+    text = json.dumps(data)
+    emitted = []
+    parser = CategoryStreamParser()
+    for char in text:
+        emitted.extend(parser.feed(char))
+    assert [name for name, _ in emitted] == list(data["category_scores"])
+    assert emitted[6][1]["feedback"] == 'Ends with "}" {'
+
+
+def test_streamed_grading_reports_scores_and_matches_unstreamed(service):
+    service.provider.model = SlowModel(delay=0.05, response_text=COMPACT_RESPONSE, chunk_size=16)
+    service.grading_cache.enabled = False
+    scores = []
+
+    streamed = asyncio.run(service.grade_essay(
+        SAMPLE_ESSAY, on_category_score=lambda name, score: scores.append((name, score.score))
+    ))
+
+    service.streaming = False
+    unstreamed = asyncio.run(service.grade_essay(SAMPLE_ESSAY))
+
+    assert streamed == unstreamed
+    assert [name for name, _ in scores] == [name for name, _ in CATEGORIES.values()]
+    assert dict(scores) == {name: score.score for name, score in streamed.category_scores.items()}
+    assert service.get_stats()["avg_first_score_seconds"] > 0
+
+
+@pytest.mark.parametrize("word_count, expected", [
+    (0, 0), (799, 0), (800, 3), (999, 3), (1000, 6), (1500, 9), (2000, 12), (2499, 12), (2500, 15), (5000, 15)
+])
+def test_word_count_bands(word_count, expected):
+    assert score_word_count(word_count, "B")[0] == expected
+
+
+def test_word_count_is_scored_locally_and_total_recomputed(service):
+    data = json.loads(MOCK_RESPONSE)
+    data["submission_type"] = "B"
+    data["overall_score"] = 90
+    data["category_scores"]["Word Count & Length Control"]["score"] = 15
+    result = service._apply_local_scores(service._parse_ai_response(json.dumps(data)), 1200)
+
+    assert result.category_scores["Word Count & Length Control"].score == 6
+    assert result.overall_score == 36
+    assert result.word_count == 1200
+
+
+def test_prompt_no_longer_asks_for_word_count(service):
+    prompt = service._build_grading_prompt(" ".join(["word"] * 1234), "default")
+    assert "1234 words long" in prompt
+    assert "Word Count Scoring Guidelines" not in prompt
+    assert '"wc"' not in prompt
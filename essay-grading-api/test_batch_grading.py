@@ -0,0 +1,174 @@
+"""
+Tests for batch grading: packing, batch responses and the /grade-batch endpoint
+"""
+
+import asyncio
+import io
+import json
+import zipfile
+
+import httpx
+import pytest
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+import main
+from conftest import SAMPLE_ESSAY
+from services.ai_service import AIService
+from services.essay_batcher import build_batch_payload, pack_essays, parse_batch_response, split_batch_payload
+from services.grading_provider import MockProvider
+from services.rubric import CATEGORY_MAX_SCORES
+
+ESSAYS = [f"Essay {index}. {SAMPLE_ESSAY}" for index in range(5)]
+
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    return monkeypatch
+
+
+def batch_service():
+    service = AIService(provider=MockProvider())
+    service.grading_cache.enabled = False
+    return service
+
+
+def test_pack_essays_respects_budget_and_size():
+    assert pack_essays([100, 100, 100, 100], token_budget=250, max_essays=8) == [[0, 1], [2, 3]]
+    assert pack_essays([100] * 5, token_budget=10000, max_essays=2) == [[0, 1], [2, 3], [4]]
+    # An essay larger than the budget still gets a call of its own
+    assert pack_essays([50, 900, 50], token_budget=200, max_essays=8) == [[0], [1], [2]]
+
+
+def test_batch_payload_round_trips():
+    payload = build_batch_payload([(3, "First essay text"), (4, "Second essay, more text")])
+
+    assert split_batch_payload(payload) == [(0, 3, "First essay text"), (1, 4, "Second essay, more text")]
+
+
+def test_parse_batch_response_keys_entries_by_index():
+    response = "```json" + json.dumps({"results": [
+        {"i": 1, "c": {}, "sf": "b"},
+        {"i": "0", "c": {}, "sf": "bad index"},
+        {"i": 0, "c": {}, "sf": "a"},
+    ]}) + "```"
+
+    parsed = parse_batch_response(response)
+
+    assert sorted(parsed) == [0, 1]
+    assert parsed[0]["sf"] == "a"
+
+
+def test_batch_grading_matches_one_by_one_results(mock_env):
+    service = batch_service()
+
+    batched = asyncio.run(service.grade_essays(ESSAYS))
+    single = [asyncio.run(service.grade_essay(essay)) for essay in ESSAYS]
+
+    assert [result.model_dump() for result in batched] == [result.model_dump() for result in single]
+    assert all(set(result.category_scores) == set(CATEGORY_MAX_SCORES) for result in batched)
+    stats = service.get_stats()["batch"]
+    assert stats["calls"] == 1
+    assert stats["essays"] == 5
+    assert stats["calls_saved"] == 4
+    assert stats["estimated_tokens_saved"] > 0
+
+
+def test_batch_grading_dedupes_and_uses_cache(mock_env):
+    service = AIService(provider=MockProvider())
+    asyncio.run(service.grade_essay(ESSAYS[0]))
+    calls = service.provider.calls
+
+    results = asyncio.run(service.grade_essays([ESSAYS[0], ESSAYS[1], ESSAYS[1], ESSAYS[2]]))
+
+    assert len(results) == 4
+    assert results[1] == results[2]
+    # ESSAYS[0] came from the cache, the duplicate was graded once: one batch call for two essays
+    assert service.provider.calls == calls + 1
+    assert service.get_stats()["batch"]["essays"] == 2
+
+
+def test_missing_batch_entries_are_regraded_individually(mock_env):
+    service = batch_service()
+    build_batch_response = service.provider.build_batch_response
+
+    def drop_first(prompt, quick=False):
+        data = json.loads(build_batch_response(prompt, quick))
+        data["results"] = [entry for entry in data["results"] if entry["i"] != 0]
+        return json.dumps(data)
+
+    service.provider.build_batch_response = drop_first
+
+    results = asyncio.run(service.grade_essays(ESSAYS[:3]))
+
+    assert not any(result.degraded for result in results)
+    assert service.provider.calls == 2
+    stats = service.get_stats()["batch"]
+    assert stats["fallbacks"] == 1
+    assert stats["essays"] == 2
+
+
+def make_pdf(text: str) -> bytes:
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    y = 750
+    words = text.split()
+    for start in range(0, len(words), 12):
+        pdf.drawString(50, y, " ".join(words[start:start + 12]))
+        y -= 14
+    pdf.save()
+    return buffer.getvalue()
+
+
+def post_batch(app, **kwargs):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/grade-batch", **kwargs)
+
+    return asyncio.run(scenario())
+
+
+def test_grade_batch_endpoint_stores_every_essay(isolated_app, mock_env):
+    mock_env.setattr(main.ai_service, "provider", MockProvider())
+
+    response = post_batch(isolated_app, json={"essays": ESSAYS[:3] + ["too short"]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["completed"], body["failed"]) == (4, 3, 1)
+    assert body["items"][3]["status"] == "error"
+    assert main.ai_service.provider.calls == 1
+
+    async def fetch():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(body["items"][0]["result_url"])
+
+    stored = asyncio.run(fetch())
+    assert stored.status_code == 200
+    assert stored.json()["overall_score"] == body["items"][0]["overall_score"]
+
+
+def test_grade_batch_endpoint_accepts_zip_of_pdfs(isolated_app, mock_env):
+    mock_env.setattr(main.ai_service, "provider", MockProvider())
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("first.pdf", make_pdf(ESSAYS[0]))
+        zip_file.writestr("second.pdf", make_pdf(ESSAYS[1]))
+        zip_file.writestr("broken.pdf", b"not a pdf")
+        zip_file.writestr("notes.txt", b"ignored")
+
+    response = post_batch(
+        isolated_app,
+        files={"file": ("essays.zip", archive.getvalue(), "application/zip")},
+        data={"rubric_type": "default"}
+    )
+
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["filename"] for item in items] == ["first.pdf", "second.pdf", "broken.pdf"]
+    assert [item["status"] for item in items] == ["completed", "completed", "error"]
+    assert items[0]["word_count"] > 100
@@ -0,0 +1,101 @@
+"""
+Tests for category fan-out: concurrent per-group grading calls merged into one result
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from conftest import SAMPLE_ESSAY
+from services.ai_service import AIService
+from services.grading_provider import MockProvider
+from services.rubric import CATEGORY_GROUPS, CATEGORY_MAX_SCORES, build_response_schema, merge_compact_responses
+
+LONG_ESSAY = "\n\n".join([SAMPLE_ESSAY] * 8)
+
+
+@pytest.fixture
+def fanout_env(monkeypatch):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    monkeypatch.setenv("GEMINI_CATEGORY_FANOUT", "true")
+    monkeypatch.setenv("GEMINI_FANOUT_MIN_WORDS", "1000")
+    return monkeypatch
+
+
+def fanout_service(fanout: bool = True):
+    service = AIService(provider=MockProvider())
+    service.grading_cache.enabled = False
+    service.category_fanout = fanout
+    return service
+
+
+def test_merge_uses_majority_type_and_zeroes_its_sections():
+    parts = [
+        {"c": {"th": {"s": 6, "f": "a"}, "ol": {"s": 4, "f": "b"}}, "sf": "First.", "t": "C", "r": {"s": ["x"], "w": [], "g": []}},
+        {"c": {"ct": {"s": 9, "f": "c"}}, "sf": "Second.", "t": "B", "r": {"s": ["x", "y"], "w": [], "g": []}},
+        {"c": {"lg": {"s": 8, "f": "d"}}, "sf": "First.", "t": "C", "r": {"s": [], "w": ["z"], "g": []}},
+    ]
+
+    merged = merge_compact_responses(parts)
+
+    assert merged["t"] == "C"
+    # Type C has no outline marks, whichever group awarded them
+    assert merged["c"]["ol"]["s"] == 0
+    assert merged["c"]["th"]["s"] == 6
+    assert merged["sf"] == "First. Second."
+    assert merged["r"] == {"s": ["x", "y"], "w": ["z"], "g": []}
+
+
+def test_group_schema_requires_only_its_categories():
+    schema = build_response_schema(CATEGORY_GROUPS["content"])
+
+    assert schema["properties"]["c"]["required"] == ["ct", "cr"]
+
+
+def test_fanout_matches_single_call_result(fanout_env):
+    single = asyncio.run(fanout_service(fanout=False).grade_essay(LONG_ESSAY))
+    service = fanout_service()
+
+    streamed = {}
+    merged = asyncio.run(service.grade_essay(
+        LONG_ESSAY, on_category_score=lambda category, score: streamed.setdefault(category, score)
+    ))
+
+    assert service.provider.calls == len(CATEGORY_GROUPS)
+    assert merged.category_scores == single.category_scores
+    assert merged.overall_score == single.overall_score
+    assert merged.overall_score == sum(score.score for score in merged.category_scores.values())
+    assert set(streamed) == set(CATEGORY_MAX_SCORES)
+    assert service.get_stats()["category_fanout"]["gradings"] == 1
+
+
+def test_group_calls_run_concurrently(fanout_env):
+    fanout_env.setenv("MOCK_LATENCY_MEAN_SECONDS", "0.3")
+    service = fanout_service()
+
+    started = time.perf_counter()
+    asyncio.run(service.grade_essay(LONG_ESSAY))
+    elapsed = time.perf_counter() - started
+
+    assert service.provider.calls == 3
+    assert elapsed < 0.6
+
+
+def test_short_essays_use_a_single_call(fanout_env):
+    service = fanout_service()
+
+    asyncio.run(service.grade_essay(SAMPLE_ESSAY))
+
+    assert service.provider.calls == 1
+    assert service.get_stats()["category_fanout"]["gradings"] == 0
+
+
+def test_group_instructions_mark_only_their_sections(fanout_env):
+    service = fanout_service()
+
+    instructions = service._build_rubric_instructions("default", categories=CATEGORY_GROUPS["language"])
+
+    assert "marks only these sections: Language Proficiency & Expression /15, Conclusion /10" in instructions
+    assert '{"c": {"lg": {"s": 0, "f": ""}, "cn": {"s": 0, "f": ""}}' in instructions
@@ -0,0 +1,164 @@
+"""
+Concurrency tests for the Essay Grading API
+Verifies that slow Gemini calls do not block other requests on the same worker
+"""
+
+import asyncio
+import time
+
+import httpx
+
+import main
+from conftest import SAMPLE_ESSAY
+from services.job_queue import JobQueue
+
+
+def test_health_responsive_during_slow_gradings(isolated_app):
+    """/health answers in milliseconds while ten slow gradings are in flight"""
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            uploads = [
+                asyncio.create_task(client.post("/upload-essay", json={"essay_text": f"Essay {i}. {SAMPLE_ESSAY}"}))
+                for i in range(10)
+            ]
+            await asyncio.sleep(0.2)
+            assert main.ai_service.in_flight == 10
+
+            health_started = time.perf_counter()
+            health = await client.get("/health")
+            health_elapsed = time.perf_counter() - health_started
+
+            responses = await asyncio.gather(*uploads)
+            total_elapsed = time.perf_counter() - started
+            return health, health_elapsed, responses, total_elapsed
+
+    health, health_elapsed, responses, total_elapsed = asyncio.run(scenario())
+
+    assert health.status_code == 200
+    assert health_elapsed < 0.1
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json()["overall_score"] == 30 for response in responses)
+    # Ten one-second calls overlap instead of running back to back
+    assert total_elapsed < 5
+
+
+def test_identical_concurrent_uploads_share_one_call(isolated_app):
+    """Duplicate submissions arriving together cost a single Gemini call"""
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/upload-essay", json={"essay_text": SAMPLE_ESSAY})
+                for _ in range(5)
+            ])
+
+    responses = asyncio.run(scenario())
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.json()["essay_id"] for response in responses}) == 5
+    assert main.ai_service.provider.model.calls == 1
+    assert main.ai_service.single_flight.get_stats()["calls_saved"] == 4
+    for response in responses:
+        stored = asyncio.run(main.storage_service.get_essay_result(response.json()["essay_id"]))
+        assert stored["grading_result"]["overall_score"] == 30
+
+
+def test_async_mode_queues_and_reports_progress(isolated_app, monkeypatch):
+    """?async=true returns 202 at once and progress reports queue position"""
+    monkeypatch.setattr(main, "job_queue", JobQueue(num_workers=2, positions_callback=main._set_queue_positions))
+    main.ai_service.provider.model.delay = 0.5
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            accepted = [
+                await client.post("/upload-essay?async=true", json={"essay_text": f"Essay {i}. {SAMPLE_ESSAY}"})
+                for i in range(4)
+            ]
+            accept_elapsed = time.perf_counter() - started
+
+            await asyncio.sleep(0.1)
+            waiting = (await client.get(f"/progress/{accepted[3].json()['task_id']}")).json()
+
+            for _ in range(100):
+                progress = [
+                    (await client.get(f"/progress/{response.json()['task_id']}")).json()
+                    for response in accepted
+                ]
+                if all(record["status"] == "completed" for record in progress):
+                    break
+                await asyncio.sleep(0.05)
+
+            results = [
+                await client.get(f"/results/{response.json()['essay_id']}/json")
+                for response in accepted
+            ]
+            return accepted, accept_elapsed, waiting, progress, results
+
+    accepted, accept_elapsed, waiting, progress, results = asyncio.run(scenario())
+
+    assert all(response.status_code == 202 for response in accepted)
+    assert [response.json()["queue_position"] for response in accepted] == [1, 2, 3, 4]
+    assert accept_elapsed < 0.5
+    assert waiting["status"] == "queued"
+    assert waiting["queue_position"] == 2
+    assert all(record["status"] == "completed" and record["progress"] == 100 for record in progress)
+    assert all(response.status_code == 200 for response in results)
+    assert all(response.json()["overall_score"] == 30 for response in results)
+
+
+def test_queue_positions_are_written_in_batches():
+    """A burst of dequeues costs a few batched position writes, not one write per waiting job"""
+    writes = []
+
+    async def scenario():
+        queue = JobQueue(num_workers=1, max_size=100, positions_callback=lambda positions: writes.append(dict(positions)))
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        for index in range(50):
+            queue.submit(f"task-{index}", job)
+        await asyncio.sleep(0.05)
+        release.set()
+        while queue.get_stats()["completed"] < 50:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return queue.get_stats()
+
+    stats = asyncio.run(scenario())
+
+    assert writes[0] == {f"task-{index}": index for index in range(1, 50)}
+    assert len(writes) < 10
+    assert stats["position_writes"] == len(writes)
+
+
+def test_stopping_the_queue_fails_waiting_jobs_and_removes_their_uploads(isolated_app, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "job_queue", JobQueue(num_workers=1, positions_callback=main._set_queue_positions))
+    main.ai_service.provider.model.delay = 1
+    upload = tmp_path / "essay.pdf"
+    upload.write_bytes(b"%PDF-1.4 queued upload")
+
+    async def scenario():
+        main._start_progress("running", "essay-1", "Starting...", queued=True)
+        main._start_progress("waiting", "essay-2", "Starting...", queued=True)
+        main._queue_job("running", "essay-1", lambda: main._run_async_job(
+            "running", main._grade_text_pipeline("running", "essay-1", SAMPLE_ESSAY, "default")
+        ))
+        main._queue_job("waiting", "essay-2", lambda: asyncio.sleep(0), str(upload))
+        await asyncio.sleep(0.1)
+        await main.job_queue.stop()
+
+    asyncio.run(scenario())
+
+    waiting = main.progress_store.get("waiting")
+    assert waiting["status"] == "error" and "resubmit" in waiting["message"]
+    assert "queue_position" not in waiting
+    assert not upload.exists()
+    assert main.job_queue.get_stats()["dropped"] == 1
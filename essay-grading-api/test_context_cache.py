@@ -0,0 +1,155 @@
+"""
+Tests for provider-side caching of the static rubric instructions
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from conftest import SAMPLE_ESSAY, SlowModel
+from services import context_cache
+from services.ai_service import AIService
+from services.context_cache import ContextCache, GeminiContextCacheBackend, min_cached_tokens
+
+
+class StandInCacheBackend:
+    """Local stand-in for the provider's context-caching API"""
+
+    def __init__(self, fail: bool = False, delay: float = 0):
+        self.fail = fail
+        self.delay = delay
+        self.created = []
+        self.refreshed = 0
+        self.models = []
+
+    def create(self, system_instruction, ttl_seconds):
+        if self.fail:
+            raise Exception("Cached content is too small")
+        time.sleep(self.delay)
+        self.created.append(system_instruction)
+        return {"name": f"cachedContents/{len(self.created)}", "ttl": ttl_seconds}
+
+    def refresh(self, handle, ttl_seconds):
+        self.refreshed += 1
+
+    def model_for(self, handle):
+        model = SlowModel(delay=0)
+        self.models.append(model)
+        return model
+
+
+@pytest.fixture
+def service():
+    service = AIService()
+    service.provider.model = SlowModel(delay=0)
+    service.grading_cache.enabled = False
+    return service
+
+
+def enable_cache(service, backend, **kwargs):
+    service.provider.context_cache = ContextCache(backend, min_tokens=0, **kwargs)
+    service.provider.context_cache.enabled = True
+
+
+def test_requests_send_only_the_essay_once_rubric_is_cached(service):
+    backend = StandInCacheBackend()
+    enable_cache(service, backend)
+
+    first = asyncio.run(service.grade_essay(SAMPLE_ESSAY))
+    second = asyncio.run(service.grade_essay(f"Second. {SAMPLE_ESSAY}"))
+
+    assert len(backend.created) == 1
+    assert "Senior CSS Essay Examiner" in backend.created[0]
+    cached_model = backend.models[0]
+    assert cached_model.calls == 2 and service.provider.model.calls == 0
+    assert all(prompt.startswith("The submission is") for prompt in cached_model.prompts)
+    assert all("Senior CSS Essay Examiner" not in prompt for prompt in cached_model.prompts)
+    assert first.overall_score == second.overall_score
+    assert service.get_stats()["provider"]["context_cache"]["hits"] == 2
+
+
+def test_inline_prompt_is_used_when_caching_is_unavailable(service):
+    backend = StandInCacheBackend(fail=True)
+    enable_cache(service, backend)
+
+    cached_off = asyncio.run(service.grade_essay(SAMPLE_ESSAY))
+    asyncio.run(service.grade_essay(f"Second. {SAMPLE_ESSAY}"))
+
+    assert service.provider.model.calls == 2
+    assert service.provider.model.prompts[0] == service._build_grading_prompt(SAMPLE_ESSAY, "default")
+    stats = service.provider.context_cache.get_stats()
+    # The failed creation is not retried until the cool-down has passed
+    assert stats["failures"] == 1 and stats["fallbacks"] == 2
+    assert cached_off.summary_feedback == "Fragmentary attempt."
+
+
+def test_cache_is_refreshed_before_expiry_and_recreated_after(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(context_cache.time, "time", lambda: now[0])
+    backend = StandInCacheBackend()
+    cache = ContextCache(backend, ttl_seconds=600, refresh_margin_seconds=60, min_tokens=0)
+    cache.enabled = True
+
+    model = cache.get_model("rubric")
+    now[0] += 300
+    assert cache.get_model("rubric") is model
+    assert backend.refreshed == 0
+
+    now[0] += 250
+    assert cache.get_model("rubric") is model
+    assert backend.refreshed == 1
+
+    now[0] += 700
+    assert cache.get_model("rubric") is not model
+    assert len(backend.created) == 2
+
+
+def test_callers_do_not_wait_on_a_context_being_created():
+    backend = StandInCacheBackend(delay=0.5)
+    cache = ContextCache(backend, min_tokens=0)
+    cache.enabled = True
+    creator = threading.Thread(target=cache.get_model, args=("rubric",))
+    creator.start()
+    time.sleep(0.1)
+
+    started = time.perf_counter()
+    assert cache.get_model("rubric") is None
+    assert time.perf_counter() - started < 0.1
+    creator.join()
+
+    assert cache.get_model("rubric") is backend.models[0]
+    assert len(backend.created) == 1
+
+
+def test_instructions_below_the_minimum_size_are_never_sent():
+    backend = StandInCacheBackend()
+    cache = ContextCache(backend, min_tokens=4096)
+    cache.enabled = True
+
+    assert cache.get_model("A short rubric") is None
+    assert cache.get_model("A short rubric") is None
+
+    assert backend.created == []
+    stats = cache.get_stats()
+    assert (stats["too_small"], stats["fallbacks"]) == (1, 2)
+
+
+def test_minimum_size_follows_the_model(service, monkeypatch):
+    monkeypatch.delenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", raising=False)
+    assert min_cached_tokens("models/gemini-1.5-flash-002") == 32768
+    assert min_cached_tokens("gemini-2.5-flash-lite") == 1024
+    assert min_cached_tokens("gemini-2.5-pro") == 4096
+    assert min_cached_tokens("some-future-model") == 32768
+
+    rubric = service._build_rubric_instructions("default")
+    for model_name, cached in (("gemini-1.5-flash", False), ("gemini-2.5-flash", True)):
+        backend = StandInCacheBackend()
+        backend.model_name = GeminiContextCacheBackend(model_name).model_name
+        cache = ContextCache(backend)
+        cache.enabled = True
+        assert (cache.get_model(rubric) is not None) is cached, model_name
+
+    monkeypatch.setenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "100")
+    assert ContextCache(StandInCacheBackend()).min_tokens == 100
@@ -0,0 +1,103 @@
+"""
+Tests for the Step 0 essay sanitizer and token budget
+"""
+
+from services.ai_service import AIService
+from services.essay_sanitizer import EssaySanitizer, estimate_tokens, fit_token_budget
+
+PAGE_BODIES = [
+    "Globalization has reshaped trade across every continent in the last three decades. " * 6,
+    "Critics argue that the gains were unevenly distributed between and within nations. " * 6,
+    "Supporters counter that hundreds of millions escaped poverty through export growth. " * 6,
+    "In conclusion, a balanced approach to openness and protection serves developing states. " * 6,
+]
+
+
+def scanned_pages() -> str:
+    pages = [
+        f"Ali Khan Roll No: 1234 CSS Essay 2024 {body}Scanned with CamScanner Page {number} of 4"
+        for number, body in enumerate(PAGE_BODIES, start=1)
+    ]
+    return "Name: Ali Khan\n\n" + "\n\n".join(pages) + "\n\nSources: https://example.com/globalization"
+
+
+def test_repeated_headers_footers_and_watermarks_are_removed():
+    sanitized = EssaySanitizer().sanitize(scanned_pages())
+
+    assert sanitized.text.split("\n\n") == [body.strip() for body in PAGE_BODIES] + ["Sources:"]
+    assert sanitized.removed["headers_footers"] == 8
+    assert sanitized.removed["urls"] == 1
+    assert sanitized.removed["metadata"] == 1
+    assert sanitized.tokens_saved > 0
+
+
+def test_recurring_prose_phrases_are_kept():
+    text = "\n\n".join(f"On the other hand, argument {index} deserves a careful hearing here." for index in range(4))
+    assert EssaySanitizer().sanitize(text).text == text
+
+
+def test_numbered_outline_is_kept():
+    text = "\n\n".join([
+        "Outline",
+        "1. Introduction to the debate on globalization",
+        "2. The economic gains of open trade",
+        "3. The social costs of rapid integration",
+        "4. The policy options for developing states",
+        "5. Conclusion",
+    ])
+    assert EssaySanitizer().sanitize(text).text == text
+
+
+def test_paragraphs_ending_in_dates_are_kept():
+    text = "\n\n".join([
+        "The subcontinent was partitioned in 1947.",
+        "Bangladesh emerged as an independent state in 1971.",
+        "Pakistan conducted its nuclear tests in 1998.",
+        "The country adopted a new constitution in 1973.",
+    ])
+    assert EssaySanitizer().sanitize(text).text == text
+
+
+def test_bare_page_numbers_are_removed():
+    pages = [f"{number} {body}{number}" for number, body in enumerate(PAGE_BODIES, start=1)]
+    sanitized = EssaySanitizer().sanitize("\n\n".join(pages))
+    assert sanitized.text.split("\n\n") == [body.strip() for body in PAGE_BODIES]
+
+
+def test_token_budget_keeps_opening_and_conclusion():
+    paragraphs = [f"Paragraph {index} " + "word " * 100 for index in range(20)]
+    text = "\n\n".join(paragraphs)
+
+    budgeted = fit_token_budget(text, 1000)
+
+    assert estimate_tokens(budgeted) <= 1000
+    assert budgeted.startswith("Paragraph 0 ")
+    assert budgeted.split("\n\n")[-1] == paragraphs[-1]
+    assert "omitted for length" in budgeted
+    assert EssaySanitizer(token_budget=1000).sanitize(text).truncated
+
+
+def test_token_budget_cuts_a_single_paragraph_at_sentences_and_keeps_its_ending():
+    sentences = [f"Sentence {index} develops the argument a little further." for index in range(200)]
+    text = " ".join(sentences + ["In conclusion, the argument holds."])
+
+    budgeted = fit_token_budget(text, 500)
+    head, marker, tail = budgeted.split("\n\n")
+
+    assert estimate_tokens(budgeted) <= 500
+    assert head.startswith("Sentence 0 ") and head.endswith("further.")
+    assert tail.startswith("Sentence ") and tail.endswith("In conclusion, the argument holds.")
+    assert estimate_tokens(tail) >= 500 // 8
+    kept_words = len(head.split()) + len(tail.split())
+    assert marker == f"[... {len(text.split()) - kept_words} words in 1 paragraphs omitted for length ...]"
+
+
+def test_prompt_uses_budgeted_text_but_full_word_count():
+    service = AIService()
+    service.token_budget = 500
+    essay = "\n\n".join("word " * 100 for _ in range(30))
+
+    prompt = service._build_grading_prompt(essay, "default")
+
+    assert "3000 words long" in prompt
+    assert "omitted for length" in prompt
@@ -0,0 +1,84 @@
+"""
+Tests for the PDF extraction cache
+"""
+
+import pytest
+
+from services.extraction_cache import ExtractionCache
+from services.pdf_service import PDFService
+from test_pdf_service import make_multipage_pdf
+
+
+@pytest.fixture(autouse=True)
+def enable_cache(monkeypatch):
+    monkeypatch.setenv("EXTRACTION_CACHE_ENABLED", "true")
+
+
+def extraction(text: str) -> dict:
+    return {"text": text, "pages": 1, "total_pages": 1, "words": len(text.split()), "truncated": False}
+
+
+def test_key_depends_on_file_bytes_and_settings(tmp_path):
+    cache = ExtractionCache(db_path=str(tmp_path / "cache.sqlite3"))
+    first, copy, other = tmp_path / "a.pdf", tmp_path / "b.pdf", tmp_path / "c.pdf"
+    first.write_bytes(b"%PDF-1.4 essay")
+    copy.write_bytes(b"%PDF-1.4 essay")
+    other.write_bytes(b"%PDF-1.4 other essay")
+
+    key = cache.make_key(str(first), 1, 6000, 50)
+    assert key == cache.make_key(str(copy), 1, 6000, 50)
+    assert key != cache.make_key(str(other), 1, 6000, 50)
+    assert key != cache.make_key(str(first), 1, 100, 50)
+
+
+def test_lru_eviction_by_total_size(tmp_path):
+    cache = ExtractionCache(db_path=str(tmp_path / "cache.sqlite3"), max_bytes=10_000)
+    text = "x" * 3000
+    for key in ("a", "b", "c"):
+        cache.set(key, extraction(text))
+    assert cache.get("a")["text"] == text
+
+    # "b" is now the least recently used entry and a fourth one does not fit
+    cache.set("d", extraction(text))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (3, 1, 2, 1)
+    assert stats["size_bytes"] <= 10_000
+
+    # An entry larger than the whole cache is not stored
+    cache.set("e", extraction("x" * 20_000))
+    assert cache.get("e") is None and cache.get_stats()["entries"] == 3
+
+
+def test_repeat_upload_skips_parsing(tmp_path, monkeypatch):
+    path = tmp_path / "essay.pdf"
+    make_multipage_pdf(path, 2)
+    service = PDFService(parallel_workers=1, extraction_cache=ExtractionCache(db_path=str(tmp_path / "cache.sqlite3")))
+
+    first = service.extract(str(path))
+    resubmitted = tmp_path / "resubmitted.pdf"
+    resubmitted.write_bytes(path.read_bytes())
+    monkeypatch.setattr(service, "_extract_professional_text", lambda pdf_file_path: pytest.fail("PDF parsed again"))
+    second = service.extract(str(resubmitted))
+
+    assert second == first
+    # The cached text is already formatted, so clean_text keeps it as is
+    assert service.clean_text(second.text) == first.text
+    stats = service.get_stats()
+    assert (stats["documents"], stats["normalizer"]["normalized"], stats["normalizer"]["skipped"]) == (1, 1, 1)
+    assert (stats["extraction_cache"]["hits"], stats["extraction_cache"]["hit_rate"]) == (1, 0.5)
+
+
+def test_changed_caps_miss_the_cache(tmp_path):
+    path = tmp_path / "binder.pdf"
+    make_multipage_pdf(path, 3)
+    service = PDFService(parallel_workers=1, extraction_cache=ExtractionCache(db_path=str(tmp_path / "cache.sqlite3")))
+
+    full = service.extract(str(path))
+    service.max_pages = 1
+    capped = service.extract(str(path))
+
+    assert (full.pages, capped.pages, capped.truncated) == (3, 1, True)
+    assert service.get_stats()["extraction_cache"]["hits"] == 0
@@ -0,0 +1,109 @@
+"""
+Tests for the content-addressed grading cache
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from models import GradingResult, CategoryScore
+from services import ai_service
+from services.ai_service import AIService
+from services.grading_cache import GradingCache
+
+
+def make_result(score: int = 42) -> GradingResult:
+    return GradingResult(
+        overall_score=score,
+        category_scores={"Thesis & Topic Understanding": CategoryScore(score=7, feedback="Clear thesis.")},
+        summary_feedback="Solid attempt.",
+        submission_type="B",
+        word_count=0,
+        examiner_remarks={"strengths": ["Clarity"], "weaknesses": [], "suggestions": []}
+    )
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GradingCache(db_path=str(tmp_path / "cache.sqlite3"), max_entries=3, ttl_seconds=60)
+
+
+def test_key_ignores_whitespace_but_not_rubric_or_model(cache):
+    key = cache.make_key("An essay  about\n\ntrade.", "default", "gemini-1.5-flash")
+    assert key == cache.make_key("  An essay about trade. ", "default", "gemini-1.5-flash")
+    assert key == cache.make_key("An essay about trade.", None, "gemini-1.5-flash")
+    assert key != cache.make_key("An essay about trade.", "quick", "gemini-1.5-flash")
+    assert key != cache.make_key("An essay about trade.", "default", "gemini-1.5-pro")
+
+
+def test_hit_miss_and_lru_eviction(cache):
+    assert cache.get("a") is None
+    for key in ("a", "b", "c"):
+        cache.set(key, make_result())
+    assert cache.get("a").overall_score == 42
+
+    # "b" is now the least recently used entry
+    cache.set("d", make_result())
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 3
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+
+
+def test_ttl_expiry(tmp_path):
+    cache = GradingCache(db_path=str(tmp_path / "cache.sqlite3"), max_entries=10, ttl_seconds=0)
+    cache.set("a", make_result())
+    assert cache.get("a") is None
+
+
+def test_fallback_result_is_never_cached(tmp_path, monkeypatch):
+    service = AIService()
+    service.grading_cache = GradingCache(db_path=str(tmp_path / "cache.sqlite3"))
+
+    async def failing_call(prompt, **kwargs):
+        raise Exception("quota exceeded")
+
+    monkeypatch.setattr(service, "_call_gemini", failing_call)
+    result = asyncio.run(service.grade_essay("A short essay about trade. " * 40))
+
+    assert result.summary_feedback.startswith("AI grading service temporarily unavailable")
+    assert service.grading_cache.get_stats()["entries"] == 0
+
+
+def test_cache_io_runs_off_the_event_loop(tmp_path):
+    service = AIService()
+    service.grading_cache = GradingCache(db_path=str(tmp_path / "cache.sqlite3"))
+    essay = "A short essay about trade. " * 40
+    key = service.grading_cache.make_key(essay, "default", f"{service.model_name}/v{ai_service.SCORING_VERSION}")
+    service.grading_cache.set(key, make_result())
+    lookup = service.grading_cache.get
+
+    def slow_get(cache_key):
+        time.sleep(0.3)
+        return lookup(cache_key)
+
+    service.grading_cache.get = slow_get
+
+    async def grade_while_ticking():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.ensure_future(ticker())
+        result = await service.grade_essay(essay)
+        ticking.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(grade_while_ticking())
+
+    assert result.overall_score == 42
+    assert ticks >= 10
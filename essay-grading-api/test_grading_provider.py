@@ -0,0 +1,110 @@
+"""
+Tests for the pluggable grading providers and the local mock backend
+"""
+
+import asyncio
+import statistics
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from conftest import SAMPLE_ESSAY
+from services.ai_service import AIService
+from services.grading_provider import GeminiProvider, GradingProvider, MockProvider, create_provider
+from services.rubric import CATEGORY_MAX_SCORES
+
+LONG_ESSAY = "\n\n".join([SAMPLE_ESSAY] * 5)
+
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    monkeypatch.setenv("MOCK_SEED", "7")
+    return monkeypatch
+
+
+def grade(service, essay):
+    service.grading_cache.enabled = False
+    return asyncio.run(service.grade_essay(essay))
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_mock_provider_grades_end_to_end(mock_env, streaming):
+    service = AIService(provider=MockProvider())
+    service.streaming = streaming
+
+    result = grade(service, LONG_ESSAY)
+
+    assert set(result.category_scores) == set(CATEGORY_MAX_SCORES)
+    assert result.summary_feedback.startswith("Mock grading result")
+    assert result.overall_score == sum(score.score for score in result.category_scores.values())
+    assert service.parse_failures == 0
+    # Same essay, same scores
+    assert grade(service, LONG_ESSAY) == result
+
+
+def test_mock_provider_reports_configured_token_counts(mock_env):
+    mock_env.setenv("MOCK_PROMPT_TOKENS", "3000")
+    mock_env.setenv("MOCK_OUTPUT_TOKENS", "800")
+    service = AIService(provider=MockProvider())
+
+    grade(service, LONG_ESSAY)
+
+    stats = service.get_stats()
+    assert stats["prompt_tokens"] == 3000
+    assert stats["output_tokens"] == 800
+
+
+@pytest.mark.parametrize("distribution", ["uniform", "normal", "lognormal"])
+def test_mock_latency_distribution_matches_configuration(mock_env, distribution):
+    mock_env.setenv("MOCK_LATENCY_DISTRIBUTION", distribution)
+    mock_env.setenv("MOCK_LATENCY_MEAN_SECONDS", "2.0")
+    mock_env.setenv("MOCK_LATENCY_STDDEV_SECONDS", "0.5")
+    provider = MockProvider()
+
+    samples = [provider.sample_latency() for _ in range(5000)]
+
+    assert statistics.mean(samples) == pytest.approx(2.0, rel=0.05)
+    assert statistics.stdev(samples) == pytest.approx(0.5, rel=0.1)
+
+
+def test_mock_errors_look_like_quota_and_overload_errors(mock_env):
+    mock_env.setenv("MOCK_ERROR_RATE", "1.0")
+    provider = MockProvider()
+
+    raised = set()
+    for _ in range(20):
+        with pytest.raises((api_exceptions.ResourceExhausted, api_exceptions.ServiceUnavailable)) as error:
+            provider.generate("The submission is 900 words long\n\nESSAY TO ANALYZE:\nText")
+        raised.add(error.value.code)
+    assert {code.value for code in raised} == {429, 503}
+
+    result = grade(AIService(provider=provider), LONG_ESSAY)
+    assert result.summary_feedback.startswith("AI grading service temporarily unavailable")
+
+
+def test_provider_is_selected_by_environment(mock_env):
+    mock_env.setenv("GRADING_PROVIDER", "mock")
+    assert isinstance(create_provider(), MockProvider)
+    assert AIService().model_name == "mock"
+
+    mock_env.setenv("GRADING_PROVIDER", "openai")
+    with pytest.raises(ValueError):
+        create_provider()
+
+
+def test_backends_must_implement_generate():
+    class Incomplete(GradingProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_mock_provider_needs_no_api_key(mock_env):
+    mock_env.delenv("GEMINI_API_KEY")
+    mock_env.setenv("GRADING_PROVIDER", "mock")
+    assert AIService().provider.name == "mock"
+    with pytest.raises(ValueError):
+        GeminiProvider()
@@ -0,0 +1,134 @@
+"""
+Tests for the outbound scheduler: priorities, RPM/TPM buckets, adaptive backoff and retries
+"""
+
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from conftest import SAMPLE_ESSAY
+from services.ai_service import AIService
+from services.grading_provider import MockProvider
+from services.outbound_scheduler import OutboundScheduler, TokenBucket
+
+LONG_ESSAY = "\n\n".join([SAMPLE_ESSAY] * 5)
+
+
+def test_interactive_calls_overtake_queued_batch_calls():
+    scheduler = OutboundScheduler(max_concurrency=1, rpm_limit=0, tpm_limit=0)
+    order = []
+
+    async def call(name, priority):
+        async with scheduler.reserve(100, priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        async with scheduler.reserve(100):
+            tasks = [asyncio.create_task(call(f"batch-{i}", "batch")) for i in range(3)]
+            await asyncio.sleep(0.01)
+            tasks.append(asyncio.create_task(call("interactive", "interactive")))
+            await asyncio.sleep(0.01)
+            assert scheduler.get_stats()["queue_depth"] == 4
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+    assert order == ["interactive", "batch-0", "batch-1", "batch-2"]
+    stats = scheduler.get_stats()
+    assert stats["max_queue_depth"] == 4
+    assert stats["by_priority"]["batch"]["admitted"] == 3
+    assert stats["by_priority"]["batch"]["avg_wait_seconds"] > stats["by_priority"]["interactive"]["avg_wait_seconds"]
+
+
+def test_token_bucket_limits_tokens_per_minute():
+    scheduler = OutboundScheduler(max_concurrency=10, rpm_limit=0, tpm_limit=6000)
+
+    async def scenario():
+        async with scheduler.reserve(6000):
+            pass
+        started = time.perf_counter()
+        async with scheduler.reserve(30):
+            pass
+        return time.perf_counter() - started
+
+    # 6000 tokens per minute refill at 100 per second
+    assert 0.2 <= asyncio.run(scenario()) < 1.0
+
+
+def test_actual_usage_is_charged_to_the_token_bucket():
+    bucket = TokenBucket(6000)
+    bucket.take(6000)
+    assert bucket.delay_for(600) == pytest.approx(6.0, abs=0.1)
+    assert TokenBucket(0).delay_for(10 ** 9) == 0.0
+
+
+def test_throttling_halves_the_rate_and_successes_restore_it(monkeypatch):
+    monkeypatch.setenv("GEMINI_RETRY_BASE_SECONDS", "0.5")
+    scheduler = OutboundScheduler(max_concurrency=1)
+
+    scheduler.record_throttle()
+    # Errors arriving during the pause do not escalate it again
+    scheduler.record_throttle()
+    stats = scheduler.get_stats()
+    assert stats["throttles"] == 2
+    assert stats["rate_factor"] == 0.5
+    assert 0.4 < stats["paused_seconds"] <= 0.5
+
+    scheduler.paused_until = 0
+    scheduler.record_throttle()
+    stats = scheduler.get_stats()
+    assert stats["rate_factor"] == 0.25
+    assert 0.9 < stats["paused_seconds"] <= 1.0
+
+    for _ in range(20):
+        scheduler.record_success()
+    assert scheduler.get_stats()["rate_factor"] == 1.0
+
+    delays = [scheduler.retry_delay(2) for _ in range(200)]
+    assert 0 <= min(delays) and max(delays) <= 2.0
+    assert len(set(delays)) > 100
+
+
+class FlakyProvider(MockProvider):
+    """Fails the first calls with a quota error, then answers like the mock"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def generate(self, prompt, instructions=None, stream=False, batch=False, categories=None, quick=False):
+        if self.failures:
+            self.failures -= 1
+            raise api_exceptions.ResourceExhausted("429 Resource has been exhausted")
+        return super().generate(prompt, instructions, stream)
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_quota_errors_are_retried_instead_of_falling_back(monkeypatch, streaming):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    service = AIService(provider=FlakyProvider(failures=2))
+    service.streaming = streaming
+    service.grading_cache.enabled = False
+
+    result = asyncio.run(service.grade_essay(LONG_ESSAY, priority="batch"))
+
+    assert result.summary_feedback.startswith("Mock grading result")
+    stats = service.get_stats()["scheduler"]
+    assert stats["throttles"] == 2
+    assert stats["retries"] == 2
+    assert stats["by_priority"]["batch"]["admitted"] == 3
+
+
+def test_retries_give_up_after_the_configured_attempts(monkeypatch):
+    monkeypatch.setenv("GEMINI_MAX_RETRIES", "1")
+    service = AIService(provider=FlakyProvider(failures=5))
+    service.grading_cache.enabled = False
+
+    result = asyncio.run(service.grade_essay(LONG_ESSAY))
+
+    assert result.summary_feedback.startswith("AI grading service temporarily unavailable")
+    assert service.provider.failures == 3
@@ -0,0 +1,154 @@
+"""
+Tests for PDF text extraction
+"""
+
+import asyncio
+
+import httpx
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from conftest import SAMPLE_ESSAY
+import main
+import services.pdf_service as pdf_service_module
+from services.grading_provider import MockProvider
+from services.pdf_service import PDFService
+from test_batch_grading import make_pdf
+
+
+def char(text, x0, x1, top):
+    return {"text": text, "x0": x0, "x1": x1, "top": top}
+
+
+def test_chars_cluster_into_lines_with_spaces_from_glyph_gaps():
+    chars = [
+        # Second line first, out of order, with a whitespace glyph that is dropped
+        char("b", 16, 22, 30.5), char("a", 10, 16, 30), char(" ", 22, 25, 30), char("c", 28, 34, 31),
+        char("H", 10, 17, 10), char("i", 17, 19, 10.4), char("!", 19, 21, 9.8),
+    ]
+
+    text = PDFService()._extract_text_from_chars_professionally(chars, 600, 800)
+
+    assert text == "Hi!\nab c"
+
+
+def test_extracted_pdf_text_keeps_word_boundaries(tmp_path):
+    path = tmp_path / "essay.pdf"
+    path.write_bytes(make_pdf(SAMPLE_ESSAY))
+
+    extracted = PDFService()._extract_professional_text(str(path))
+
+    assert extracted.text.split() == SAMPLE_ESSAY.split()
+    assert (extracted.pages, extracted.total_pages, extracted.truncated) == (1, 1, False)
+
+
+def make_multipage_pdf(path, pages: int):
+    pdf = canvas.Canvas(str(path), pagesize=letter)
+    for page in range(pages):
+        pdf.drawString(50, 750, f"Page {page + 1} opens with a heading line.")
+        pdf.drawString(50, 730, "Every page carries a second line of ordinary essay text.")
+        pdf.showPage()
+    pdf.save()
+
+
+def test_parallel_extraction_matches_sequential(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_PARALLEL_MIN_PAGES", "4")
+    path = tmp_path / "long.pdf"
+    make_multipage_pdf(path, 5)
+    sequential = PDFService(parallel_workers=1)
+    parallel = PDFService(parallel_workers=2)
+
+    try:
+        text = parallel.extract_text_from_pdf(str(path))
+    finally:
+        parallel.shutdown()
+
+    assert text == sequential.extract_text_from_pdf(str(path))
+    assert text.startswith("Page 1 opens") and "Page 5 opens" in text
+    assert parallel.get_stats()["parallel_documents"] == 1
+    assert sequential.get_stats()["parallel_documents"] == 0
+
+
+def test_pool_failure_falls_back_to_sequential(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_PARALLEL_MIN_PAGES", "2")
+    path = tmp_path / "long.pdf"
+    make_multipage_pdf(path, 3)
+    service = PDFService(parallel_workers=2)
+
+    def broken_pool():
+        raise RuntimeError("pool unavailable")
+
+    monkeypatch.setattr(service, "_get_pool", broken_pool)
+
+    text = service.extract_text_from_pdf(str(path))
+
+    assert "Page 3 opens" in text
+    stats = service.get_stats()
+    assert (stats["parallel_documents"], stats["parallel_failures"], stats["pages"]) == (0, 1, 3)
+
+
+def test_word_cap_stops_extraction_and_records_truncation(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_MAX_WORDS", "25")
+    path = tmp_path / "binder.pdf"
+    make_multipage_pdf(path, 5)
+    service = PDFService(parallel_workers=1)
+    parsed = []
+    extract_page = service._extract_page
+    monkeypatch.setattr(service, "_extract_page", lambda page, page_num: parsed.append(page_num) or extract_page(page, page_num))
+
+    extracted = service.extract(str(path))
+
+    assert parsed == [0, 1]
+    assert (extracted.pages, extracted.total_pages, extracted.words, extracted.truncated) == (2, 5, 25, True)
+    # 17 words on page 1, then the first 8 of page 2
+    assert extracted.text.startswith("Page 1 opens")
+    assert "Page 2 opens" in extracted.text and extracted.text.endswith("Every")
+    stats = service.get_stats()
+    assert (stats["truncated"], stats["pages_skipped"]) == (1, 3)
+
+
+def test_page_cap_leaves_later_pages_unparsed(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_MAX_PAGES", "2")
+    path = tmp_path / "binder.pdf"
+    make_multipage_pdf(path, 5)
+
+    extracted = PDFService(parallel_workers=1).extract(str(path))
+
+    assert "Page 2 opens" in extracted.text and "Page 3" not in extracted.text
+    assert (extracted.pages, extracted.truncated) == (2, True)
+
+
+def test_each_page_is_released_after_extraction(tmp_path, monkeypatch):
+    path = tmp_path / "long.pdf"
+    make_multipage_pdf(path, 3)
+    released = []
+    monkeypatch.setattr(pdf_service_module, "_release_page", lambda page: released.append(page.page_number))
+
+    pages = PDFService(parallel_workers=1).iter_page_texts(str(path))
+    page_num, page_count, text = next(pages)
+
+    assert (page_num, page_count, released) == (0, 3, [])
+    assert text.startswith("Page 1 opens")
+    assert [page_num for page_num, _, _ in pages] == [1, 2]
+    assert released == [1, 2, 3]
+
+
+def test_upload_pdf_reports_truncated_input(isolated_app, monkeypatch, tmp_path):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    monkeypatch.setattr(main.ai_service, "provider", MockProvider())
+    monkeypatch.setattr(main.pdf_service, "max_pages", 1)
+    path = tmp_path / "binder.pdf"
+    make_multipage_pdf(path, 3)
+
+    async def upload():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/upload-pdf", files={"file": ("binder.pdf", path.read_bytes(), "application/pdf")})
+
+    response = asyncio.run(upload())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["input_truncated"] is True
+    assert "1 of 3 pages" in body["message"]
@@ -0,0 +1,109 @@
+"""
+Tests for the local pre-screen (Steps 0-3 of the grading prompt)
+"""
+
+import asyncio
+import textwrap
+
+import pytest
+
+from conftest import MOCK_RESPONSE, SAMPLE_ESSAY, SlowModel
+from services.ai_service import AIService
+from services.pre_screen import PreScreen, FRAGMENT_REMARK, INVALID_REMARK, SHORT_ESSAY_REMARK
+from services.rubric import CATEGORY_MAX_SCORES
+
+QUESTION_PAPER = (
+    "FEDERAL PUBLIC SERVICE COMMISSION  TIME ALLOWED: THREE HOURS   MAXIMUM MARKS: 100  "
+    "NOTE :(i) Make an outline and write a COMPREHENSIVE ESSAY (2500-3000 words) on any ONE of the given topics. "
+    "Credit will be given for organization, relevance and clarity.  "
+    "1.   An analysis of the concept of globalization of markets.  "
+    "2.   Digital democracy: social media and political participation.  "
+    "3.   Global trade and trade policies of China."
+)
+
+ROMAN_URDU = (
+    "Taleem kisi bhi mulk ki taraqqi ke liye bohat zaroori hai aur hamare mulk mein "
+    "taleem ka nizam kamzor hai kyun ke hukoomat is par tawajjo nahi deti. Bachon ko "
+    "schoolon mein achi sahulat nahi milti aur asatiza ki tankhwah bhi kam hai. Agar hum "
+    "taraqqi karna chahte hain to hamein taleem par zyada paisa kharch karna hoga."
+)
+
+# One paragraph wrapped with single newlines, as extracted from a PDF, using phrases that also
+# appear in pasted prompts ("you are a", "do not ... use", "N marks", "evaluate ... essay")
+SINGLE_PARAGRAPH_ESSAY = textwrap.fill(" ".join([
+    "If you are a farmer in the Indus basin today, the question of water is no longer abstract.",
+    "Pakistan receives most of its surface water from a single river system, and the canals that",
+    "carry it were designed for a population a fraction of the present size.",
+    "Governments that do not plan ahead use emergency measures that rarely last beyond one season.",
+    "Students who once scored 20 marks on geography papers for naming the rivers can evaluate the",
+    "policy choices in this essay more critically than their parents could.",
+] * 12), width=80)
+
+
+@pytest.fixture
+def pre_screen():
+    return PreScreen()
+
+
+def test_fragment_is_graded_locally_on_thesis_only(pre_screen):
+    screen = pre_screen.screen("Globalization has reshaped trade, culture and politics across the world in this century. " * 3)
+    result = screen.grading_result
+
+    assert screen.submission_type == "D"
+    assert set(result.category_scores) == set(CATEGORY_MAX_SCORES)
+    assert result.overall_score == result.category_scores["Thesis & Topic Understanding"].score <= 4
+    assert all(score.score == 0 for name, score in result.category_scores.items() if name != "Thesis & Topic Understanding")
+    assert result.examiner_remarks["weaknesses"] == [FRAGMENT_REMARK]
+    assert result.word_count == 39
+
+
+def test_question_paper_paste_is_invalid(pre_screen):
+    screen = pre_screen.screen(QUESTION_PAPER)
+    assert screen.submission_type == "G"
+    assert screen.grading_result.overall_score == 0
+    assert screen.grading_result.examiner_remarks["weaknesses"] == [INVALID_REMARK]
+
+
+@pytest.mark.parametrize("text", [SINGLE_PARAGRAPH_ESSAY, SINGLE_PARAGRAPH_ESSAY.replace("\n", " ")], ids=["wrapped", "one_line"])
+def test_essay_prose_with_prompt_like_phrases_is_not_instructions(pre_screen, text):
+    screen = pre_screen.screen(text)
+    assert screen.reason != "instructions"
+    assert screen.grading_result is None
+
+
+@pytest.mark.parametrize("text", [ROMAN_URDU, "تعلیم کسی بھی ملک کی ترقی کے لیے بہت ضروری ہے " * 20])
+def test_non_english_text_is_invalid(pre_screen, text):
+    screen = pre_screen.screen(text)
+    assert screen.reason == "non_english"
+    assert screen.grading_result.submission_type == "G"
+
+
+def test_full_essays_are_left_to_the_model(pre_screen):
+    essay = "\n\n".join([SAMPLE_ESSAY] * 5)
+    assert pre_screen.screen(essay).grading_result is None
+    assert pre_screen.screen(SAMPLE_ESSAY).submission_type == "E"
+
+
+def test_short_essay_gate_retypes_full_attempts(pre_screen):
+    result = AIService()._parse_ai_response(MOCK_RESPONSE)
+
+    gated = pre_screen.apply_short_essay_gate(result, 400)
+
+    assert gated.submission_type == "E"
+    assert gated.examiner_remarks["weaknesses"][0] == SHORT_ESSAY_REMARK
+    assert pre_screen.apply_short_essay_gate(AIService()._parse_ai_response(MOCK_RESPONSE), 900).submission_type == "C"
+
+
+def test_pre_screened_submissions_skip_the_model():
+    service = AIService()
+    service.provider.model = SlowModel(delay=0)
+    scores = []
+
+    result = asyncio.run(service.grade_essay("Too short to be an essay.", on_category_score=lambda name, score: scores.append(name)))
+
+    assert result.submission_type == "D"
+    assert service.provider.model.calls == 0
+    assert len(scores) == len(CATEGORY_MAX_SCORES)
+    stats = service.get_stats()["pre_screen"]
+    assert stats["handled_locally"] == 1
+    assert stats["handled_fraction"] == 1.0
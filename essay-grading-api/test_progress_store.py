@@ -0,0 +1,77 @@
+"""
+Tests for the bounded progress stores
+"""
+
+import pytest
+
+from services.progress_store import InMemoryProgressStore, ProgressStore, SQLiteProgressStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def factory(**kwargs):
+        if request.param == "memory":
+            return InMemoryProgressStore(**kwargs)
+        return SQLiteProgressStore(db_path=str(tmp_path / "progress.sqlite3"), **kwargs)
+    return factory
+
+
+def test_create_update_get(make_store):
+    store = make_store(ttl_seconds=60, max_entries=10)
+    store.create("t1", {"task_id": "t1", "progress": 0, "status": "queued", "queue_position": 2})
+
+    updated = store.update("t1", progress=50, status="processing", queue_position=None)
+
+    assert updated == {"task_id": "t1", "progress": 50, "status": "processing"}
+    assert store.get("t1") == updated
+    assert store.get("missing") is None
+    assert store.update("missing", progress=10) is None
+
+
+def test_update_many_only_touches_records_in_the_given_status(make_store):
+    store = make_store(ttl_seconds=60, max_entries=10)
+    for task_id, status in (("t1", "queued"), ("t2", "processing"), ("t3", "queued")):
+        store.create(task_id, {"task_id": task_id, "status": status})
+
+    updated = store.update_many({"t1": {"queue_position": 1}, "t2": {"queue_position": 2},
+                                 "t3": {"queue_position": 3}, "missing": {"queue_position": 4}}, status="queued")
+
+    assert updated == 2
+    assert [store.get(task_id).get("queue_position") for task_id in ("t1", "t2", "t3")] == [1, None, 3]
+    assert len(store.get_events("t1")) == 2 and len(store.get_events("t2")) == 1
+
+
+def test_ttl_expiry(make_store):
+    store = make_store(ttl_seconds=0, max_entries=10)
+    store.create("t1", {"progress": 0})
+    assert store.get("t1") is None
+    assert store.update("t1", progress=10) is None
+
+
+def test_max_entries_evicts_least_recently_updated(make_store, monkeypatch):
+    store = make_store(ttl_seconds=60, max_entries=3)
+    monkeypatch.setattr(type(store), "EVICT_EVERY", 1, raising=False)
+    for task_id in ("t1", "t2", "t3"):
+        store.create(task_id, {"progress": 0})
+    store.update("t1", progress=10)
+    store.create("t4", {"progress": 0})
+
+    assert store.count() == 3
+    assert store.get("t2") is None
+    assert store.get("t1")["progress"] == 10
+
+
+def test_sqlite_store_is_shared_between_workers(tmp_path):
+    db_path = str(tmp_path / "progress.sqlite3")
+    worker_a = SQLiteProgressStore(db_path=db_path, ttl_seconds=60, max_entries=10)
+    worker_b = SQLiteProgressStore(db_path=db_path, ttl_seconds=60, max_entries=10)
+
+    worker_a.create("t1", {"progress": 0, "status": "processing"})
+    worker_a.update("t1", progress=70)
+
+    assert worker_b.get("t1") == {"progress": 70, "status": "processing"}
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        ProgressStore()
@@ -0,0 +1,90 @@
+"""
+Tests for the push-based progress stream (SSE and WebSocket)
+"""
+
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from conftest import SAMPLE_ESSAY
+
+
+def parse_sse(body: str) -> list:
+    """Parse the data payloads of a Server-Sent Events body"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        for line in block.splitlines():
+            if line.startswith("data: "):
+                events.append(json.loads(line[len("data: "):]))
+    return events
+
+
+def stage_values(events: list) -> list:
+    """Distinct progress values in the order they were first seen"""
+    stages = []
+    for event in events:
+        if not stages or stages[-1] != event["progress"]:
+            stages.append(event["progress"])
+    return stages
+
+
+def test_sse_stream_emits_every_stage_and_closes(isolated_app):
+    main.ai_service.provider.model.delay = 0.2
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            accepted = await client.post("/upload-essay?async=true", json={"essay_text": SAMPLE_ESSAY})
+            task_id = accepted.json()["task_id"]
+            stream = await client.get(f"/progress/{task_id}/stream")
+            return stream
+
+    stream = asyncio.run(scenario())
+
+    assert stream.status_code == 200
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(stream.text)
+    stages = stage_values(events)
+    assert stages == sorted(stages)
+    assert [stage for stage in stages if stage in (0, 10, 70, 90, 100)] == [0, 10, 70, 90, 100]
+    # Streamed category scores show up as intermediate stages between 10 and 70
+    assert any(10 < stage < 70 for stage in stages)
+    assert len(events[-1]["category_scores"]) == 8
+    assert events[-1]["status"] == "completed"
+    assert events[-1]["result_url"].endswith("/json")
+    assert events[-1]["message"] == "Essay graded successfully"
+    assert events[-1]["degraded"] is False
+
+
+def test_sse_resumes_from_last_event_id(isolated_app):
+    store = main.progress_store
+    store.create("task-1", {"task_id": "task-1", "progress": 0, "status": "processing", "message": "Starting..."})
+    store.update("task-1", progress=50, message="Halfway")
+    store.update("task-1", progress=100, status="completed", message="Done")
+    first_seq = store.get_events("task-1")[0][0]
+
+    with TestClient(isolated_app) as client:
+        response = client.get("/progress/task-1/stream", headers={"Last-Event-ID": str(first_seq)})
+
+    assert stage_values(parse_sse(response.text)) == [50, 100]
+
+
+def test_stream_unknown_task_returns_404(isolated_app):
+    with TestClient(isolated_app) as client:
+        assert client.get("/progress/missing/stream").status_code == 404
+
+
+def test_websocket_stream(isolated_app):
+    store = main.progress_store
+    store.create("task-2", {"task_id": "task-2", "progress": 0, "status": "processing", "message": "Starting..."})
+    store.update("task-2", progress=60, message="Processing with AI...")
+    store.update("task-2", progress=100, status="completed", message="Done")
+
+    with TestClient(isolated_app) as client:
+        with client.websocket_connect("/progress/task-2/ws") as websocket:
+            messages = [websocket.receive_json() for _ in range(3)]
+
+    assert stage_values(messages) == [0, 60, 100]
@@ -0,0 +1,139 @@
+"""
+Tests for the weighted API key / model pool
+"""
+
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from conftest import SAMPLE_ESSAY
+from services.ai_service import AIService
+from services.grading_provider import GeminiProvider, MockProvider, create_provider
+from services.provider_pool import PoolMember, ProviderPool
+
+LONG_ESSAY = "\n\n".join([SAMPLE_ESSAY] * 5)
+PAYLOAD = "The submission is 1000 words long\n\nESSAY TO ANALYZE:\n" + LONG_ESSAY
+
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    return monkeypatch
+
+
+class QuotaExhaustedProvider(MockProvider):
+    def generate(self, prompt, instructions=None, stream=False, batch=False, categories=None, quick=False):
+        self.calls += 1
+        raise api_exceptions.ResourceExhausted("429 Quota exceeded for this project")
+
+
+def test_calls_follow_weight_and_remaining_quota(mock_env):
+    heavy = PoolMember("heavy", MockProvider(), weight=3, rpm_limit=0, tpm_limit=0)
+    light = PoolMember("light", MockProvider(), weight=1, rpm_limit=0, tpm_limit=0)
+    pool = ProviderPool([heavy, light])
+
+    picks = Counter(pool.choose(100).name for _ in range(4000))
+    assert picks["heavy"] / 4000 == pytest.approx(0.75, abs=0.04)
+
+    spent = PoolMember("spent", MockProvider(), rpm_limit=100)
+    fresh = PoolMember("fresh", MockProvider(), rpm_limit=100)
+    spent.requests.take(100)
+    pool = ProviderPool([spent, fresh])
+    assert {pool.choose(100).name for _ in range(50)} == {"fresh"}
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_quota_errors_eject_the_key_and_the_call_moves_on(mock_env, streaming):
+    exhausted = PoolMember("exhausted", QuotaExhaustedProvider(), weight=1000)
+    healthy = PoolMember("healthy", MockProvider(), weight=1)
+    service = AIService(provider=ProviderPool([exhausted, healthy]))
+    service.streaming = streaming
+    service.grading_cache.enabled = False
+
+    for index in range(3):
+        result = asyncio.run(service.grade_essay(f"Essay {index}. {LONG_ESSAY}"))
+        assert not result.degraded
+
+    stats = service.get_stats()["provider"]
+    by_member = {member["name"]: member for member in stats["by_member"]}
+    assert by_member["exhausted"]["quota_errors"] == 1
+    assert by_member["exhausted"]["ejected_seconds"] > 0
+    assert by_member["healthy"]["calls"] == 3
+    assert by_member["healthy"]["output_tokens"] > 0
+    assert stats["available"] == 1
+
+
+def test_quota_error_of_one_key_retries_on_another_without_global_backoff(mock_env):
+    exhausted = PoolMember("exhausted", QuotaExhaustedProvider(), weight=1000)
+    healthy = PoolMember("healthy", MockProvider(), weight=1)
+    service = AIService(provider=ProviderPool([exhausted, healthy]))
+    service.streaming = False
+    service.grading_cache.enabled = False
+
+    result = asyncio.run(service.grade_essay(LONG_ESSAY))
+
+    assert not result.degraded
+    assert (exhausted.quota_errors, healthy.calls) == (1, 1)
+    assert service.provider.get_stats()["failovers"] == 1
+    scheduler = service.scheduler.get_stats()
+    assert (scheduler["throttles"], scheduler["retries"], scheduler["rate_factor"]) == (0, 0, 1.0)
+    assert scheduler["paused_seconds"] == 0
+
+
+def test_pool_with_every_key_ejected_reports_a_quota_error(mock_env):
+    pool = ProviderPool([PoolMember("only", QuotaExhaustedProvider())])
+
+    for _ in range(2):
+        with pytest.raises(api_exceptions.ResourceExhausted):
+            pool.generate(PAYLOAD)
+
+    assert pool.members[0].calls == 1
+    assert pool.get_stats()["exhausted"] == 1
+
+
+def test_pool_is_configured_from_the_environment(mock_env):
+    mock_env.setenv("GEMINI_KEY_POOL", json.dumps([
+        {"provider": "mock", "weight": 2, "rpm": 1000, "tpm": 1000000},
+        {"provider": "mock", "rpm": 500, "tpm": 250000}
+    ]))
+    service = AIService()
+
+    assert isinstance(service.provider, ProviderPool)
+    scheduler = service.get_stats()["scheduler"]
+    assert (scheduler["rpm_limit"], scheduler["tpm_limit"]) == (1500, 1250000)
+
+    mock_env.delenv("GEMINI_KEY_POOL")
+    mock_env.setenv("GEMINI_API_KEYS", "key-one-aaaa, key-two-bbbb")
+    pool = create_provider()
+    second = pool.members[1].provider
+    assert [member.name for member in pool.members] == ["...aaaa/gemini-1.5-flash", "...bbbb/gemini-1.5-flash"]
+    # Additional keys get their own client and send the rubric inline
+    assert second.model._client is not None
+    assert not second.context_cache.enabled
+
+    mock_env.delenv("GEMINI_API_KEYS")
+    assert isinstance(create_provider(), GeminiProvider)
+
+
+def test_pooled_gemini_keys_send_requests_with_their_own_key(mock_env):
+    # Intercept at the generated API client, below the SDK's own client selection
+    import google.ai.generativelanguage as glm
+
+    used_keys = []
+
+    def record_key(client, request=None, **kwargs):
+        used_keys.append(client.transport._credentials.token)
+        return glm.GenerateContentResponse()
+
+    mock_env.setattr(glm.GenerativeServiceClient, "generate_content", record_key)
+    mock_env.setenv("GEMINI_API_KEYS", "key-one-aaaa, key-two-bbbb")
+    pool = create_provider()
+
+    for member in pool.members:
+        member.provider.model.generate_content("ping")
+
+    assert used_keys == ["key-one-aaaa", "key-two-bbbb"]
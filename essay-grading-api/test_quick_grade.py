@@ -0,0 +1,158 @@
+"""
+Tests for the quick-grade tier (rubric_type "quick")
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from conftest import SAMPLE_ESSAY, SlowModel
+from services.ai_service import AIService
+from services.grading_cache import GradingCache
+from services.grading_provider import MockProvider
+from services.rubric import CATEGORY_MAX_SCORES, build_response_schema
+from test_batch_grading import make_pdf
+
+LONG_ESSAY = "\n\n".join([SAMPLE_ESSAY] * 5)
+
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    return monkeypatch
+
+
+class RecordingModel(SlowModel):
+    """SlowModel that also keeps the generation config of every call"""
+
+    def __init__(self, response_text: str):
+        super().__init__(delay=0, response_text=response_text)
+        self.configs = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.configs.append(kwargs.get("generation_config"))
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+def test_quick_schema_and_instructions_drop_final_remarks():
+    schema = build_response_schema(quick=True)
+    service = AIService(provider=MockProvider())
+
+    instructions = service._build_rubric_instructions("quick")
+
+    assert "r" not in schema["properties"]
+    assert "r" not in schema["required"]
+    assert "at most 12 words" in instructions
+    assert "r = final remarks" not in instructions
+
+
+def test_quick_grade_is_capped_and_served_at_quick_priority(mock_env):
+    service = AIService(provider=MockProvider())
+    service.grading_cache.enabled = False
+
+    result = asyncio.run(service.grade_essay(LONG_ESSAY, "quick"))
+
+    assert set(result.category_scores) == set(CATEGORY_MAX_SCORES)
+    assert result.examiner_remarks == {"strengths": [], "weaknesses": [], "suggestions": []}
+    assert result.overall_score == sum(score.score for score in result.category_scores.values())
+    stats = service.get_stats()
+    assert stats["output_tokens"] <= service.quick_max_output_tokens
+    assert stats["scheduler"]["by_priority"]["quick"]["admitted"] == 1
+
+
+def test_quick_and_full_grades_are_cached_separately(mock_env, tmp_path):
+    service = AIService(provider=MockProvider())
+    service.grading_cache = GradingCache(db_path=str(tmp_path / "cache.sqlite3"))
+
+    quick = asyncio.run(service.grade_essay(LONG_ESSAY, "quick"))
+    full = asyncio.run(service.grade_essay(LONG_ESSAY, "default"))
+    asyncio.run(service.grade_essay(LONG_ESSAY, "quick"))
+
+    assert service.provider.calls == 2
+    assert quick.examiner_remarks["strengths"] == []
+    assert full.examiner_remarks["strengths"]
+
+
+def test_gemini_quick_calls_carry_the_output_token_cap(mock_env):
+    service = AIService()
+    model = RecordingModel(MockProvider().build_response("ESSAY TO ANALYZE:\n" + SAMPLE_ESSAY, quick=True))
+    service.provider.model = model
+    service.grading_cache.enabled = False
+
+    asyncio.run(service.grade_essay(SAMPLE_ESSAY, "quick"))
+    asyncio.run(service.grade_essay(SAMPLE_ESSAY))
+
+    quick_config, full_config = model.configs
+    assert quick_config.max_output_tokens == service.quick_max_output_tokens
+    assert full_config.max_output_tokens is None
+
+
+class BatchRecordingModel(RecordingModel):
+    """RecordingModel answering batch prompts with one seeded quick grading per essay"""
+
+    def __init__(self):
+        super().__init__(response_text="")
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.response_text = MockProvider().build_batch_response(prompt, quick=True)
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+def test_gemini_quick_batches_carry_the_cap_and_the_quick_schema(mock_env):
+    service = AIService()
+    model = BatchRecordingModel()
+    service.provider.model = model
+    service.grading_cache.enabled = False
+
+    results = asyncio.run(service.grade_essays([f"Essay {index}. {SAMPLE_ESSAY}" for index in range(3)], "quick"))
+
+    (config,) = model.configs
+    assert config.max_output_tokens == service.quick_max_output_tokens * service.batch_max_essays
+    assert "r" not in config.response_schema["properties"]["results"]["items"]["properties"]
+    assert all(result.examiner_remarks["strengths"] == [] for result in results)
+    assert service.get_stats()["batch"]["essays"] == 3
+
+
+def test_upload_pdf_passes_rubric_type(isolated_app, mock_env):
+    requested = []
+    grade_essay = main.ai_service.grade_essay
+
+    async def spy(essay_text, rubric_type="default", **kwargs):
+        requested.append(rubric_type)
+        return await grade_essay(essay_text, rubric_type, **kwargs)
+
+    mock_env.setattr(main.ai_service, "grade_essay", spy)
+
+    async def upload():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/upload-pdf",
+                files={"file": ("essay.pdf", make_pdf(LONG_ESSAY), "application/pdf")},
+                data={"rubric_type": "quick"}
+            )
+
+    response = asyncio.run(upload())
+
+    assert response.status_code == 200
+    assert requested == ["quick"]
+
+
+def test_upload_essay_quick_response_is_an_essay_response(isolated_app, mock_env):
+    mock_env.setattr(main.ai_service, "provider", MockProvider())
+
+    async def upload():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/upload-essay", json={"essay_text": LONG_ESSAY, "rubric_type": "quick"})
+
+    response = asyncio.run(upload())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["examiner_remarks"] == {"strengths": [], "weaknesses": [], "suggestions": []}
+    assert len(body["category_scores"]) == len(CATEGORY_MAX_SCORES)
+    assert body["overall_score"] == sum(score["score"] for score in body["category_scores"].values())
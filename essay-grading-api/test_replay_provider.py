@@ -0,0 +1,128 @@
+"""
+Tests for the record/replay grading provider
+"""
+
+import asyncio
+import glob
+import json
+import os
+
+import pytest
+
+from conftest import SAMPLE_ESSAY
+from services.ai_service import AIService
+from services.grading_provider import MockProvider, create_provider
+from services.replay_provider import RecordingProvider, ReplayProvider, text_hash
+
+LONG_ESSAY = "\n\n".join([SAMPLE_ESSAY] * 5)
+RESULTS_GLOB = os.path.join(os.path.dirname(__file__), "storage", "results", "*.json")
+
+
+@pytest.fixture
+def replay_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    monkeypatch.setenv("REPLAY_CORPUS_GLOB", str(tmp_path / "results" / "*.json"))
+    monkeypatch.setenv("REPLAY_FIXTURES_DIR", str(tmp_path / "fixtures"))
+    (tmp_path / "results").mkdir()
+    return tmp_path
+
+
+def write_result(directory, essay_text, feedback="Recorded feedback."):
+    from services.rubric import CATEGORY_MAX_SCORES
+    record = {
+        "essay_id": "recorded",
+        "original_text": essay_text,
+        "grading_result": {
+            "overall_score": 40,
+            "category_scores": {name: {"score": 4, "feedback": feedback} for name in CATEGORY_MAX_SCORES},
+            "summary_feedback": "Recorded summary.",
+            "submission_type": "B",
+            "word_count": len(essay_text.split()),
+            "examiner_remarks": {"strengths": ["Recorded strength"], "weaknesses": [], "suggestions": []}
+        }
+    }
+    with open(directory / "results" / "recorded.json", "w", encoding="utf-8") as f:
+        json.dump(record, f)
+
+
+def grade(service, essay):
+    service.grading_cache.enabled = False
+    return asyncio.run(service.grade_essay(essay))
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_replay_serves_the_recorded_grading(replay_env, streaming):
+    write_result(replay_env, LONG_ESSAY)
+    service = AIService(provider=ReplayProvider())
+    service.streaming = streaming
+
+    # Whitespace differences still match the recorded essay
+    result = grade(service, LONG_ESSAY.replace("\n\n", "\n\n\n"))
+
+    assert result.summary_feedback == "Recorded summary."
+    assert result.examiner_remarks["strengths"] == ["Recorded strength"]
+    assert result.category_scores["Conclusion"].feedback == "Recorded feedback."
+    assert service.provider.get_stats()["hits"] == 1
+
+
+def test_replay_matches_essays_cut_to_the_token_budget(replay_env, monkeypatch):
+    monkeypatch.setenv("ESSAY_TOKEN_BUDGET", "300")
+    write_result(replay_env, LONG_ESSAY)
+    service = AIService(provider=ReplayProvider())
+
+    assert "omitted for length" in service._build_essay_payload(LONG_ESSAY)
+    assert grade(service, LONG_ESSAY).summary_feedback == "Recorded summary."
+
+
+def test_unknown_essays_fall_back_to_mock_or_fail(replay_env, monkeypatch):
+    service = AIService(provider=ReplayProvider())
+    assert grade(service, LONG_ESSAY).summary_feedback.startswith("Mock grading result")
+    assert service.provider.get_stats()["misses"] == 1
+
+    monkeypatch.setenv("REPLAY_ON_MISS", "error")
+    service = AIService(provider=ReplayProvider())
+    assert grade(service, LONG_ESSAY).summary_feedback.startswith("AI grading service temporarily unavailable")
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_recorded_fixtures_replay_with_their_latency(replay_env, streaming):
+    recorder = AIService(provider=RecordingProvider(MockProvider()))
+    recorder.streaming = streaming
+    recorded = grade(recorder, LONG_ESSAY)
+
+    fixtures = glob.glob(str(replay_env / "fixtures" / "*.json"))
+    assert len(fixtures) == 1
+    with open(fixtures[0], encoding="utf-8") as f:
+        fixture = json.load(f)
+    assert fixture["text_hash"] == text_hash(LONG_ESSAY)
+    assert fixture["output_tokens"] > 0
+
+    fixture["latency_seconds"] = 0.2
+    with open(fixtures[0], "w", encoding="utf-8") as f:
+        json.dump(fixture, f)
+
+    replayer = AIService(provider=ReplayProvider())
+    replayer.streaming = streaming
+    assert grade(replayer, LONG_ESSAY) == recorded
+    assert 0.2 <= replayer.get_stats()["avg_latency_seconds"] < 1.0
+
+
+def test_synthetic_latency_is_deterministic_per_essay(replay_env, monkeypatch):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "lognormal")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "2.0")
+    write_result(replay_env, LONG_ESSAY)
+    provider = ReplayProvider()
+    recording = next(iter(provider._recordings.values()))
+
+    assert provider._latency("a", recording) == ReplayProvider()._latency("a", recording)
+    assert provider._latency("a", recording) != provider._latency("b", recording)
+
+
+def test_replay_indexes_the_stored_results_corpus(monkeypatch):
+    monkeypatch.setenv("GRADING_PROVIDER", "replay")
+    monkeypatch.setenv("REPLAY_CORPUS_GLOB", RESULTS_GLOB)
+    provider = create_provider()
+
+    assert isinstance(provider, ReplayProvider)
+    assert 0 < provider.get_stats()["recordings"] <= len(glob.glob(RESULTS_GLOB))
@@ -0,0 +1,177 @@
+"""
+Tests for hedged Gemini calls, latency-driven timeouts and the circuit breaker
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+from conftest import SAMPLE_ESSAY
+from services.ai_service import AIService
+from services.grading_provider import MockProvider
+from services.tail_latency import CircuitBreaker, LatencyTracker
+
+LONG_ESSAY = "\n\n".join([SAMPLE_ESSAY] * 5)
+
+
+@pytest.fixture
+def tail_env(monkeypatch):
+    monkeypatch.setenv("MOCK_LATENCY_DISTRIBUTION", "fixed")
+    monkeypatch.setenv("MOCK_LATENCY_MEAN_SECONDS", "0")
+    monkeypatch.setenv("GEMINI_HEDGING", "true")
+    monkeypatch.setenv("GEMINI_HEDGE_MIN_DELAY_SECONDS", "0.05")
+    monkeypatch.setenv("GEMINI_HEDGE_MAX_RATIO", "1.0")
+    return monkeypatch
+
+
+class ScriptedProvider(MockProvider):
+    """Mock whose calls hang or fail according to a script, then answer normally"""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+
+    def generate(self, prompt, instructions=None, stream=False, batch=False, categories=None, quick=False):
+        step = self.script.pop(0) if self.script else "ok"
+        self.calls += 1
+        if step == "fail":
+            raise RuntimeError("500 Internal error")
+        if step == "hang":
+            time.sleep(1.5)
+        return super().generate(prompt, instructions, stream)
+
+
+def make_service(provider, streaming=False, calibrate=True):
+    service = AIService(provider=provider)
+    service.streaming = streaming
+    service.grading_cache.enabled = False
+    if calibrate:
+        for _ in range(service.latency.min_samples):
+            service.latency.record(0.05)
+    return service
+
+
+def timed_grade(service, essay=LONG_ESSAY):
+    started = time.perf_counter()
+    result = asyncio.run(service.grade_essay(essay))
+    return result, time.perf_counter() - started
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_slow_call_is_hedged_and_the_duplicate_wins(tail_env, streaming):
+    service = make_service(ScriptedProvider(["hang"]), streaming)
+
+    result, elapsed = timed_grade(service)
+
+    assert elapsed < 1.0
+    assert not result.degraded
+    assert result.summary_feedback.startswith("Mock grading result")
+    stats = service.get_stats()["hedging"]
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_hedging_waits_for_calibration_and_respects_the_load_cap(tail_env):
+    service = make_service(ScriptedProvider(["hang"]), calibrate=False)
+    _, elapsed = timed_grade(service)
+    assert elapsed >= 1.5
+    assert service.get_stats()["hedging"]["hedges"] == 0
+
+    tail_env.setenv("GEMINI_HEDGE_MAX_RATIO", "0.05")
+    service = make_service(ScriptedProvider(["hang"]))
+    _, elapsed = timed_grade(service)
+    assert elapsed >= 1.5
+    assert service.get_stats()["hedging"]["budget_denied"] == 1
+
+
+def test_hung_call_times_out_to_a_labelled_degraded_result(tail_env):
+    tail_env.setenv("GEMINI_HEDGING", "false")
+    tail_env.setenv("GEMINI_CALL_TIMEOUT_SECONDS", "0.2")
+    service = make_service(ScriptedProvider(["hang"]), calibrate=False)
+
+    result, elapsed = timed_grade(service)
+
+    assert elapsed < 1.0
+    assert result.degraded and result.degraded_reason == "provider_error"
+    assert service.get_stats()["circuit_breaker"]["timeouts"] == 1
+
+
+def test_timed_out_calls_hold_their_slot_until_the_thread_returns(tail_env):
+    tail_env.setenv("GEMINI_HEDGING", "false")
+    tail_env.setenv("GEMINI_CALL_TIMEOUT_SECONDS", "0.5")
+    tail_env.setenv("GEMINI_MAX_CONCURRENCY", "2")
+    service = make_service(ScriptedProvider(["hang", "hang"]), calibrate=False)
+
+    async def grade_after_two_hung_calls():
+        hung = await asyncio.gather(service.grade_essay(LONG_ESSAY), service.grade_essay(LONG_ESSAY + " Again."))
+        # Both hung threads still run: the next call waits for a slot, not behind them on the pool
+        return hung, await service.grade_essay(LONG_ESSAY + " Healthy.")
+
+    hung, healthy = asyncio.run(grade_after_two_hung_calls())
+
+    assert all(result.degraded for result in hung)
+    assert not healthy.degraded
+    assert service.scheduler.get_stats()["abandoned_calls"] == 2
+    assert service.scheduler.in_flight == 0
+
+
+def test_call_timeout_follows_observed_p99():
+    tracker = LatencyTracker(min_samples=10)
+    breaker = CircuitBreaker(tracker)
+    assert breaker.call_timeout() == breaker.max_timeout
+
+    for latency in [2.0] * 9 + [10.0]:
+        tracker.record(latency)
+    assert breaker.call_timeout() == 40.0
+
+
+def test_breaker_opens_fails_fast_and_recovers(tail_env):
+    tail_env.setenv("GEMINI_BREAKER_FAILURES", "2")
+    tail_env.setenv("GEMINI_BREAKER_RESET_SECONDS", "0.3")
+    provider = ScriptedProvider(["fail", "fail"])
+    service = make_service(provider, calibrate=False)
+
+    for _ in range(2):
+        assert timed_grade(service)[0].degraded_reason == "provider_error"
+    assert service.breaker.state == "open"
+
+    result, elapsed = timed_grade(service)
+    assert result.degraded and result.degraded_reason == "circuit_open"
+    assert "circuit breaker open" in result.summary_feedback
+    assert provider.calls == 2
+    assert elapsed < 0.1
+
+    time.sleep(0.3)
+    result, _ = timed_grade(service)
+    assert not result.degraded
+    stats = service.get_stats()["circuit_breaker"]
+    assert stats["state"] == "closed"
+    assert stats["opened"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_upload_reports_degraded_results(isolated_app, monkeypatch):
+    monkeypatch.setattr(main.ai_service.breaker, "state", "open")
+    monkeypatch.setattr(main.ai_service.breaker, "opened_at", time.monotonic())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=isolated_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = (await client.post("/upload-essay", json={"essay_text": LONG_ESSAY})).json()
+            progress = (await client.get(f"/progress/{body['task_id']}")).json()
+            return body, progress, (await client.get(f"/results/{body['essay_id']}/json")).json()
+
+    body, progress, stored = asyncio.run(scenario())
+
+    assert body["degraded"] is True
+    assert body["degraded_reason"] == "circuit_open"
+    assert "degraded" in body["message"]
+    # Progress pollers get the same completion message
+    assert (progress["status"], progress["message"], progress["degraded"]) == ("completed", body["message"], True)
+    # Async-mode clients only see the stored result
+    assert (stored["degraded"], stored["degraded_reason"]) == (True, "circuit_open")
+    listed = asyncio.run(main.storage_service.list_essay_results())
+    assert [item["degraded"] for item in listed] == [True]